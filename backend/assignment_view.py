@@ -0,0 +1,289 @@
+from sqlalchemy import event, select, insert, delete, func, literal, or_
+from sqlalchemy.orm import Session, aliased
+
+import models
+import powerbi
+import versioning
+
+# ================================
+# PROYECCIÓN DE LECTURA DE ASIGNACIONES (acd_v_assignment_view)
+# ================================
+# Toda lectura de asignaciones une UserTrainingAssignment con el cliente (User, Person,
+# Gender), la capacitación y el instructor (User, Person). La proyección guarda esa unión
+# ya resuelta, una fila por asignación, con los campos que muestran las listas y los
+# dashboards, el estado, el avance (porcentaje y tecnologías completadas) y los equipos
+# activos del cliente. Las listas planas, el resumen por estado y el dataset
+# assignments-detail de Power BI leen solo esta tabla.
+#
+# Se mantiene en la misma transacción que la escritura: después de cada flush de cualquier
+# Session (SessionLocal, las bases de prueba de los scripts) se recalculan las filas de las
+# asignaciones afectadas por lo que cambió
+#   asignación / progreso de tecnologías   esa asignación
+#   usuario / persona                      las asignaciones donde es cliente o instructor
+#   género                                 las asignaciones de los clientes con ese género
+#   capacitación                           sus asignaciones
+#   equipo / miembro de equipo             las asignaciones de los clientes del equipo
+# con dos sentencias: DELETE + INSERT ... SELECT sobre la unión original, ambas con la misma
+# condición (no hace falta consultar antes qué asignaciones son). Un rollback descarta todo junto.
+#
+# Las sentencias masivas sobre esas tablas (update/delete/insert ORM) no dicen qué filas
+# cambiaron: la proyección se reconstruye completa antes del commit.
+#
+# Lo que se escribe sin una Session (engine.begin(), sqlite3, otra aplicación sobre la
+# misma base) no pasa por aquí y deja la proyección desactualizada sin avisar: después de
+# esas cargas hay que llamar a rebuild(conn) o reconstruirla con
+#     python -m scripts.rebuild_assignment_view [--check]
+# Al iniciar, la proyección se reconstruye si no tiene la misma cantidad de filas que las
+# asignaciones (base existente antes de esta tabla).
+
+VIEW_COLUMNS = [column.name for column in models.AssignmentView.__table__.columns]
+
+
+def source_query(affected=None):
+    """
+    Filas de la proyección calculadas desde las tablas de origen, con las columnas en el
+    orden de VIEW_COLUMNS. affected(tabla) da la condición de las asignaciones a incluir
+    (ver affected_condition); sin ella, todas.
+    """
+    assignment = models.UserTrainingAssignment
+    instructor = aliased(models.User)
+    instructor_person = aliased(models.Person)
+    progress = models.UserTechnologyProgress
+
+    technologies = select(
+        progress.assignment_id.label("assignment_id"),
+        func.count().label("total"),
+        powerbi.count_where(progress.is_completed == 'Y').label("completed"),
+    ).group_by(progress.assignment_id)
+
+    # Equipos activos de cada cliente como ",3,7," (ordenados, para filtrar con LIKE '%,3,%')
+    memberships = select(
+        models.TeamMember.user_id.label("user_id"),
+        models.TeamMember.team_id.label("team_id"),
+    ).join(
+        models.Team, models.TeamMember.team_id == models.Team.team_id
+    ).where(
+        models.TeamMember.member_status == 'A',
+        models.Team.team_status == 'A',
+    ).distinct()
+
+    if affected is not None:
+        affected_ids = select(assignment.assignment_id).where(affected(assignment))
+        technologies = technologies.where(progress.assignment_id.in_(affected_ids))
+        memberships = memberships.where(models.TeamMember.user_id.in_(
+            select(assignment.user_id).where(affected(assignment))
+        ))
+    technologies = technologies.subquery()
+    memberships = memberships.order_by(models.TeamMember.user_id, models.TeamMember.team_id).subquery()
+    teams = select(
+        memberships.c.user_id,
+        (literal(",") + func.group_concat(memberships.c.team_id, ",") + literal(",")).label("team_ids"),
+    ).group_by(memberships.c.user_id).subquery()
+
+    row_updated = powerbi.greatest(
+        assignment.assignment_updated_at, models.User.user_updated_at,
+        models.Person.person_updated_at, models.Gender.gender_updated_at,
+        models.Training.training_updated_at, instructor.user_updated_at, instructor_person.person_updated_at
+    )
+    query = select(
+        assignment.assignment_id,
+        assignment.user_id,
+        models.User.user_username,
+        models.Person.person_first_name,
+        models.Person.person_last_name,
+        models.Person.person_email,
+        models.Gender.gender_name,
+        assignment.training_id,
+        models.Training.training_name,
+        models.Training.training_description,
+        assignment.instructor_id,
+        instructor.user_username,
+        instructor_person.person_first_name,
+        instructor_person.person_last_name,
+        assignment.instructor_meeting_link,
+        assignment.assignment_status,
+        assignment.completion_percentage,
+        func.coalesce(technologies.c.total, 0),
+        func.coalesce(technologies.c.completed, 0),
+        func.coalesce(teams.c.team_ids, ""),
+        assignment.assignment_created_at,
+        row_updated,
+    ).select_from(assignment).join(
+        models.User, assignment.user_id == models.User.user_id
+    ).join(
+        models.Person, models.User.person_id == models.Person.person_id
+    ).join(
+        models.Gender, models.Person.person_gender == models.Gender.gender_id
+    ).join(
+        models.Training, assignment.training_id == models.Training.training_id
+    ).outerjoin(
+        instructor, assignment.instructor_id == instructor.user_id
+    ).outerjoin(
+        instructor_person, instructor.person_id == instructor_person.person_id
+    ).outerjoin(
+        technologies, technologies.c.assignment_id == assignment.assignment_id
+    ).outerjoin(
+        teams, teams.c.user_id == assignment.user_id
+    )
+    if affected is not None:
+        query = query.where(affected(assignment))
+    return query
+
+
+def refresh(connection, affected, only_new: bool = False):
+    """
+    Recalcular las filas de las asignaciones que cumplen affected (las eliminadas
+    desaparecen de la proyección). only_new: son todas asignaciones recién creadas,
+    todavía sin fila que borrar.
+    """
+    view = models.AssignmentView
+    if not only_new:
+        connection.execute(delete(view).where(affected(view)))
+    connection.execute(insert(view).from_select(VIEW_COLUMNS, source_query(affected)))
+
+
+def rebuild(connection):
+    """
+    Reconstruir la proyección completa. Retorna la cantidad de filas.
+    """
+    connection.execute(delete(models.AssignmentView))
+    connection.execute(insert(models.AssignmentView).from_select(VIEW_COLUMNS, source_query()))
+    return connection.execute(select(func.count()).select_from(models.AssignmentView)).scalar()
+
+
+def rebuild_if_stale(connection) -> bool:
+    """
+    Reconstruir si la proyección no tiene una fila por asignación (tabla recién creada
+    sobre una base existente). Retorna True si se reconstruyó.
+    """
+    view_rows = connection.execute(select(func.count()).select_from(models.AssignmentView)).scalar()
+    assignments = connection.execute(select(func.count()).select_from(models.UserTrainingAssignment)).scalar()
+    if view_rows == assignments:
+        return False
+    rebuild(connection)
+    return True
+
+
+def compare(connection):
+    """
+    Diferencias entre la proyección y lo que daría reconstruirla:
+    (asignaciones sin fila, filas sobrantes, filas con valores distintos), como listas de ids
+    """
+    expected = {row[0]: tuple(row) for row in connection.execute(source_query())}
+    current = {
+        row[0]: tuple(row)
+        for row in connection.execute(select(*models.AssignmentView.__table__.columns))
+    }
+    missing = sorted(set(expected) - set(current))
+    extra = sorted(set(current) - set(expected))
+    different = sorted(
+        assignment_id for assignment_id in set(expected) & set(current)
+        if expected[assignment_id] != current[assignment_id]
+    )
+    return missing, extra, different
+
+
+# ---- Mantenimiento en cada Session ----
+
+def affected_condition(objects):
+    """
+    Condición que identifica las asignaciones cuya fila cambia por los objetos del flush,
+    o None si ninguna. Recibe la tabla a filtrar: la proyección tiene las mismas columnas
+    assignment_id, user_id, instructor_id y training_id que UserTrainingAssignment, así la
+    misma condición sirve para borrar las filas viejas y para leer las nuevas, sin consultar
+    antes qué asignaciones son.
+    """
+    assignment_ids = set()
+    user_ids, client_ids, person_ids, gender_ids, training_ids, team_ids = set(), set(), set(), set(), set(), set()
+    for obj, is_new in objects:
+        if isinstance(obj, (models.UserTrainingAssignment, models.UserTechnologyProgress)):
+            assignment_ids |= versioning.attribute_values(obj, "assignment_id")
+        elif isinstance(obj, models.TeamMember):
+            client_ids |= versioning.attribute_values(obj, "user_id")
+        elif is_new:
+            # Un usuario, persona, capacitación o equipo nuevo aún no tiene asignaciones
+            # (si se crean en el mismo flush, la asignación ya está en la lista)
+            continue
+        elif isinstance(obj, models.User):
+            user_ids |= versioning.attribute_values(obj, "user_id")
+        elif isinstance(obj, models.Person):
+            person_ids |= versioning.attribute_values(obj, "person_id")
+        elif isinstance(obj, models.Gender):
+            gender_ids |= versioning.attribute_values(obj, "gender_id")
+        elif isinstance(obj, models.Training):
+            training_ids |= versioning.attribute_values(obj, "training_id")
+        elif isinstance(obj, models.Team):
+            team_ids |= versioning.attribute_values(obj, "team_id")
+    if not (assignment_ids or user_ids or client_ids or person_ids or gender_ids or training_ids or team_ids):
+        return None
+
+    def condition(table):
+        conditions = []
+        if assignment_ids:
+            conditions.append(table.assignment_id.in_(assignment_ids))
+        if person_ids:
+            person_users = select(models.User.user_id).where(models.User.person_id.in_(person_ids)).correlate(None)
+            conditions += [table.user_id.in_(person_users), table.instructor_id.in_(person_users)]
+        if user_ids:
+            conditions += [table.user_id.in_(user_ids), table.instructor_id.in_(user_ids)]
+        if client_ids:
+            conditions.append(table.user_id.in_(client_ids))
+        if gender_ids:
+            conditions.append(table.user_id.in_(
+                select(models.User.user_id).join(
+                    models.Person, models.User.person_id == models.Person.person_id
+                ).where(models.Person.person_gender.in_(gender_ids)).correlate(None)
+            ))
+        if training_ids:
+            conditions.append(table.training_id.in_(training_ids))
+        if team_ids:
+            conditions.append(table.user_id.in_(
+                select(models.TeamMember.user_id).where(models.TeamMember.team_id.in_(team_ids)).correlate(None)
+            ))
+        # correlate(None): dentro de source_query las subconsultas no deben tomar per_m_user
+        # ni per_m_person de la consulta exterior
+        return or_(*conditions)
+
+    return condition
+
+
+@event.listens_for(Session, "before_flush")
+def collect_modified(session, flush_context, instances):
+    session.info["assignment_view_modified"] = [
+        obj for obj in session.dirty
+        if isinstance(obj, versioning.ASSIGNMENT_VIEW_MODELS) and session.is_modified(obj, include_collections=False)
+    ]
+
+
+@event.listens_for(Session, "after_flush")
+def refresh_after_flush(session, flush_context):
+    objects = [(obj, True) for obj in session.new] + [
+        (obj, False) for obj in list(session.deleted) + session.info.pop("assignment_view_modified", [])
+    ]
+    objects = [(obj, is_new) for obj, is_new in objects if isinstance(obj, versioning.ASSIGNMENT_VIEW_MODELS)]
+    if not objects:
+        return
+    affected = affected_condition(objects)
+    if affected is not None:
+        only_new = all(is_new and isinstance(obj, models.UserTrainingAssignment) for obj, is_new in objects)
+        refresh(session.connection(), affected, only_new)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def mark_bulk_statement(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and issubclass(mapper.class_, versioning.ASSIGNMENT_VIEW_MODELS):
+        orm_execute_state.session.info["assignment_view_rebuild"] = True
+
+
+@event.listens_for(Session, "before_commit")
+def rebuild_before_commit(session):
+    if session.info.pop("assignment_view_rebuild", False):
+        rebuild(session.connection())
+
+
+@event.listens_for(Session, "after_rollback")
+def discard_rebuild(session):
+    session.info.pop("assignment_view_rebuild", None)
@@ -0,0 +1,280 @@
+import os
+import json
+import base64
+import asyncio
+from urllib.parse import urlsplit
+
+from starlette.exceptions import HTTPException
+
+import bulkhead
+from database import SessionLocal, batch_session
+
+# ================================
+# SOLICITUDES EN LOTE (POST /api/v1/batch)
+# ================================
+# Las páginas de React piden al montarse 5 a 15 listas a la vez (roles, géneros,
+# tecnologías, capacitaciones, equipos, materiales, progreso). Con una conexión lenta
+# pesan más los viajes de ida y vuelta que las consultas, así que el cliente puede
+# mandarlas juntas:
+#   {"requests": [{"id": "roles", "url": "/api/v1/roles"},
+#                 {"id": "teams", "url": "/api/v1/teams?expand=members"},
+#                 {"id": "done", "method": "PUT", "url": "/api/v1/...", "body": {...}}]}
+# y recibe {"responses": [{"id", "status", "headers", "body"}, ...]} en el mismo orden.
+#
+# Cada subsolicitud pasa por el router de la aplicación dentro del mismo proceso (sin
+# HTTP, sin CORS, compresión ni bulkheads: esos ya se aplicaron al lote), con los
+# encabezados del lote más los suyos (If-None-Match sirve igual que en una solicitud
+# suelta). Por eso el lote solo admite rutas livianas de la API: Power BI, reportes y
+# warehouse (clase analytics, con su propio límite y cola) y las descargas de archivos
+# (clase download) se rechazan con 400; además sus respuestas en streaming, parquet o
+# binarias se juntarían completas en memoria.
+#
+# Orden de ejecución:
+#   - los GET sin depends_on son independientes y corren a la vez (hasta
+#     BATCH_CONCURRENCY en paralelo)
+#   - una escritura (POST/PUT/PATCH/DELETE) espera a todo lo anterior del lote, y lo
+#     que viene después espera a la escritura: el lote ve sus propios cambios en orden
+#   - depends_on: ["id"] espera a esas subsolicitudes; si alguna falló (>= 400) esta no
+#     se ejecuta y responde 424
+#
+# Sesiones: una Session no se puede usar desde dos hilos a la vez, así que el lote abre
+# una por carril de concurrencia (como mucho BATCH_CONCURRENCY) y cada subsolicitud toma
+# una libre (database.batch_session, que get_db respeta). Las subsolicitudes de un mismo
+# carril comparten el identity map: roles, géneros o capacitaciones que ya cargó una no
+# se vuelven a construir en la siguiente. Después de cada escritura se expiran todas
+# para que las lecturas siguientes vean los cambios.
+
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "20"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+ALLOWED_METHODS = ("GET",) + WRITE_METHODS
+# El propio lote no se anida, el flujo de eventos no termina nunca y las rutas de
+# analytics no saltan su bulkhead
+EXCLUDED_PATHS = ("/api/v1/batch", "/api/v1/events") + bulkhead.ANALYTICS_PREFIXES
+# Encabezados del lote que no pasan a las subsolicitudes
+DROPPED_HEADERS = {"content-length", "content-type", "accept-encoding", "transfer-encoding"}
+# Encabezados de la respuesta que se devuelven al cliente
+RETURNED_HEADERS = ("content-type", "etag", "last-modified", "cache-control", "location", "retry-after")
+
+
+class BatchError(ValueError):
+    pass
+
+
+def validate(items):
+    """
+    Revisar el lote antes de ejecutar nada. Retorna los ids (el índice si no se indicó).
+    Lanza BatchError con el primer problema encontrado.
+    """
+    if not items:
+        raise BatchError("El lote no tiene solicitudes")
+    if len(items) > BATCH_MAX_REQUESTS:
+        raise BatchError(f"El lote admite como máximo {BATCH_MAX_REQUESTS} solicitudes ({len(items)} recibidas)")
+    ids = []
+    for index, item in enumerate(items):
+        request_id = item.id if item.id is not None else str(index)
+        if request_id in ids:
+            raise BatchError(f"Id repetido en el lote: {request_id}")
+        if item.method.upper() not in ALLOWED_METHODS:
+            raise BatchError(f"Método no permitido en {request_id}: {item.method}")
+        path = urlsplit(item.url).path
+        if not item.url.startswith("/api/v1/") or path.startswith(EXCLUDED_PATHS):
+            raise BatchError(f"URL no permitida en {request_id}: {item.url}")
+        if bulkhead.is_download(path):
+            raise BatchError(f"Las descargas de archivos no se admiten en el lote ({request_id}): {item.url}")
+        for dependency in item.depends_on:
+            # Solo hacia atrás: así no puede haber ciclos
+            if dependency not in ids:
+                raise BatchError(f"{request_id} depende de '{dependency}', que no está antes en el lote")
+        ids.append(request_id)
+    return ids
+
+
+def sub_scope(parent_scope, item):
+    """
+    Scope ASGI de una subsolicitud a partir del scope del lote
+    """
+    url = urlsplit(item.url)
+    headers = [
+        (name, value) for name, value in parent_scope["headers"]
+        if name.decode("latin-1").lower() not in DROPPED_HEADERS
+    ]
+    own = {name.lower(): value for name, value in (item.headers or {}).items()}
+    headers = [(name, value) for name, value in headers if name.decode("latin-1").lower() not in own]
+    headers += [(name.encode("latin-1"), str(value).encode("latin-1")) for name, value in own.items()]
+    body = b""
+    if item.body is not None:
+        body = json.dumps(item.body).encode()
+        headers += [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    # Se conservan app, state, cliente, los manejadores de excepciones y la pila de
+    # middleware de FastAPI del lote; la ruta y sus pilas de dependencias las pone el router
+    scope = {
+        key: value for key, value in parent_scope.items()
+        if key not in ("path", "raw_path", "query_string", "headers", "method", "route", "endpoint", "path_params")
+    }
+    scope.update({
+        "method": item.method.upper(),
+        "path": url.path,
+        "raw_path": url.path.encode(),
+        "query_string": url.query.encode(),
+        "headers": headers,
+        "root_path": parent_scope.get("root_path", ""),
+    })
+    return scope, body
+
+
+def decode_body(content_type: str, body: bytes):
+    if not body:
+        return None
+    if "json" in content_type:
+        return json.loads(body)
+    if content_type.startswith("text/"):
+        return body.decode("utf-8", errors="replace")
+    return base64.b64encode(body).decode()
+
+
+async def dispatch(router, parent_scope, item):
+    """
+    Ejecutar una subsolicitud en el router y juntar su respuesta completa
+    """
+    scope, body = sub_scope(parent_scope, item)
+    received = False
+    response = {"status": 500, "headers": [], "body": []}
+
+    async def receive():
+        nonlocal received
+        if received:
+            # El router no vuelve a leer; esperar como lo haría una conexión abierta
+            await asyncio.Event().wait()
+        received = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = message.get("headers", [])
+        elif message["type"] == "http.response.body":
+            response["body"].append(message.get("body", b""))
+
+    await router(scope, receive, send)
+    headers = {}
+    for name, value in response["headers"]:
+        name = name.decode("latin-1").lower()
+        if name in RETURNED_HEADERS:
+            headers[name] = value.decode("latin-1")
+    raw = b"".join(response["body"])
+    return {
+        "status": response["status"],
+        "headers": headers,
+        "body": decode_body(headers.get("content-type", ""), raw),
+    }
+
+
+class SessionLanes:
+    """
+    Sesiones del lote, una por subsolicitud en ejecución, reutilizadas entre ellas
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self.sessions = []
+        self.idle = asyncio.Queue()
+
+    async def acquire(self):
+        if self.idle.empty() and len(self.sessions) < self.size:
+            session = SessionLocal()
+            self.sessions.append(session)
+            return session
+        return await self.idle.get()
+
+    def release(self, session, failed: bool):
+        if failed:
+            # Una subsolicitud que falló puede dejar cambios a medias en la sesión
+            session.rollback()
+        self.idle.put_nowait(session)
+
+    def expire_all(self):
+        # Solo se llama cuando ninguna subsolicitud está usando las sesiones
+        for session in self.sessions:
+            session.rollback()
+            session.expire_all()
+
+    def close(self):
+        for session in self.sessions:
+            session.close()
+
+
+async def run(router, parent_scope, items, ids):
+    """
+    Ejecutar el lote respetando escrituras y depends_on. Retorna las respuestas en orden.
+    """
+    lanes = SessionLanes(min(BATCH_CONCURRENCY, len(items)))
+    tasks = {}
+    results = {}
+
+    async def execute(index, item, waits_for):
+        request_id = ids[index]
+        for dependency in waits_for:
+            await asyncio.shield(tasks[dependency])
+        failed = [
+            dependency for dependency in item.depends_on
+            if results[dependency]["status"] >= 400
+        ]
+        if failed:
+            return {
+                "id": request_id,
+                "status": 424,
+                "headers": {"content-type": "application/json"},
+                "body": {"detail": f"No se ejecutó: falló {', '.join(failed)}"},
+            }
+        session = await lanes.acquire()
+        token = batch_session.set(session)
+        response = None
+        try:
+            response = await dispatch(router, parent_scope, item)
+        except HTTPException as e:
+            # 404/405 del propio router (sin ruta para esa URL o ese método)
+            response = {
+                "status": e.status_code,
+                "headers": {"content-type": "application/json"},
+                "body": {"detail": e.detail},
+            }
+        except Exception as e:
+            response = {
+                "status": 500,
+                "headers": {"content-type": "application/json"},
+                "body": {"detail": f"Error interno: {e.__class__.__name__}"},
+            }
+        finally:
+            batch_session.reset(token)
+            is_write = item.method.upper() in WRITE_METHODS
+            lanes.release(session, failed=is_write or response is None or response["status"] >= 400)
+            if is_write:
+                lanes.expire_all()
+        return {"id": request_id, **response}
+
+    async def run_one(index, item, waits_for):
+        results[ids[index]] = await execute(index, item, waits_for)
+        return results[ids[index]]
+
+    last_write = None
+    try:
+        for index, item in enumerate(items):
+            if item.method.upper() in WRITE_METHODS:
+                waits_for = list(ids[:index])
+            else:
+                waits_for = list(item.depends_on)
+                if last_write is not None:
+                    waits_for.append(last_write)
+            tasks[ids[index]] = asyncio.create_task(run_one(index, item, dict.fromkeys(waits_for)))
+            if item.method.upper() in WRITE_METHODS:
+                last_write = ids[index]
+        return [await tasks[request_id] for request_id in ids]
+    finally:
+        # Si el lote se corta (cliente desconectado), esperar a que las subsolicitudes en
+        # curso suelten su sesión antes de cerrarlas
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        lanes.close()
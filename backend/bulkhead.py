@@ -0,0 +1,223 @@
+import os
+import re
+import asyncio
+from collections import deque
+
+import anyio
+from starlette.responses import JSONResponse
+
+# ================================
+# BULKHEADS POR CLASE DE RUTA
+# ================================
+# Las rutas síncronas comparten el threadpool de Starlette. Para que unas cuantas
+# descargas de Power BI o asignaciones masivas no dejen el login esperando, cada clase
+# de ruta tiene su propio límite de solicitudes concurrentes y una cola acotada:
+#   auth       /api/v1/auth/*
+#   analytics  /api/v1/powerbi/*, /api/v1/reports/*, /api/v1/warehouse/*
+#   download   GET/HEAD de archivos (/api/v1/training-materials/{id}/file, /api/v1/jobs/{id}/download)
+#   write      POST/PUT/PATCH/DELETE
+#   read       el resto de los GET
+# Una descarga ocupa su cupo durante toda la transferencia (un video puede tardar minutos)
+# aunque el handler ya terminó; con su propia clase, los alumnos viendo videos no
+# dejan sin cupo a las lecturas de la API.
+# Si la cola de una clase está llena, o la espera supera BULKHEAD_QUEUE_TIMEOUT_SECONDS,
+# la solicitud se rechaza con 503 + Retry-After sin ocupar un hilo.
+# El threadpool se dimensiona con la suma de los límites (más BULKHEAD_THREADPOOL_SPARE
+# hilos para las tareas de fondo), así cada clase siempre tiene hilos disponibles.
+
+DEFAULT_LIMITS = {"auth": 4, "read": 16, "write": 8, "analytics": 4, "download": 32}
+DEFAULT_QUEUES = {"auth": 64, "read": 128, "write": 64, "analytics": 8, "download": 64}
+
+ANALYTICS_PREFIXES = ("/api/v1/powerbi/", "/api/v1/reports", "/api/v1/warehouse/")
+AUTH_PREFIXES = ("/api/v1/auth/",)
+DOWNLOAD_PATTERNS = (
+    re.compile(r"^/api/v1/training-materials/[^/]+/file$"),
+    re.compile(r"^/api/v1/jobs/[^/]+/download$"),
+)
+# Documentación, métricas y preflight CORS no pasan por los bulkheads.
+# Tampoco el flujo de eventos: sus conexiones duran horas y no ocupan hilos
+# (tiene su propio límite, EVENTS_MAX_CONNECTIONS).
+EXEMPT_PATHS = ("/docs", "/redoc", "/openapi.json", "/api/v1/metrics", "/api/v1/events")
+
+BULKHEAD_QUEUE_TIMEOUT_SECONDS = float(os.getenv("BULKHEAD_QUEUE_TIMEOUT_SECONDS", "10"))
+BULKHEAD_RETRY_AFTER_SECONDS = int(os.getenv("BULKHEAD_RETRY_AFTER_SECONDS", "5"))
+BULKHEAD_THREADPOOL_SPARE = int(os.getenv("BULKHEAD_THREADPOOL_SPARE", "8"))
+
+
+def parse_sizes(value: str, defaults: dict):
+    """
+    "analytics=2,read=32" -> límites por clase (las no mencionadas conservan el valor por defecto)
+    """
+    sizes = dict(defaults)
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, size = item.partition("=")
+        if name.strip() not in defaults:
+            raise ValueError(f"Clase de ruta desconocida: {name}")
+        sizes[name.strip()] = int(size)
+    return sizes
+
+
+BULKHEAD_LIMITS = parse_sizes(os.getenv("BULKHEAD_LIMITS", ""), DEFAULT_LIMITS)
+BULKHEAD_QUEUES = parse_sizes(os.getenv("BULKHEAD_QUEUES", ""), DEFAULT_QUEUES)
+
+
+def is_download(path: str) -> bool:
+    return any(pattern.match(path) for pattern in DOWNLOAD_PATTERNS)
+
+
+def route_class(method: str, path: str):
+    """
+    Clase de la solicitud, o None si no está sujeta a bulkheads
+    """
+    if method == "OPTIONS" or path.startswith(EXEMPT_PATHS):
+        return None
+    if path.startswith(AUTH_PREFIXES):
+        return "auth"
+    if path.startswith(ANALYTICS_PREFIXES):
+        return "analytics"
+    if method in ("GET", "HEAD") and is_download(path):
+        return "download"
+    if method in ("POST", "PUT", "PATCH", "DELETE"):
+        return "write"
+    return "read"
+
+
+class Bulkhead:
+    """
+    Límite de concurrencia con cola FIFO acotada.
+    No usa primitivas de asyncio ligadas a un event loop, así sirve con cualquier loop.
+    """
+
+    def __init__(self, name: str, limit: int, max_queue: int):
+        self.name = name
+        self.limit = limit
+        self.max_queue = max_queue
+        self.active = 0
+        self._waiters = deque()
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.peak_active = 0
+        self.peak_queue = 0
+
+    async def acquire(self, timeout: float) -> bool:
+        if self.active < self.limit and not self._waiters:
+            self._admit()
+            return True
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.peak_queue = max(self.peak_queue, len(self._waiters))
+        try:
+            await asyncio.wait({waiter}, timeout=timeout)
+        except BaseException:
+            # Cliente desconectado mientras esperaba: devolver el cupo si ya se lo habían pasado
+            self._abandon(waiter)
+            raise
+        if waiter.done():
+            # release() ya contó este cupo como activo
+            self.admitted += 1
+            return True
+        self._abandon(waiter)
+        self.timed_out += 1
+        return False
+
+    def _admit(self):
+        self.active += 1
+        self.admitted += 1
+        self.peak_active = max(self.peak_active, self.active)
+
+    def _abandon(self, waiter):
+        if waiter.done() and not waiter.cancelled():
+            self.release()
+            return
+        waiter.cancel()
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def release(self):
+        # El cupo pasa directamente al siguiente en la cola (active no cambia)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def status(self):
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queued": len(self._waiters),
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "peak_active": self.peak_active,
+            "peak_queue": self.peak_queue,
+        }
+
+
+bulkheads = {
+    name: Bulkhead(name, BULKHEAD_LIMITS[name], BULKHEAD_QUEUES[name]) for name in DEFAULT_LIMITS
+}
+
+
+def threadpool_size() -> int:
+    return sum(BULKHEAD_LIMITS.values()) + BULKHEAD_THREADPOOL_SPARE
+
+
+def configure_threadpool():
+    """
+    Ajustar el threadpool por defecto de anyio a la suma de los límites (llamar dentro del loop)
+    """
+    anyio.to_thread.current_default_thread_limiter().total_tokens = threadpool_size()
+
+
+def metrics():
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    return {
+        "route_classes": {name: bulkhead.status() for name, bulkhead in bulkheads.items()},
+        "threadpool": {
+            "total": limiter.total_tokens,
+            "busy": limiter.borrowed_tokens,
+        },
+        "queue_timeout_seconds": BULKHEAD_QUEUE_TIMEOUT_SECONDS,
+    }
+
+
+class BulkheadMiddleware:
+    """
+    Middleware ASGI que admite cada solicitud en el bulkhead de su clase o la rechaza con 503
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        name = route_class(scope["method"], scope["path"])
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        bulkhead = bulkheads[name]
+        if not await bulkhead.acquire(BULKHEAD_QUEUE_TIMEOUT_SECONDS):
+            response = JSONResponse(
+                status_code=503,
+                content={"detail": "Servidor ocupado, intente nuevamente en unos segundos"},
+                headers={"Retry-After": str(BULKHEAD_RETRY_AFTER_SECONDS), "X-Route-Class": name},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            bulkhead.release()
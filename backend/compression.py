@@ -0,0 +1,245 @@
+import os
+import zlib
+from contextvars import ContextVar
+
+import anyio
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin el paquete solo se ofrece gzip
+    brotli = None
+
+# ================================
+# COMPRESIÓN DE RESPUESTAS
+# ================================
+# Las listas anidadas repiten los mismos bloques de persona, género y rol en cada fila
+# y se comprimen 10-20x. El middleware negocia gzip (o br si está instalado brotli)
+# según Accept-Encoding y solo comprime cuerpos de al menos COMPRESSION_MIN_SIZE bytes.
+# Los cuerpos grandes se comprimen en un hilo para no bloquear el event loop.
+# Las respuestas servidas desde caché (snapshots de Power BI) guardan sus bytes ya
+# comprimidos y el middleware las deja pasar tal cual (ya traen Content-Encoding).
+# Tampoco se tocan las respuestas parciales (206 / Content-Range: los desplazamientos
+# se refieren a los bytes sin comprimir) ni las que traen un ETag fuerte (archivos de
+# materiales): un ETag fuerte identifica esos bytes exactos y no puede repetirse en
+# la versión comprimida. Los ETag de la API son débiles y se comprimen igual.
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# Desde este tamaño la compresión se hace fuera del event loop
+COMPRESSION_OFFLOAD_SIZE = int(os.getenv("COMPRESSION_OFFLOAD_SIZE", "65536"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+
+# En orden de preferencia cuando el cliente acepta varias con el mismo peso
+SUPPORTED_ENCODINGS = ["br", "gzip"] if brotli else ["gzip"]
+
+COMPRESSIBLE_TYPES = {
+    "application/json",
+    "application/x-ndjson",
+    "application/xml",
+    "application/javascript",
+}
+
+# Codificación negociada para la solicitud en curso (la usan las rutas que sirven caché)
+_requested_encoding = ContextVar("requested_encoding", default=None)
+
+
+def negotiate(accept_encoding: str):
+    """
+    Elegir la codificación soportada con mayor peso q en Accept-Encoding (None si ninguna)
+    """
+    weights = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        quality = weights.get(encoding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def requested_encoding():
+    return _requested_encoding.get()
+
+
+# Server-Sent Events: cada evento debe llegar apenas se envía, sin pasar por el compresor
+UNCOMPRESSED_TYPES = {"text/event-stream"}
+
+
+def is_compressible(content_type: str) -> bool:
+    media_type = content_type.split(";")[0].strip().lower()
+    if media_type in UNCOMPRESSED_TYPES:
+        return False
+    return media_type.startswith("text/") or media_type in COMPRESSIBLE_TYPES or media_type.endswith("+json")
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=COMPRESSION_BROTLI_QUALITY)
+    compressor = gzip_compressor()
+    return compressor.compress(body) + compressor.flush()
+
+
+def gzip_compressor():
+    # wbits=31: formato gzip (cabecera y CRC) en lugar de zlib crudo
+    return zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+
+def encode_cached(body: bytes, cache: dict, encoding: str = None):
+    """
+    Versión comprimida de un cuerpo cacheado, calculada una sola vez por codificación.
+    Retorna (bytes, codificación) o (body, None) si no corresponde comprimir.
+    """
+    encoding = encoding or requested_encoding()
+    if encoding is None or len(body) < COMPRESSION_MIN_SIZE:
+        return body, None
+    compressed = cache.get(encoding)
+    if compressed is None:
+        compressed = cache[encoding] = compress(body, encoding)
+    return compressed, encoding
+
+
+class StreamCompressor:
+    """
+    Compresión incremental para respuestas enviadas en varios fragmentos
+    """
+
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+        else:
+            self._compressor = gzip_compressor()
+        self.encoding = encoding
+
+    def chunk(self, data: bytes) -> bytes:
+        # Cada fragmento se vacía al cliente para no retener filas ya leídas
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.finish()
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+async def run_compression(function, data: bytes) -> bytes:
+    if len(data) >= COMPRESSION_OFFLOAD_SIZE:
+        return await anyio.to_thread.run_sync(function, data)
+    return function(data)
+
+
+class CompressionMiddleware:
+    """
+    Middleware ASGI que comprime las respuestas de texto/JSON según Accept-Encoding
+    """
+
+    def __init__(self, app, minimum_size: int = None):
+        self.app = app
+        self.minimum_size = COMPRESSION_MIN_SIZE if minimum_size is None else minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        token = _requested_encoding.set(encoding)
+        try:
+            await CompressionResponder(self.app, encoding, self.minimum_size)(scope, receive, send)
+        finally:
+            _requested_encoding.reset(token)
+
+
+def is_strong_etag(etag) -> bool:
+    return bool(etag) and not etag.startswith("W/")
+
+
+class CompressionResponder:
+    def __init__(self, app, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send = None
+        self.start_message = None
+        # None: aún no se decide; True: se comprime; False: se envía sin tocar
+        self.active = None
+        self.compressor = None
+
+    async def __call__(self, scope, receive, send):
+        self.send = send
+        await self.app(scope, receive, self.send_with_compression)
+
+    async def send_with_compression(self, message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            # Se retiene hasta ver el primer fragmento del cuerpo
+            self.start_message = message
+            return
+        if message_type != "http.response.body":
+            # Otras extensiones (p. ej. pathsend) se envían sin comprimir
+            if self.active is None and self.start_message is not None:
+                self.active = False
+                await self.send(self.start_message)
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.active is None:
+            headers = Headers(raw=self.start_message["headers"])
+            self.active = (
+                "content-encoding" not in headers
+                and self.start_message["status"] != 206
+                and "content-range" not in headers
+                and not is_strong_etag(headers.get("etag"))
+                and is_compressible(headers.get("content-type", ""))
+                and (more_body or len(body) >= self.minimum_size)
+            )
+            if not self.active:
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body:
+                compressed = await run_compression(lambda data: compress(data, self.encoding), body)
+                headers["Content-Length"] = str(len(compressed))
+                await self.send(self.start_message)
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+
+            # Respuesta en streaming: se comprime cada fragmento a medida que llega
+            del headers["Content-Length"]
+            self.compressor = StreamCompressor(self.encoding)
+            await self.send(self.start_message)
+
+        elif not self.active:
+            await self.send(message)
+            return
+
+        if more_body:
+            data = await run_compression(self.compressor.chunk, body)
+        else:
+            data = await run_compression(self.compressor.finish, body)
+        await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
@@ -1,8 +1,9 @@
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
+from contextvars import ContextVar
 import json
 
 # Por ahora usamos SQLite local y luego sincronizamos con Turso via API
@@ -14,10 +15,28 @@ engine = create_engine(
     echo=False
 )
 
+@event.listens_for(engine, "connect")
+def configure_sqlite(dbapi_connection, connection_record):
+    # WAL permite leer mientras otro worker escribe; busy_timeout espera en lugar de fallar
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Sesión prestada por POST /api/v1/batch: las subsolicitudes de un lote reutilizan las
+# sesiones del lote (y su identity map) en lugar de abrir una por solicitud. Quien la
+# presta es quien la cierra.
+batch_session = ContextVar("batch_session", default=None)
+
 def get_db():
+    shared = batch_session.get()
+    if shared is not None:
+        yield shared
+        return
     db = SessionLocal()
     try:
         yield db
@@ -0,0 +1,582 @@
+import os
+import re
+import json
+import time
+import asyncio
+import itertools
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import event, select, insert, delete, func, inspect
+from sqlalchemy.orm.base import NO_VALUE
+
+import models
+from database import SessionLocal, engine
+
+# ================================
+# EVENTOS EN TIEMPO REAL (SERVER-SENT EVENTS)
+# ================================
+# Los dashboards se suscriben a GET /api/v1/events?topics=user:5,team:2 en lugar de
+# volver a pedir las listas de asignaciones y progreso cada cierto tiempo.
+#
+# Las escrituras hechas con SessionLocal sobre asignaciones, progreso (tecnologías y
+# materiales) y miembros de equipo generan un evento pequeño con solo lo que cambió.
+# Se publican al confirmarse la transacción (un rollback los descarta) en los temas:
+#   user:{user_id}          el cliente (y el instructor de la asignación)
+#   team:{team_id}          los equipos activos del cliente
+#   training:{training_id}  la capacitación
+#
+# Cada conexión abierta es solo una corrutina esperando en su cola (no ocupa hilos),
+# así un event loop mantiene miles de dashboards inactivos.
+#
+# Backends del bus (EVENTS_BACKEND):
+#   memory    reparto dentro del proceso (un solo worker, o desarrollo)
+#   database  los eventos se guardan en sys_t_event y cada worker los lee de ahí,
+#             así llegan a los clientes conectados a cualquier worker (serve.py)
+
+EVENTS_BACKEND = os.getenv("EVENTS_BACKEND", "memory")
+# Eventos pendientes por conexión; si un cliente lento la llena se le pide resincronizar
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "256"))
+EVENTS_MAX_CONNECTIONS = int(os.getenv("EVENTS_MAX_CONNECTIONS", "10000"))
+EVENTS_MAX_TOPICS = int(os.getenv("EVENTS_MAX_TOPICS", "50"))
+# Comentario periódico para que proxies y balanceadores no corten la conexión inactiva
+EVENTS_KEEPALIVE_SECONDS = float(os.getenv("EVENTS_KEEPALIVE_SECONDS", "15"))
+# Eventos recientes que se reenvían a un cliente que se reconecta con Last-Event-ID
+EVENTS_HISTORY_SIZE = int(os.getenv("EVENTS_HISTORY_SIZE", "1000"))
+# Backend database: frecuencia de lectura y tiempo que se conservan los eventos
+EVENTS_POLL_SECONDS = float(os.getenv("EVENTS_POLL_SECONDS", "0.5"))
+EVENTS_RETENTION_SECONDS = int(os.getenv("EVENTS_RETENTION_SECONDS", "300"))
+
+TOPIC_PATTERN = re.compile(r"^(user|team|training):\d+$")
+# Tema que reciben todas las conexiones (p. ej. pedidos de resincronizar)
+BROADCAST_TOPIC = "*"
+RESYNC_EVENT = "resync"
+
+
+class TrackedModel:
+    """
+    Cómo se describe un cambio de un modelo: claves que identifican la fila y campos
+    cuyo cambio interesa a los dashboards (el resto, como updated_at, no genera evento)
+    """
+
+    def __init__(self, name: str, keys, fields):
+        self.name = name
+        self.keys = keys
+        self.fields = fields
+
+
+TRACKED_MODELS = {
+    models.UserTrainingAssignment: TrackedModel(
+        "assignment",
+        keys=("assignment_id", "user_id", "training_id"),
+        fields=("instructor_id", "assignment_status", "completion_percentage", "instructor_meeting_link"),
+    ),
+    models.UserTechnologyProgress: TrackedModel(
+        "technology_progress",
+        keys=("progress_id", "assignment_id", "technology_id"),
+        fields=("is_completed", "completed_at"),
+    ),
+    models.UserMaterialProgress: TrackedModel(
+        "material_progress",
+        keys=("progress_id", "assignment_id", "material_id", "user_id"),
+        fields=("is_completed", "completed_at"),
+    ),
+    models.TeamMember: TrackedModel(
+        "team_member",
+        keys=("team_member_id", "team_id", "user_id"),
+        fields=("member_role", "member_status"),
+    ),
+}
+
+
+def parse_topics(value: str):
+    """
+    "user:5,team:2" -> ["user:5", "team:2"]; ValueError si algún tema no es válido
+    """
+    topics = sorted({topic.strip() for topic in (value or "").split(",") if topic.strip()})
+    if not topics:
+        raise ValueError("Debe indicar al menos un tema (user:{id}, team:{id} o training:{id})")
+    if len(topics) > EVENTS_MAX_TOPICS:
+        raise ValueError(f"Máximo {EVENTS_MAX_TOPICS} temas por conexión")
+    invalid = [topic for topic in topics if not TOPIC_PATTERN.match(topic)]
+    if invalid:
+        raise ValueError(f"Temas inválidos: {', '.join(invalid)}")
+    return topics
+
+
+def plain(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class Event:
+    def __init__(self, event_type: str, topics, data: dict, event_id: int = None):
+        self.id = event_id
+        self.type = event_type
+        self.topics = topics
+        self.data = data
+
+    def encode(self) -> str:
+        """
+        Formato SSE: id, tipo y datos JSON en una línea
+        """
+        return f"id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data, separators=(',', ':'))}\n\n"
+
+
+# ---- Conexiones suscritas (reparto local en cada proceso) ----
+
+class Subscriber:
+    def __init__(self, topics):
+        self.topics = topics
+        self.queue = asyncio.Queue(maxsize=EVENTS_QUEUE_SIZE)
+        self.overflowed = False
+
+    def offer(self, event: Event):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Cliente demasiado lento: se descartan sus eventos y se le pide recargar
+            self.overflowed = True
+
+
+class EventBus:
+    """
+    Reparte los eventos publicados a las conexiones de este proceso según sus temas.
+    publish() se puede llamar desde cualquier hilo; el reparto ocurre en el event loop.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.loop = None
+        self._subscriptions = {}
+        self._subscribers = set()
+        self.published = 0
+        self.delivered = 0
+        self.overflows = 0
+
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        await self.backend.start(self)
+
+    async def stop(self):
+        await self.backend.stop()
+        self.loop = None
+
+    def publish(self, events):
+        if events:
+            self.published += len(events)
+            self.backend.publish(events)
+
+    def deliver(self, events):
+        # Llamado por el backend desde cualquier hilo
+        loop = self.loop
+        if loop is None or not self._subscribers:
+            return
+        try:
+            loop.call_soon_threadsafe(self.dispatch, events)
+        except RuntimeError:
+            # El loop se está cerrando
+            pass
+
+    def dispatch(self, events):
+        for event in events:
+            if BROADCAST_TOPIC in event.topics:
+                targets = self._subscribers
+            else:
+                targets = set()
+                for topic in event.topics:
+                    targets.update(self._subscriptions.get(topic, ()))
+            for subscriber in targets:
+                was_overflowed = subscriber.overflowed
+                subscriber.offer(event)
+                if subscriber.overflowed and not was_overflowed:
+                    self.overflows += 1
+            self.delivered += len(targets)
+
+    def subscribe(self, topics) -> Subscriber:
+        subscriber = Subscriber(topics)
+        for topic in topics:
+            self._subscriptions.setdefault(topic, set()).add(subscriber)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        for topic in subscriber.topics:
+            subscribers = self._subscriptions.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscriptions[topic]
+        self._subscribers.discard(subscriber)
+
+    @property
+    def connections(self) -> int:
+        return len(self._subscribers)
+
+    def status(self):
+        return {
+            "backend": self.backend.name,
+            "connections": self.connections,
+            "topics": len(self._subscriptions),
+            "published": self.published,
+            "delivered": self.delivered,
+            "overflows": self.overflows,
+        }
+
+
+# ---- Backends ----
+
+class MemoryBackend:
+    """
+    Eventos dentro del proceso. Los ids parten del reloj para seguir creciendo
+    después de un reinicio (un Last-Event-ID viejo se detecta como fuera del historial).
+    """
+
+    name = "memory"
+
+    def __init__(self):
+        self.bus = None
+        self._ids = itertools.count(time.time_ns() // 1000)
+        self._history = deque(maxlen=EVENTS_HISTORY_SIZE)
+        self._lock = threading.Lock()
+
+    async def start(self, bus):
+        self.bus = bus
+
+    async def stop(self):
+        pass
+
+    def publish(self, events):
+        with self._lock:
+            for event in events:
+                event.id = next(self._ids)
+                self._history.append(event)
+        if self.bus is not None:
+            self.bus.deliver(events)
+
+    async def replay(self, last_event_id: int, topics):
+        """
+        Eventos posteriores a last_event_id para estos temas, o None si ya no están en el historial
+        """
+        with self._lock:
+            history = list(self._history)
+        if not history or last_event_id < history[0].id - 1:
+            return None
+        topics = set(topics) | {BROADCAST_TOPIC}
+        return [event for event in history if event.id > last_event_id and topics.intersection(event.topics)]
+
+
+class DatabaseBackend:
+    """
+    Eventos guardados en sys_t_event: cada worker lee los nuevos y los reparte a sus
+    propias conexiones. Escribe con el engine directamente (fuera de SessionLocal).
+    """
+
+    name = "database"
+
+    def __init__(self):
+        self.bus = None
+        self.last_id = 0
+        self._task = None
+        self._last_purge = 0.0
+
+    async def start(self, bus):
+        self.bus = bus
+        self.last_id = await asyncio.to_thread(self.max_event_id)
+        self._task = asyncio.create_task(self.poll_forever())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def max_event_id(self) -> int:
+        with engine.connect() as connection:
+            return connection.execute(select(func.max(models.Event.event_id))).scalar() or 0
+
+    def publish(self, events):
+        now = datetime.utcnow()
+        with engine.begin() as connection:
+            connection.execute(insert(models.Event.__table__), [
+                {
+                    "event_type": event.type,
+                    "event_topics": ",".join(event.topics),
+                    "event_data": json.dumps(event.data, separators=(",", ":")),
+                    "event_created_at": now,
+                }
+                for event in events
+            ])
+        # Los eventos llegan a las conexiones (también las de este worker) por poll_forever
+
+    def read_after(self, last_event_id: int, limit: int = 1000):
+        with engine.connect() as connection:
+            rows = connection.execute(
+                select(models.Event.event_id, models.Event.event_type, models.Event.event_topics, models.Event.event_data)
+                .where(models.Event.event_id > last_event_id)
+                .order_by(models.Event.event_id)
+                .limit(limit)
+            ).all()
+        return [
+            Event(event_type, topics.split(","), json.loads(data), event_id)
+            for event_id, event_type, topics, data in rows
+        ]
+
+    def purge(self):
+        cutoff = datetime.utcnow() - timedelta(seconds=EVENTS_RETENTION_SECONDS)
+        with engine.begin() as connection:
+            connection.execute(delete(models.Event.__table__).where(models.Event.event_created_at < cutoff))
+
+    async def poll_forever(self):
+        while True:
+            try:
+                events = await asyncio.to_thread(self.read_after, self.last_id)
+                if events:
+                    self.last_id = events[-1].id
+                    self.bus.dispatch(events)
+                if time.monotonic() - self._last_purge > 60:
+                    self._last_purge = time.monotonic()
+                    await asyncio.to_thread(self.purge)
+            except Exception as e:
+                print(f"Error leyendo eventos: {e}")
+            await asyncio.sleep(EVENTS_POLL_SECONDS)
+
+    async def replay(self, last_event_id: int, topics):
+        oldest = await asyncio.to_thread(self.read_after, 0, 1)
+        if not oldest or last_event_id < oldest[0].id - 1:
+            return None
+        topics = set(topics) | {BROADCAST_TOPIC}
+        events = await asyncio.to_thread(self.read_after, last_event_id, EVENTS_HISTORY_SIZE)
+        return [event for event in events if topics.intersection(event.topics)]
+
+
+BACKENDS = {"memory": MemoryBackend, "database": DatabaseBackend}
+
+
+def create_backend(name: str):
+    if name not in BACKENDS:
+        raise ValueError(f"EVENTS_BACKEND inválido: {name}. Opciones: {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
+
+
+bus = EventBus(create_backend(EVENTS_BACKEND))
+
+
+# ---- Captura de cambios en SessionLocal ----
+
+def current_value(obj, name: str):
+    # Sin disparar una carga: en una fila eliminada no se puede volver a leer
+    value = inspect(obj).attrs[name].loaded_value
+    return None if value is NO_VALUE else plain(value)
+
+
+def key_values(obj, name: str):
+    """
+    Valor actual y anterior de una clave (si cambió, el evento va a los temas de ambos)
+    """
+    history = inspect(obj).attrs[name].history
+    values = set(history.added or ()) | set(history.deleted or ()) | set(history.unchanged or ())
+    return {value for value in values if value is not None}
+
+
+def describe_change(obj, tracked: TrackedModel, action: str):
+    """
+    Datos del evento: las claves y, según la acción, la fila (created) o solo lo que cambió (updated)
+    """
+    data = {name: current_value(obj, name) for name in tracked.keys}
+    if action == "created":
+        data.update({name: current_value(obj, name) for name in tracked.fields})
+    elif action == "updated":
+        changes = {}
+        for name in tracked.keys + tracked.fields:
+            if inspect(obj).attrs[name].history.has_changes():
+                changes[name] = current_value(obj, name)
+        if not changes:
+            return None
+        data["changes"] = changes
+    return data
+
+
+def related_topics(connection, changes):
+    """
+    Temas de cada cambio. Las consultas se agrupan: una para los datos de las
+    asignaciones referidas por el progreso y otra para los equipos de los usuarios.
+    """
+    assignments = {}
+    missing = set()
+    for obj, tracked, action, data in changes:
+        if isinstance(obj, models.UserTrainingAssignment):
+            assignments[obj.assignment_id] = (obj.user_id, obj.training_id, obj.instructor_id)
+    for obj, tracked, action, data in changes:
+        if isinstance(obj, (models.UserTechnologyProgress, models.UserMaterialProgress)):
+            missing.update(key_values(obj, "assignment_id") - set(assignments))
+    if missing:
+        for assignment_id, user_id, training_id, instructor_id in connection.execute(
+            select(
+                models.UserTrainingAssignment.assignment_id, models.UserTrainingAssignment.user_id,
+                models.UserTrainingAssignment.training_id, models.UserTrainingAssignment.instructor_id,
+            ).where(models.UserTrainingAssignment.assignment_id.in_(missing))
+        ):
+            assignments[assignment_id] = (user_id, training_id, instructor_id)
+
+    per_change = []
+    user_ids = set()
+    for obj, tracked, action, data in changes:
+        users, trainings, teams = set(), set(), set()
+        if isinstance(obj, models.UserTrainingAssignment):
+            users |= key_values(obj, "user_id") | key_values(obj, "instructor_id")
+            trainings |= key_values(obj, "training_id")
+        elif isinstance(obj, models.TeamMember):
+            users |= key_values(obj, "user_id")
+            teams |= key_values(obj, "team_id")
+        else:
+            for assignment_id in key_values(obj, "assignment_id"):
+                if assignment_id in assignments:
+                    user_id, training_id, instructor_id = assignments[assignment_id]
+                    users.update(value for value in (user_id, instructor_id) if value is not None)
+                    trainings.add(training_id)
+            if isinstance(obj, models.UserMaterialProgress):
+                users |= key_values(obj, "user_id")
+        if not isinstance(obj, models.TeamMember):
+            user_ids |= users
+        per_change.append((users, trainings, teams))
+
+    teams_by_user = {}
+    if user_ids:
+        for team_id, user_id in connection.execute(
+            select(models.TeamMember.team_id, models.TeamMember.user_id).where(
+                models.TeamMember.user_id.in_(user_ids),
+                models.TeamMember.member_status == 'A',
+            )
+        ):
+            teams_by_user.setdefault(user_id, set()).add(team_id)
+
+    result = []
+    for (obj, tracked, action, data), (users, trainings, teams) in zip(changes, per_change):
+        if not isinstance(obj, models.TeamMember):
+            for user_id in users:
+                teams |= teams_by_user.get(user_id, set())
+        topics = (
+            [f"user:{user_id}" for user_id in sorted(users)]
+            + [f"team:{team_id}" for team_id in sorted(teams)]
+            + [f"training:{training_id}" for training_id in sorted(trainings)]
+        )
+        result.append(Event(f"{tracked.name}.{action}", topics, data))
+    return result
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def collect_modified(session, flush_context, instances):
+    session.info["events_modified"] = [
+        obj for obj in session.dirty
+        if type(obj) in TRACKED_MODELS and session.is_modified(obj, include_collections=False)
+    ]
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def collect_events(session, flush_context):
+    changes = []
+    for objects, action in (
+        (session.new, "created"),
+        (session.info.pop("events_modified", []), "updated"),
+        (session.deleted, "deleted"),
+    ):
+        for obj in objects:
+            tracked = TRACKED_MODELS.get(type(obj))
+            if tracked is None:
+                continue
+            data = describe_change(obj, tracked, action)
+            if data is not None:
+                changes.append((obj, tracked, action, data))
+    if changes:
+        session.info.setdefault("events_pending", []).extend(related_topics(session.connection(), changes))
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def collect_bulk_statement(orm_execute_state):
+    # En las sentencias masivas no se sabe qué filas cambiaron: se pide a los clientes recargar
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+        return
+    mapper = orm_execute_state.bind_mapper
+    tracked = TRACKED_MODELS.get(mapper.class_) if mapper is not None else None
+    if tracked is not None:
+        orm_execute_state.session.info.setdefault("events_pending", []).append(
+            Event(RESYNC_EVENT, [BROADCAST_TOPIC], {"reason": tracked.name})
+        )
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def publish_committed(session):
+    pending = session.info.pop("events_pending", None)
+    if not pending:
+        return
+    try:
+        bus.publish(pending)
+    except Exception as e:
+        # Un fallo del bus no debe afectar la escritura ya confirmada
+        print(f"Error publicando eventos: {e}")
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def discard_rolled_back(session):
+    session.info.pop("events_pending", None)
+
+
+# ---- Flujo SSE de una conexión ----
+
+def resync_event(reason: str, event_id: int = 0):
+    return Event(RESYNC_EVENT, [BROADCAST_TOPIC], {"reason": reason}, event_id)
+
+
+async def missed_events(last_event_id, topics):
+    """
+    Eventos a reenviar a un cliente que se reconecta con Last-Event-ID.
+    Si ya no están en el historial se le pide recargar sus datos.
+    """
+    if last_event_id is None:
+        return []
+    try:
+        last_event_id = int(last_event_id)
+    except ValueError:
+        return [resync_event("history")]
+    replay = await bus.backend.replay(last_event_id, topics)
+    if replay is None:
+        return [resync_event("history", last_event_id)]
+    return replay
+
+
+async def stream(subscriber: Subscriber, initial):
+    """
+    Generador del cuerpo text/event-stream. Se cancela cuando el cliente se desconecta.
+    La suscripción se crea antes de leer el historial, así que un evento puede llegar
+    por las dos vías: se descartan los ids ya enviados.
+    """
+    try:
+        # El navegador reintenta la conexión a los 5 s si se corta
+        yield "retry: 5000\n\n"
+        last_sent = 0
+        for event in initial:
+            yield event.encode()
+            last_sent = max(last_sent, event.id)
+        while True:
+            if subscriber.overflowed:
+                yield resync_event("overflow", last_sent).encode()
+                return
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), EVENTS_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event.id <= last_sent:
+                continue
+            yield event.encode()
+            last_sent = event.id
+    finally:
+        bus.unsubscribe(subscriber)
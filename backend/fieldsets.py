@@ -0,0 +1,198 @@
+import typing
+
+from fastapi import Query
+from pydantic import BaseModel
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, selectinload
+
+import models
+import schemas
+
+# ================================
+# CAMPOS Y RELACIONES A PEDIDO (fields= / expand=)
+# ================================
+# Las listas devuelven por defecto el esquema completo (la asignación con el usuario,
+# su persona y género, el rol, la capacitación con sus tecnologías y el instructor).
+# Una tabla que solo muestra nombres puede pedir menos:
+#   fields=assignment_id,assignment_status,user.user_username
+#       solo esos campos; nombrar user.x incluye la relación user con los campos pedidos
+#   expand=user,training
+#       solo esas relaciones (sin sus relaciones anidadas, salvo que se pidan: user.person)
+#   expand=
+#       ninguna relación: solo los campos propios de cada fila
+# Sin expand, un nivel sin lista de campos conserva todas sus relaciones y uno con lista
+# solo las nombradas. Las relaciones que no se piden tampoco se cargan en el SQL.
+# Los nombres válidos salen de los esquemas de respuesta (schemas.py) y de las relaciones
+# de models.py, así que un campo nuevo en el esquema queda disponible sin tocar este módulo.
+
+RESOURCES = {
+    "user": (schemas.User, models.User),
+    "assignment": (schemas.UserTrainingAssignment, models.UserTrainingAssignment),
+    "team": (schemas.Team, models.Team),
+    "material": (schemas.TrainingMaterial, models.TrainingMaterial),
+    "technology_progress": (schemas.UserTechnologyProgress, models.UserTechnologyProgress),
+    "material_progress": (schemas.UserMaterialProgress, models.UserMaterialProgress),
+}
+
+MAX_PATH_DEPTH = 5
+
+
+class FieldsetError(ValueError):
+    pass
+
+
+class Node:
+    """
+    Nivel del árbol de salida: campos propios y relaciones (cada una con su propio nivel)
+    """
+
+    def __init__(self, model, scalars, relations):
+        self.model = model
+        self.scalars = scalars
+        # nombre -> (Node, es_lista)
+        self.relations = relations
+
+    def names(self):
+        return self.scalars + list(self.relations)
+
+
+def nested_schema(annotation):
+    """
+    Esquema Pydantic dentro de una anotación (Optional[X], List[X], X o List['X'])
+    """
+    if isinstance(annotation, typing.ForwardRef):
+        annotation = getattr(schemas, annotation.__forward_arg__, None)
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    for argument in typing.get_args(annotation):
+        schema = nested_schema(argument)
+        if schema is not None:
+            return schema
+    return None
+
+
+def build_tree(schema, model) -> Node:
+    """
+    Árbol completo de un esquema de respuesta, en el mismo orden de campos que el esquema
+    """
+    relationships = inspect(model).relationships
+    scalars, relations = [], {}
+    for name, field in schema.model_fields.items():
+        relationship = relationships.get(name)
+        child_schema = nested_schema(field.annotation) if relationship is not None else None
+        if child_schema is None:
+            scalars.append(name)
+        else:
+            relations[name] = (build_tree(child_schema, relationship.mapper.class_), relationship.uselist)
+    return Node(model, scalars, relations)
+
+
+_trees = {}
+
+
+def full_tree(kind: str) -> Node:
+    if kind not in _trees:
+        _trees[kind] = build_tree(*RESOURCES[kind])
+    return _trees[kind]
+
+
+def split_list(text: str, parameter: str):
+    paths = []
+    for item in text.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        path = tuple(item.split("."))
+        if len(path) > MAX_PATH_DEPTH or not all(path):
+            raise FieldsetError(f"Ruta inválida en {parameter}: {item}")
+        paths.append(path)
+    return paths
+
+
+class FieldSelection:
+    """
+    Parámetros fields= y expand= ya leídos de la URL (aún sin validar contra el recurso)
+    """
+
+    def __init__(self, fields: str = None, expand: str = None):
+        self.fields = fields
+        self.expand = expand
+
+    def is_empty(self) -> bool:
+        return self.fields is None and self.expand is None
+
+    def resolve(self, kind: str) -> Node:
+        """
+        Árbol recortado para el recurso indicado. Lanza FieldsetError si se pide un
+        campo o una relación que el recurso no tiene.
+        """
+        tree = full_tree(kind)
+        fields = {}
+        expanded = set()
+        for path in split_list(self.fields or "", "fields"):
+            # Cada prefijo es una relación: queda incluida y nombrada en su nivel
+            for depth in range(len(path)):
+                fields.setdefault(path[:depth], set()).add(path[depth])
+                if depth:
+                    expanded.add(path[:depth])
+        expand_paths = split_list(self.expand, "expand") if self.expand is not None else None
+        for path in expand_paths or []:
+            for depth in range(1, len(path) + 1):
+                expanded.add(path[:depth])
+
+        # Validar los nombres contra el árbol completo
+        for path in set(fields) | expanded:
+            node = tree
+            for name in path:
+                if name not in node.relations:
+                    raise FieldsetError(f"'{'.'.join(path)}' no es una relación de {kind}")
+                node = node.relations[name][0]
+            for name in fields.get(path, ()):
+                if name not in node.names():
+                    label = ".".join(path) or kind
+                    raise FieldsetError(
+                        f"Campo desconocido '{name}' en {label}; campos válidos: {', '.join(node.names())}"
+                    )
+
+        def prune(node: Node, path) -> Node:
+            level_fields = fields.get(path)
+            scalars = [name for name in node.scalars if level_fields is None or name in level_fields]
+            relations = {}
+            for name, (child, uselist) in node.relations.items():
+                child_path = path + (name,)
+                if child_path in expanded:
+                    include = True
+                elif expand_paths is not None:
+                    include = False
+                else:
+                    include = level_fields is None or name in level_fields
+                if include:
+                    relations[name] = (prune(child, child_path), uselist)
+            return Node(node.model, scalars, relations)
+
+        return prune(tree, ())
+
+
+def field_selection(
+    fields: str = Query(None, description="Campos separados por coma; user.user_username para campos anidados"),
+    expand: str = Query(None, description="Relaciones a incluir separadas por coma (ej: user,training); vacío = ninguna")
+) -> FieldSelection:
+    """
+    Dependencia de FastAPI para las rutas de listas
+    """
+    return FieldSelection(fields, expand)
+
+
+def loader_options(node: Node):
+    """
+    Opciones de carga de SQLAlchemy solo para las relaciones que quedaron en el árbol.
+    Las relaciones a uno van en la misma consulta (joinedload); las listas, en una
+    consulta aparte por nivel (selectinload), como en team_load_options.
+    """
+    options = []
+    for name, (child, uselist) in node.relations.items():
+        attribute = getattr(node.model, name)
+        loader = selectinload(attribute) if uselist else joinedload(attribute)
+        nested = loader_options(child)
+        options.append(loader.options(*nested) if nested else loader)
+    return options
@@ -0,0 +1,436 @@
+import os
+import json
+import time
+import uuid
+import socket
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, func
+
+import models
+from database import SessionLocal
+
+# ================================
+# TRABAJOS EN SEGUNDO PLANO
+# ================================
+# Las operaciones largas (asignación de capacitaciones a un equipo completo, carga de
+# datos iniciales, exportaciones Excel, actualización del warehouse) se encolan en la
+# tabla sys_t_job y las ejecuta un pool de hilos dedicado, fuera de la solicitud HTTP.
+# La solicitud responde 202 con el trabajo y el cliente consulta GET /api/v1/jobs/{id}.
+#
+# Con varios workers (serve.py) cada proceso tiene su propio pool; un trabajo lo toma
+# un único hilo porque el paso queued -> running es un UPDATE condicional.
+# Mientras el handler corre, un hilo de run_job registra un latido cada
+# JOB_HEARTBEAT_SECONDS (haya o no reportes de progreso); si un proceso muere, sus
+# trabajos quedan sin latido y se vuelven a encolar pasados JOB_STALE_SECONDS.
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+# Trabajos esperando como máximo; por encima se rechaza el encolado
+JOB_MAX_QUEUED = int(os.getenv("JOB_MAX_QUEUED", "100"))
+# Tiempo que se conservan los trabajos terminados (y sus archivos) para consultarlos
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", "86400"))
+JOB_STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "600"))
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "60"))
+# Frecuencia con la que se escribe el progreso en la base
+JOB_PROGRESS_INTERVAL_SECONDS = float(os.getenv("JOB_PROGRESS_INTERVAL_SECONDS", "0.5"))
+
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobType:
+    def __init__(self, name: str, handler, priority: int, description: str, retention_seconds: int):
+        self.name = name
+        self.handler = handler
+        self.priority = priority
+        self.description = description
+        self.retention_seconds = retention_seconds
+
+
+JOB_TYPES = {}
+
+
+def register(name: str, priority: int = 0, description: str = "", retention_seconds: int = None):
+    """
+    Registrar un tipo de trabajo. El handler recibe (ctx, db, params) y retorna un dict
+    con el resultado; si genera un archivo lo informa en result["file"] = {path, filename, media_type}.
+    """
+    def decorator(handler):
+        JOB_TYPES[name] = JobType(
+            name, handler, priority, description,
+            JOB_RETENTION_SECONDS if retention_seconds is None else retention_seconds
+        )
+        return handler
+    return decorator
+
+
+def job_to_dict(job: models.Job):
+    result = json.loads(job.job_result) if job.job_result else None
+    has_file = bool(result and result.get("file")) and job.job_status == "completed"
+    if result and result.get("file"):
+        # La ruta en disco no se expone
+        result = {**result, "file": {key: value for key, value in result["file"].items() if key != "path"}}
+    return {
+        "job_id": job.job_id,
+        "job_type": job.job_type,
+        "status": job.job_status,
+        "priority": job.job_priority,
+        "params": json.loads(job.job_params) if job.job_params else {},
+        "progress": job.job_progress,
+        "progress_message": job.job_progress_message,
+        "cancel_requested": job.job_cancel_requested == 'Y',
+        "result": result,
+        "error": job.job_error,
+        "created_at": job.job_created_at.isoformat(),
+        "started_at": job.job_started_at.isoformat() if job.job_started_at else None,
+        "finished_at": job.job_finished_at.isoformat() if job.job_finished_at else None,
+        "expires_at": job.job_expires_at.isoformat() if job.job_expires_at else None,
+        "status_url": f"/api/v1/jobs/{job.job_id}",
+        "download_url": f"/api/v1/jobs/{job.job_id}/download" if has_file else None,
+    }
+
+
+# ---- API para las rutas ----
+
+def count_active(job_type: str = None) -> int:
+    db = SessionLocal()
+    try:
+        query = select(func.count()).select_from(models.Job).where(models.Job.job_status.in_(("queued", "running")))
+        if job_type:
+            query = query.where(models.Job.job_type == job_type)
+        return db.execute(query).scalar()
+    finally:
+        db.close()
+
+
+def enqueue(job_type: str, params: dict = None, priority: int = None) -> dict:
+    if job_type not in JOB_TYPES:
+        raise ValueError(f"Tipo de trabajo desconocido: {job_type}")
+    db = SessionLocal()
+    try:
+        queued = db.execute(
+            select(func.count()).select_from(models.Job).where(models.Job.job_status == "queued")
+        ).scalar()
+        if queued >= JOB_MAX_QUEUED:
+            raise JobQueueFull()
+        job = models.Job(
+            job_id=uuid.uuid4().hex,
+            job_type=job_type,
+            job_priority=JOB_TYPES[job_type].priority if priority is None else priority,
+            job_params=json.dumps(params or {}),
+            job_created_at=datetime.utcnow(),
+        )
+        db.add(job)
+        db.commit()
+        result = job_to_dict(job)
+    finally:
+        db.close()
+    _wakeup.set()
+    return result
+
+
+def get_job(job_id: str) -> models.Job:
+    db = SessionLocal()
+    try:
+        return db.get(models.Job, job_id)
+    finally:
+        db.close()
+
+
+def list_jobs(status: str = None, job_type: str = None, limit: int = 50):
+    db = SessionLocal()
+    try:
+        query = select(models.Job).order_by(models.Job.job_created_at.desc()).limit(limit)
+        if status:
+            query = query.where(models.Job.job_status == status)
+        if job_type:
+            query = query.where(models.Job.job_type == job_type)
+        return [job_to_dict(job) for job in db.execute(query).scalars()]
+    finally:
+        db.close()
+
+
+def cancel_job(job_id: str):
+    """
+    Cancelar un trabajo: si está en cola se cancela en el momento; si está en ejecución
+    se marca y el handler se detiene en su próximo reporte de progreso.
+    """
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        job = db.get(models.Job, job_id)
+        if job is None:
+            return None
+        retention = JOB_TYPES[job.job_type].retention_seconds if job.job_type in JOB_TYPES else JOB_RETENTION_SECONDS
+        db.execute(
+            update(models.Job)
+            .where(models.Job.job_id == job_id, models.Job.job_status == "queued")
+            .values(job_status="cancelled", job_finished_at=now, job_expires_at=now + timedelta(seconds=retention))
+        )
+        db.execute(
+            update(models.Job)
+            .where(models.Job.job_id == job_id, models.Job.job_status == "running")
+            .values(job_cancel_requested='Y')
+        )
+        db.commit()
+        db.refresh(job)
+        return job_to_dict(job)
+    finally:
+        db.close()
+
+
+def result_file(job: models.Job):
+    result = json.loads(job.job_result) if job.job_result else None
+    return result.get("file") if result else None
+
+
+# ---- Ejecución ----
+
+class JobContext:
+    """
+    Lo que recibe el handler: parámetros, reporte de progreso y verificación de cancelación
+    """
+
+    def __init__(self, job_id: str, job_type: str, params: dict):
+        self.job_id = job_id
+        self.job_type = job_type
+        self.params = params
+        self._last_write = 0.0
+
+    def progress(self, percent: int = None, message: str = None, force: bool = False):
+        """
+        Registrar el avance (percent 0-100, o None si no se conoce el total).
+        Lanza JobCancelled si se pidió cancelar el trabajo.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_write < JOB_PROGRESS_INTERVAL_SECONDS:
+            return
+        self._last_write = now
+        values = {"job_heartbeat_at": datetime.utcnow()}
+        if percent is not None:
+            values["job_progress"] = max(0, min(100, int(percent)))
+        if message is not None:
+            values["job_progress_message"] = message[:255]
+        db = SessionLocal()
+        try:
+            db.execute(update(models.Job).where(models.Job.job_id == self.job_id).values(**values))
+            cancel_requested = db.execute(
+                select(models.Job.job_cancel_requested).where(models.Job.job_id == self.job_id)
+            ).scalar()
+            db.commit()
+        finally:
+            db.close()
+        if cancel_requested == 'Y':
+            raise JobCancelled()
+
+
+def claim_next(worker_name: str):
+    """
+    Tomar el trabajo en cola de mayor prioridad (el más antiguo entre iguales)
+    """
+    db = SessionLocal()
+    try:
+        candidates = db.execute(
+            select(models.Job.job_id)
+            .where(models.Job.job_status == "queued", models.Job.job_type.in_(list(JOB_TYPES)))
+            .order_by(models.Job.job_priority.desc(), models.Job.job_created_at)
+            .limit(5)
+        ).scalars().all()
+        for job_id in candidates:
+            now = datetime.utcnow()
+            claimed = db.execute(
+                update(models.Job)
+                .where(models.Job.job_id == job_id, models.Job.job_status == "queued")
+                .values(job_status="running", job_worker=worker_name, job_started_at=now, job_heartbeat_at=now)
+            ).rowcount
+            db.commit()
+            if claimed:
+                job = db.get(models.Job, job_id)
+                return job.job_id, job.job_type, json.loads(job.job_params or "{}")
+        return None
+    finally:
+        db.close()
+
+
+def finish(job_id: str, job_type: str, status: str, result=None, error: str = None):
+    now = datetime.utcnow()
+    values = {
+        "job_status": status,
+        "job_finished_at": now,
+        "job_heartbeat_at": now,
+        "job_expires_at": now + timedelta(seconds=JOB_TYPES[job_type].retention_seconds),
+        "job_error": error,
+    }
+    if status == "completed":
+        values["job_progress"] = 100
+    if result is not None:
+        values["job_result"] = json.dumps(result, default=str)
+    db = SessionLocal()
+    try:
+        db.execute(update(models.Job).where(models.Job.job_id == job_id).values(**values))
+        db.commit()
+    finally:
+        db.close()
+
+
+def heartbeat(job_id: str, stop: threading.Event):
+    """
+    Registrar el latido del trabajo cada JOB_HEARTBEAT_SECONDS hasta que stop se active
+    """
+    while not stop.wait(JOB_HEARTBEAT_SECONDS):
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(models.Job)
+                .where(models.Job.job_id == job_id, models.Job.job_status == "running")
+                .values(job_heartbeat_at=datetime.utcnow())
+            )
+            db.commit()
+        except Exception:
+            # Un latido perdido (base bloqueada) se repite en el siguiente intervalo
+            db.rollback()
+        finally:
+            db.close()
+
+
+def run_job(job_id: str, job_type: str, params: dict):
+    ctx = JobContext(job_id, job_type, params)
+    # Los handlers que no reportan progreso (warehouse completo) también mantienen el latido
+    stop = threading.Event()
+    beat = threading.Thread(target=heartbeat, args=(job_id, stop), name=f"job-heartbeat-{job_id}", daemon=True)
+    beat.start()
+    db = SessionLocal()
+    try:
+        result = JOB_TYPES[job_type].handler(ctx, db, params)
+        finish(job_id, job_type, "completed", result=result)
+    except JobCancelled:
+        db.rollback()
+        finish(job_id, job_type, "cancelled")
+    except Exception as e:
+        db.rollback()
+        # Los handlers reutilizan la validación de las rutas (HTTPException con detail)
+        finish(job_id, job_type, "failed", error=str(getattr(e, "detail", None) or e))
+    finally:
+        stop.set()
+        beat.join()
+        db.close()
+
+
+def requeue_stale():
+    """
+    Volver a encolar los trabajos cuyo proceso dejó de reportar latidos
+    """
+    limit = datetime.utcnow() - timedelta(seconds=JOB_STALE_SECONDS)
+    db = SessionLocal()
+    try:
+        db.execute(
+            update(models.Job)
+            .where(models.Job.job_status == "running", models.Job.job_heartbeat_at < limit)
+            .values(job_status="queued", job_worker=None, job_started_at=None)
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def purge_expired():
+    """
+    Eliminar los trabajos terminados cuyo plazo de retención venció, con sus archivos
+    """
+    db = SessionLocal()
+    try:
+        expired = db.execute(
+            select(models.Job).where(
+                models.Job.job_status.in_(FINISHED_STATUSES),
+                models.Job.job_expires_at <= datetime.utcnow()
+            )
+        ).scalars().all()
+        for job in expired:
+            file = result_file(job)
+            if file and file.get("path") and os.path.exists(file["path"]):
+                os.unlink(file["path"])
+            db.delete(job)
+        db.commit()
+    finally:
+        db.close()
+
+
+_wakeup = threading.Event()
+_stop = threading.Event()
+_threads = []
+_maintenance_lock = threading.Lock()
+_last_maintenance = 0.0
+
+
+def maintenance():
+    global _last_maintenance
+    with _maintenance_lock:
+        if time.monotonic() - _last_maintenance < 60:
+            return
+        _last_maintenance = time.monotonic()
+    requeue_stale()
+    purge_expired()
+
+
+def worker_loop(worker_name: str):
+    while not _stop.is_set():
+        try:
+            maintenance()
+            claimed = claim_next(worker_name)
+        except Exception as e:
+            print(f"Error tomando trabajos ({worker_name}): {e}")
+            claimed = None
+        if claimed is None:
+            _wakeup.wait(JOB_POLL_SECONDS)
+            _wakeup.clear()
+            continue
+        run_job(*claimed)
+
+
+def start_workers(count: int = None):
+    count = JOB_WORKERS if count is None else count
+    if _threads or count <= 0:
+        return
+    _stop.clear()
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    for index in range(count):
+        thread = threading.Thread(target=worker_loop, args=(f"{prefix}:{index}",), name=f"job-worker-{index}", daemon=True)
+        thread.start()
+        _threads.append(thread)
+
+
+def stop_workers(timeout: float = 30):
+    """
+    Detener el pool esperando que terminen los trabajos en curso (hasta timeout segundos).
+    Los que no terminen quedan en ejecución y se reencolan al vencer su latido.
+    """
+    _stop.set()
+    _wakeup.set()
+    deadline = time.monotonic() + timeout
+    for thread in _threads:
+        thread.join(max(0.0, deadline - time.monotonic()))
+    _threads.clear()
+
+
+def queue_status():
+    db = SessionLocal()
+    try:
+        counts = dict(db.execute(
+            select(models.Job.job_status, func.count()).group_by(models.Job.job_status)
+        ).all())
+    finally:
+        db.close()
+    return {
+        "workers": len(_threads),
+        "counts": counts,
+        "types": {name: {"priority": job_type.priority, "description": job_type.description} for name, job_type in JOB_TYPES.items()},
+    }
@@ -0,0 +1,234 @@
+import os
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+import anyio
+from sqlalchemy import or_
+
+import models
+from database import SessionLocal
+
+# Configuración del verificador de enlaces (LINK_CHECK_INTERVAL_SECONDS=0 lo desactiva)
+LINK_CHECK_INTERVAL_SECONDS = int(os.getenv("LINK_CHECK_INTERVAL_SECONDS", "900"))
+LINK_CHECK_CONCURRENCY = int(os.getenv("LINK_CHECK_CONCURRENCY", "20"))
+LINK_CHECK_PER_HOST = int(os.getenv("LINK_CHECK_PER_HOST", "2"))
+LINK_CHECK_HOST_DELAY = float(os.getenv("LINK_CHECK_HOST_DELAY", "0.5"))
+LINK_CHECK_TIMEOUT = float(os.getenv("LINK_CHECK_TIMEOUT", "10"))
+LINK_CHECK_BATCH_SIZE = int(os.getenv("LINK_CHECK_BATCH_SIZE", "500"))
+
+# Re-verificación: enlaces sanos cada 6 horas, enlaces rotos con backoff exponencial
+OK_RECHECK_INTERVAL = timedelta(hours=6)
+BACKOFF_BASE = timedelta(minutes=5)
+BACKOFF_MAX = timedelta(hours=24)
+
+# Respuestas a HEAD que no significan que el enlace esté roto: se reintenta con GET
+HEAD_FALLBACK_STATUSES = {400, 403, 404, 405, 406, 501}
+
+USER_AGENT = "CareerPlan-LinkChecker/1.0"
+
+
+class HostRateLimiter:
+    """
+    Limita las peticiones simultáneas por host y el intervalo mínimo entre peticiones al mismo host
+    """
+
+    def __init__(self, per_host: int, min_interval: float):
+        self.per_host = per_host
+        self.min_interval = min_interval
+        self._semaphores = {}
+        self._next_slot = {}
+
+    @asynccontextmanager
+    async def slot(self, host: str):
+        semaphore = self._semaphores.setdefault(host, asyncio.Semaphore(self.per_host))
+        async with semaphore:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            start = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = start + self.min_interval
+            if start > now:
+                await asyncio.sleep(start - now)
+            yield
+
+
+def next_check_after(consecutive_failures: int, now: datetime) -> datetime:
+    """
+    Calcular la próxima verificación: intervalo fijo si está sano, backoff exponencial si falla
+    """
+    if consecutive_failures == 0:
+        return now + OK_RECHECK_INTERVAL
+    delay = BACKOFF_BASE * (2 ** (consecutive_failures - 1))
+    return now + min(delay, BACKOFF_MAX)
+
+
+async def check_url(client: "httpx.AsyncClient", url: str):
+    """
+    Verificar un enlace con HEAD y, si el servidor no lo soporta, con un GET de un solo byte.
+    Retorna (http_status, ok, error_message).
+    """
+    import httpx
+
+    try:
+        response = await client.head(url)
+        if response.status_code not in HEAD_FALLBACK_STATUSES:
+            return response.status_code, response.status_code < 400, None
+    except httpx.TimeoutException:
+        return None, False, "Tiempo de espera agotado"
+    except httpx.HTTPError:
+        # Algunos servidores cierran la conexión ante HEAD; se intenta con GET
+        pass
+
+    try:
+        # El cuerpo no se descarga: se cierra el stream apenas llegan las cabeceras
+        async with client.stream("GET", url, headers={"Range": "bytes=0-0"}) as response:
+            return response.status_code, response.status_code < 400, None
+    except httpx.TimeoutException:
+        return None, False, "Tiempo de espera agotado"
+    except httpx.HTTPError as e:
+        return None, False, f"{type(e).__name__}: {e}"[:255]
+
+
+async def check_links(
+    targets,
+    concurrency: int = LINK_CHECK_CONCURRENCY,
+    per_host: int = LINK_CHECK_PER_HOST,
+    host_delay: float = LINK_CHECK_HOST_DELAY,
+    timeout: float = LINK_CHECK_TIMEOUT,
+    transport: "httpx.AsyncBaseTransport" = None
+):
+    """
+    Verificar una lista de (material_id, url) en paralelo con concurrencia acotada.
+    Un único cliente reutiliza las conexiones keep-alive entre peticiones al mismo host.
+    """
+    # httpx (con certifi) se carga recién al verificar: no suma al arranque de la API
+    import httpx
+
+    global_slots = asyncio.Semaphore(concurrency)
+    host_limiter = HostRateLimiter(per_host, host_delay)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(
+        timeout=timeout,
+        limits=limits,
+        follow_redirects=True,
+        headers={"User-Agent": USER_AGENT},
+        transport=transport
+    ) as client:
+
+        async def check_one(material_id, url):
+            host = urlsplit(url).netloc.lower()
+            # Primero el cupo del host: esperar a un host lento no ocupa un cupo global
+            async with host_limiter.slot(host):
+                async with global_slots:
+                    http_status, ok, error = await check_url(client, url)
+            return {
+                "material_id": material_id,
+                "url": url,
+                "http_status": http_status,
+                "ok": ok,
+                "error": error
+            }
+
+        return await asyncio.gather(*(check_one(material_id, url) for material_id, url in targets))
+
+
+def load_due_targets(now: datetime, force: bool = False, limit: int = LINK_CHECK_BATCH_SIZE):
+    """
+    Obtener los materiales activos con enlace externo cuya verificación está pendiente
+    """
+    db = SessionLocal()
+    try:
+        query = db.query(
+            models.TrainingMaterial.material_id,
+            models.TrainingMaterial.material_url
+        ).outerjoin(
+            models.MaterialLinkStatus,
+            models.MaterialLinkStatus.material_id == models.TrainingMaterial.material_id
+        ).filter(
+            models.TrainingMaterial.material_status == 'A',
+            # Los archivos subidos se sirven desde este backend y no se verifican
+            models.TrainingMaterial.material_file_sha256.is_(None),
+            or_(
+                models.TrainingMaterial.material_url.like('http://%'),
+                models.TrainingMaterial.material_url.like('https://%')
+            )
+        )
+        if not force:
+            query = query.filter(or_(
+                models.MaterialLinkStatus.status_id.is_(None),
+                models.MaterialLinkStatus.next_check_at <= now,
+                # El instructor cambió el enlace después de la última verificación
+                models.MaterialLinkStatus.checked_url != models.TrainingMaterial.material_url
+            ))
+        return [(row.material_id, row.material_url) for row in query.order_by(
+            models.MaterialLinkStatus.next_check_at.is_not(None),
+            models.MaterialLinkStatus.next_check_at
+        ).limit(limit).all()]
+    finally:
+        db.close()
+
+
+def save_results(results, now: datetime):
+    """
+    Guardar el resultado de cada verificación y programar la siguiente
+    """
+    if not results:
+        return
+    db = SessionLocal()
+    try:
+        existing = {
+            status.material_id: status
+            for status in db.query(models.MaterialLinkStatus).filter(
+                models.MaterialLinkStatus.material_id.in_([r["material_id"] for r in results])
+            ).all()
+        }
+        for result in results:
+            status = existing.get(result["material_id"])
+            if not status:
+                status = models.MaterialLinkStatus(material_id=result["material_id"], consecutive_failures=0)
+                db.add(status)
+            elif status.checked_url != result["url"]:
+                status.consecutive_failures = 0
+
+            status.checked_url = result["url"]
+            status.http_status = result["http_status"]
+            status.is_ok = 'Y' if result["ok"] else 'N'
+            status.error_message = result["error"]
+            status.consecutive_failures = 0 if result["ok"] else status.consecutive_failures + 1
+            status.last_checked_at = now
+            status.next_check_at = next_check_after(status.consecutive_failures, now)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+async def run_check_cycle(force: bool = False):
+    """
+    Ejecutar una pasada del verificador. Retorna la cantidad de enlaces verificados.
+    """
+    now = datetime.utcnow()
+    targets = await anyio.to_thread.run_sync(load_due_targets, now, force)
+    if not targets:
+        return 0
+    results = await check_links(targets)
+    await anyio.to_thread.run_sync(save_results, results, datetime.utcnow())
+    return len(results)
+
+
+async def run_forever(interval: int = LINK_CHECK_INTERVAL_SECONDS):
+    """
+    Tarea de fondo del ciclo de vida de la aplicación
+    """
+    while True:
+        try:
+            await run_check_cycle()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error verificando enlaces de materiales: {e}")
+        await asyncio.sleep(interval)
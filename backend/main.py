@@ -1,48 +1,85 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, status, File, Form, Header, UploadFile, BackgroundTasks, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func
+from sqlalchemy.orm import Session, joinedload, selectinload
 from typing import List
 from datetime import datetime
+from contextlib import asynccontextmanager
+import asyncio
 import models
 import schemas
-from database import engine, get_db
+import storage
+import link_checker
+import powerbi
+import snapshots
+import odata
+import warehouse
+import serializers
+import compression
+import versioning
+import singleflight
+import bulkhead
+import jobs
+import events
+import assignment_view
+import fieldsets
+import batch
+from database import get_db
+import startup
 import warnings
-from passlib.context import CryptContext
 
 # Suprimir warning de bcrypt
 warnings.filterwarnings("ignore", category=UserWarning, module="passlib")
 
-# Eliminar y recrear tablas para limpiar la estructura
-models.Base.metadata.drop_all(bind=engine)
-models.Base.metadata.create_all(bind=engine)
-
-# Crear géneros por defecto si no existen
-def create_default_genders():
-    db = next(get_db())
-    try:
-        if not db.query(models.Gender).first():
-            genders = [
-                models.Gender(gender_name="Masculino"),
-                models.Gender(gender_name="Femenino")
-            ]
-            db.add_all(genders)
-            db.commit()
-    except Exception:
-        db.rollback()
-    finally:
-        db.close()
-
-# Ejecutar al iniciar la aplicación
-create_default_genders()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Crear las tablas y datos por defecto (una sola vez si serve.py ya lo hizo en el proceso maestro)
+    await asyncio.to_thread(startup.initialize_once)
+    
+    # Hilos suficientes para que cada clase de ruta use su límite completo
+    bulkhead.configure_threadpool()
+    
+    # Tareas de fondo que viven mientras la aplicación está levantada.
+    # Las que no deben duplicarse entre workers corren solo en el worker líder.
+    background_tasks = []
+    if link_checker.LINK_CHECK_INTERVAL_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(startup.run_as_leader(link_checker.run_forever)))
+    if snapshots.POWERBI_SNAPSHOT_INTERVAL_SECONDS > 0:
+        # Los snapshots quedan en un almacén compartido que sirven todos los workers
+        background_tasks.append(asyncio.create_task(startup.run_as_leader(snapshots.run_forever)))
+    if warehouse.WAREHOUSE_REFRESH_INTERVAL_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(startup.run_as_leader(warehouse.run_forever)))
+    
+    # Pool de hilos que ejecuta los trabajos encolados (sys_t_job)
+    jobs.start_workers()
+    
+    # Bus de eventos para las conexiones SSE de este worker
+    await events.bus.start()
+    
+    yield
+    
+    await events.bus.stop()
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    await asyncio.to_thread(jobs.stop_workers)
+    startup.leader.release()
 
 app = FastAPI(
     title="Career Plan API",
     description="Sistema de gestión de capacitaciones para Viamatica",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan,
+    # Las respuestas sin response_model (diccionarios armados a mano) se codifican con orjson
+    default_response_class=serializers.FastJSONResponse
 )
 
+# Cortar las subidas de materiales que superan MATERIALS_MAX_UPLOAD_BYTES mientras se reciben.
+# Se agrega antes que CORS (queda por dentro) para que el 413 llegue al navegador con sus cabeceras.
+app.add_middleware(storage.UploadLimitMiddleware)
+
 # Configurar CORS
 app.add_middleware(
     CORSMiddleware,
@@ -56,15 +93,54 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Límites de concurrencia y colas por clase de ruta (auth, read, write, analytics)
+app.add_middleware(bulkhead.BulkheadMiddleware)
+
+# Comprimir respuestas JSON/texto según Accept-Encoding (gzip, o br si está instalado brotli)
+app.add_middleware(compression.CompressionMiddleware)
+
+# Ejecutar una sola vez las solicitudes GET idénticas que llegan a la vez (dashboards, Power BI).
+# Va por fuera de la compresión para compartir también los bytes ya comprimidos.
+app.add_middleware(singleflight.SingleFlightMiddleware)
+
 # Configurar encriptación de contraseñas
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+class LazyCryptContext:
+    """
+    CryptContext de passlib que se construye en el primer uso (login o alta de usuario),
+    para que importar passlib y bcrypt no sume al arranque en frío
+    """
+    def __init__(self, **settings):
+        self._settings = settings
+        self._context = None
+    
+    def __getattr__(self, name):
+        if self._context is None:
+            from passlib.context import CryptContext
+            self._context = CryptContext(**self._settings)
+        return getattr(self._context, name)
+
+pwd_context = LazyCryptContext(schemes=["bcrypt"], deprecated="auto")
 
 @app.get("/", tags=["Health"])
 def root():
     return {"message": "Career Plan API - Sistema de Capacitaciones Viamatica"}
 
-@app.post("/api/v1/init-data", tags=["System"], summary="Inicializar datos del sistema")
-def initialize_data(db: Session = Depends(get_db)):
+def enqueue_job(job_type: str, params: dict = None, priority: int = None):
+    """
+    Encolar un trabajo y responder 202 con su estado (consultar status_url)
+    """
+    try:
+        job = jobs.enqueue(job_type, params, priority)
+    except jobs.JobQueueFull:
+        raise HTTPException(
+            status_code=429,
+            detail="Hay demasiados trabajos en cola, intente nuevamente en unos minutos",
+            headers={"Retry-After": "60"}
+        )
+    return serializers.FastJSONResponse(status_code=status.HTTP_202_ACCEPTED, content=job)
+
+@jobs.register("init-data", priority=5, description="Carga de datos básicos y usuarios de prueba")
+def run_init_data_job(ctx, db, params):
     """
     Inicializa datos básicos del sistema: géneros, roles, posiciones y datos de prueba.
     """
@@ -88,6 +164,7 @@ def initialize_data(db: Session = Depends(get_db)):
         db.add_all(roles)
         
         db.commit()
+        ctx.progress(20, "Roles creados", force=True)
         
         # Crear personas de prueba
         persons = [
@@ -115,6 +192,7 @@ def initialize_data(db: Session = Depends(get_db)):
         ]
         db.add_all(persons)
         db.commit()
+        ctx.progress(40, "Personas creadas", force=True)
         
         # Crear usuarios de prueba
         users = [
@@ -149,8 +227,18 @@ def initialize_data(db: Session = Depends(get_db)):
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al inicializar datos: {str(e)}")
 
-@app.post("/api/v1/init-technologies-trainings", tags=["System"], summary="Inicializar tecnologías y capacitaciones")
-def initialize_technologies_trainings(db: Session = Depends(get_db)):
+@app.post("/api/v1/init-data", status_code=status.HTTP_202_ACCEPTED, tags=["System"], summary="Inicializar datos del sistema")
+def initialize_data(db: Session = Depends(get_db)):
+    """
+    Encola la carga de datos básicos del sistema: géneros, roles, posiciones y datos de prueba.
+    Responde 202 con el trabajo; el avance se consulta en status_url.
+    """
+    if db.query(models.User).first():
+        raise HTTPException(status_code=400, detail="Los datos ya han sido inicializados")
+    return enqueue_job("init-data")
+
+@jobs.register("init-technologies-trainings", priority=5, description="Carga de tecnologías y capacitaciones de prueba")
+def run_init_technologies_trainings_job(ctx, db, params):
     """
     Inicializa tecnologías y capacitaciones de prueba (mitad de los datos).
     """
@@ -216,7 +304,8 @@ def initialize_technologies_trainings(db: Session = Depends(get_db)):
             }
         ]
         
-        for training_data in trainings_data:
+        for index, training_data in enumerate(trainings_data):
+            ctx.progress(index * 100 // len(trainings_data), f"Capacitación {index + 1} de {len(trainings_data)}")
             training = models.Training(
                 training_name=training_data["name"],
                 training_description=training_data["description"]
@@ -242,6 +331,16 @@ def initialize_technologies_trainings(db: Session = Depends(get_db)):
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al inicializar tecnologías: {str(e)}")
 
+@app.post("/api/v1/init-technologies-trainings", status_code=status.HTTP_202_ACCEPTED, tags=["System"], summary="Inicializar tecnologías y capacitaciones")
+def initialize_technologies_trainings(db: Session = Depends(get_db)):
+    """
+    Encola la carga de tecnologías y capacitaciones de prueba (mitad de los datos).
+    Responde 202 con el trabajo; el avance se consulta en status_url.
+    """
+    if db.query(models.Technology).first():
+        raise HTTPException(status_code=400, detail="Las tecnologías ya han sido inicializadas")
+    return enqueue_job("init-technologies-trainings")
+
 @app.post("/api/v1/auth/login", tags=["Authentication"])
 def login(login_data: schemas.Login, db: Session = Depends(get_db)):
     """
@@ -279,12 +378,45 @@ def get_trainings(db: Session = Depends(get_db)):
     """
     return db.query(models.Training).options(joinedload(models.Training.training_technologies).joinedload(models.TrainingTechnology.technology)).all()
 
+def resolve_fieldset(selection: fieldsets.FieldSelection, kind: str):
+    """
+    Árbol de campos pedido con fields= / expand= (None si la lista va completa)
+    """
+    if selection.is_empty():
+        return None
+    try:
+        return selection.resolve(kind)
+    except fieldsets.FieldsetError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def fieldset_response(query, node):
+    """
+    Ejecutar la consulta cargando solo las relaciones pedidas y armar la lista recortada
+    """
+    return serializers.serialize_fieldset(node, query.options(*fieldsets.loader_options(node)).all())
+
+def user_load_options():
+    """
+    Relaciones que necesita schemas.User, cargadas en la misma consulta
+    """
+    return [
+        joinedload(models.User.person).joinedload(models.Person.gender),
+        joinedload(models.User.role)
+    ]
+
 @app.get("/api/v1/users", response_model=List[schemas.User], tags=["Users"])
-def get_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def get_users(skip: int = 0, limit: int = 100, selection: fieldsets.FieldSelection = Depends(fieldsets.field_selection), db: Session = Depends(get_db)):
     """
-    Obtener todos los usuarios con paginación
+    Obtener todos los usuarios con paginación.
+    Con fields= / expand= se devuelven solo los campos y relaciones pedidos.
     """
-    return db.query(models.User).offset(skip).limit(limit).all()
+    node = resolve_fieldset(selection, "user")
+    query = db.query(models.User).order_by(models.User.user_id).offset(skip).limit(limit)
+    if node:
+        return fieldset_response(query, node)
+    users = query.options(*user_load_options()).all()
+    # response_model queda solo para la documentación: la salida se arma sin revalidar
+    return serializers.serialize_list("user", users)
 
 @app.get("/api/v1/users/{user_id}", response_model=schemas.User, tags=["Users"])
 def get_user(user_id: int, db: Session = Depends(get_db)):
@@ -415,13 +547,7 @@ def create_user_training_assignment(assignment: schemas.UserTrainingAssignmentCr
         # Cargar relaciones para la respuesta
         db_assignment = db.query(models.UserTrainingAssignment).filter(
             models.UserTrainingAssignment.assignment_id == db_assignment.assignment_id
-        ).options(
-            joinedload(models.UserTrainingAssignment.user).joinedload(models.User.person).joinedload(models.Person.gender),
-            joinedload(models.UserTrainingAssignment.user).joinedload(models.User.role),
-            joinedload(models.UserTrainingAssignment.training),
-            joinedload(models.UserTrainingAssignment.instructor).joinedload(models.User.person).joinedload(models.Person.gender),
-            joinedload(models.UserTrainingAssignment.instructor).joinedload(models.User.role)
-        ).first()
+        ).options(*assignment_load_options()).first()
         
         return db_assignment
         
@@ -431,45 +557,69 @@ def create_user_training_assignment(assignment: schemas.UserTrainingAssignmentCr
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al crear asignación: {str(e)}")
 
+def assignment_load_options():
+    """
+    Relaciones que necesita schemas.UserTrainingAssignment, cargadas en la misma consulta
+    """
+    return [
+        joinedload(models.UserTrainingAssignment.user).joinedload(models.User.person).joinedload(models.Person.gender),
+        joinedload(models.UserTrainingAssignment.user).joinedload(models.User.role),
+        joinedload(models.UserTrainingAssignment.training).joinedload(models.Training.training_technologies).joinedload(models.TrainingTechnology.technology),
+        joinedload(models.UserTrainingAssignment.instructor).joinedload(models.User.person).joinedload(models.Person.gender),
+        joinedload(models.UserTrainingAssignment.instructor).joinedload(models.User.role)
+    ]
+
 @app.get("/api/v1/user-training-assignments", response_model=List[schemas.UserTrainingAssignment], tags=["Training Assignments"])
-def get_user_training_assignments(db: Session = Depends(get_db)):
+def get_user_training_assignments(selection: fieldsets.FieldSelection = Depends(fieldsets.field_selection), db: Session = Depends(get_db)):
     """
     Obtener todas las asignaciones de capacitación
+    (fields= / expand= para pedir solo algunos campos y relaciones)
     """
-    return db.query(models.UserTrainingAssignment).all()
+    node = resolve_fieldset(selection, "assignment")
+    query = db.query(models.UserTrainingAssignment)
+    if node:
+        return fieldset_response(query, node)
+    assignments = query.options(*assignment_load_options()).all()
+    return serializers.serialize_list("assignment", assignments)
 
 @app.get("/api/v1/user-training-assignments/{assignment_id}", response_model=schemas.UserTrainingAssignment, tags=["Training Assignments"])
 def get_user_training_assignment(assignment_id: int, db: Session = Depends(get_db)):
     """
     Obtener una asignación específica por ID
     """
-    assignment = db.query(models.UserTrainingAssignment).filter(models.UserTrainingAssignment.assignment_id == assignment_id).first()
+    assignment = db.query(models.UserTrainingAssignment).filter(
+        models.UserTrainingAssignment.assignment_id == assignment_id
+    ).options(*assignment_load_options()).first()
     if not assignment:
         raise HTTPException(status_code=404, detail="Asignación no encontrada")
     return assignment
 
 @app.get("/api/v1/user-training-assignments/user/{user_id}", response_model=List[schemas.UserTrainingAssignment], tags=["Training Assignments"])
-def get_user_training_assignments_by_user(user_id: int, db: Session = Depends(get_db)):
+def get_user_training_assignments_by_user(user_id: int, conditional: versioning.ConditionalRequest = Depends(), selection: fieldsets.FieldSelection = Depends(fieldsets.field_selection), db: Session = Depends(get_db)):
     """
-    Obtener todas las asignaciones de capacitación de un usuario específico
+    Obtener todas las asignaciones de capacitación de un usuario específico.
+    Soporta GET condicional (If-None-Match / If-Modified-Since): si no hubo cambios responde 304.
+    Con fields= / expand= se devuelven solo los campos y relaciones pedidos.
     """
+    node = resolve_fieldset(selection, "assignment")
+    state = versioning.resource_state(db, versioning.user_assignments_scopes(user_id))
+    if conditional.is_fresh(state):
+        return state.not_modified()
+    
     # Verificar que el usuario existe
     user = db.query(models.User).filter(models.User.user_id == user_id).first()
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
     # Obtener asignaciones del usuario con todas las relaciones necesarias
-    assignments = db.query(models.UserTrainingAssignment).filter(
+    query = db.query(models.UserTrainingAssignment).filter(
         models.UserTrainingAssignment.user_id == user_id
-    ).options(
-        joinedload(models.UserTrainingAssignment.user).joinedload(models.User.person).joinedload(models.Person.gender),
-        joinedload(models.UserTrainingAssignment.user).joinedload(models.User.role),
-        joinedload(models.UserTrainingAssignment.training).joinedload(models.Training.training_technologies).joinedload(models.TrainingTechnology.technology),
-        joinedload(models.UserTrainingAssignment.instructor).joinedload(models.User.person).joinedload(models.Person.gender),
-        joinedload(models.UserTrainingAssignment.instructor).joinedload(models.User.role)
-    ).all()
+    )
+    if node:
+        return state.apply(fieldset_response(query, node))
+    assignments = query.options(*assignment_load_options()).all()
     
-    return assignments
+    return state.apply(serializers.serialize_list("assignment", assignments))
 
 @app.put("/api/v1/user-training-assignments/training/{training_id}/instructor", tags=["Training Assignments"])
 def assign_instructor_to_training(training_id: int, instructor_data: dict, db: Session = Depends(get_db)):
@@ -515,7 +665,7 @@ def get_users_by_role(role_id: int, db: Session = Depends(get_db)):
     """
     Obtener usuarios filtrados por rol
     """
-    users = db.query(models.User).filter(models.User.user_role == role_id).all()
+    users = db.query(models.User).filter(models.User.user_role == role_id).options(*user_load_options()).all()
     return users
 
 # ENDPOINTS PARA GESTIÓN DE EQUIPOS
@@ -543,57 +693,78 @@ def create_team(team_data: schemas.TeamCreateWithMembers, db: Session = Depends(
     db.add(team)
     db.flush()  # Para obtener el team_id
     
-    # Agregar instructores al equipo
+    # Agregar instructores (rol 4) y clientes (rol 3); los IDs con otro rol se ignoran
+    roles = user_roles(db, list(team_data.instructors) + list(team_data.clients))
+    instructor_ids = {user_id for user_id in team_data.instructors if roles.get(user_id) == 4}
+    client_ids = {user_id for user_id in team_data.clients if roles.get(user_id) == 3}
     for instructor_id in team_data.instructors:
-        instructor = db.query(models.User).filter(
-            models.User.user_id == instructor_id,
-            models.User.user_role == 4  # Rol instructor
-        ).first()
-        
-        if instructor:
-            team_member = models.TeamMember(
-                team_id=team.team_id,
-                user_id=instructor_id,
-                member_role='instructor'
-            )
-            db.add(team_member)
-    
-    # Agregar clientes al equipo
+        if instructor_id in instructor_ids:
+            db.add(models.TeamMember(team_id=team.team_id, user_id=instructor_id, member_role='instructor'))
     for client_id in team_data.clients:
-        client = db.query(models.User).filter(
-            models.User.user_id == client_id,
-            models.User.user_role == 3  # Rol cliente
-        ).first()
-        
-        if client:
-            team_member = models.TeamMember(
-                team_id=team.team_id,
-                user_id=client_id,
-                member_role='client'
-            )
-            db.add(team_member)
+        if client_id in client_ids:
+            db.add(models.TeamMember(team_id=team.team_id, user_id=client_id, member_role='client'))
     
+    team_id = team.team_id
     db.commit()
-    db.refresh(team)
     
-    return team
+    return get_active_team(db, team_id)
+
+def user_roles(db: Session, user_ids):
+    """
+    Rol de cada uno de los user_ids que existen, en una sola consulta
+    """
+    if not user_ids:
+        return {}
+    rows = db.query(models.User.user_id, models.User.user_role).filter(
+        models.User.user_id.in_(set(user_ids))
+    ).all()
+    return {user_id: role_id for user_id, role_id in rows}
+
+def get_active_team(db: Session, team_id: int):
+    """
+    Equipo activo con las relaciones de schemas.Team ya cargadas (None si no existe)
+    """
+    return db.query(models.Team).filter(
+        models.Team.team_id == team_id,
+        models.Team.team_status == 'A'
+    ).options(*team_load_options()).first()
+
+def team_load_options():
+    """
+    Relaciones que necesita schemas.Team, cargadas en la misma consulta
+    """
+    return [
+        joinedload(models.Team.supervisor).joinedload(models.User.person).joinedload(models.Person.gender),
+        joinedload(models.Team.supervisor).joinedload(models.User.role),
+        selectinload(models.Team.team_members).joinedload(models.TeamMember.user).joinedload(models.User.person).joinedload(models.Person.gender),
+        selectinload(models.Team.team_members).joinedload(models.TeamMember.user).joinedload(models.User.role),
+    ]
+
+def team_member_load_options():
+    """
+    Relaciones que necesita schemas.TeamMember
+    """
+    return [joinedload(models.TeamMember.user).options(*user_load_options())]
 
 @app.get("/api/v1/teams", response_model=List[schemas.Team], tags=["Teams"])
-def get_teams(db: Session = Depends(get_db)):
+def get_teams(selection: fieldsets.FieldSelection = Depends(fieldsets.field_selection), db: Session = Depends(get_db)):
     """
     Obtener todos los equipos
+    (fields= / expand= para pedir solo algunos campos y relaciones)
     """
-    return db.query(models.Team).filter(models.Team.team_status == 'A').all()
+    node = resolve_fieldset(selection, "team")
+    query = db.query(models.Team).filter(models.Team.team_status == 'A')
+    if node:
+        return fieldset_response(query, node)
+    teams = query.options(*team_load_options()).all()
+    return serializers.serialize_list("team", teams)
 
 @app.get("/api/v1/teams/{team_id}", response_model=schemas.Team, tags=["Teams"])
 def get_team(team_id: int, db: Session = Depends(get_db)):
     """
     Obtener un equipo específico por ID
     """
-    team = db.query(models.Team).filter(
-        models.Team.team_id == team_id,
-        models.Team.team_status == 'A'
-    ).first()
+    team = get_active_team(db, team_id)
     
     if not team:
         raise HTTPException(status_code=404, detail="Equipo no encontrado")
@@ -601,16 +772,24 @@ def get_team(team_id: int, db: Session = Depends(get_db)):
     return team
 
 @app.get("/api/v1/teams/supervisor/{supervisor_id}", response_model=List[schemas.Team], tags=["Teams"])
-def get_teams_by_supervisor(supervisor_id: int, db: Session = Depends(get_db)):
+def get_teams_by_supervisor(supervisor_id: int, conditional: versioning.ConditionalRequest = Depends(), selection: fieldsets.FieldSelection = Depends(fieldsets.field_selection), db: Session = Depends(get_db)):
     """
-    Obtener equipos asignados a un supervisor específico
+    Obtener equipos asignados a un supervisor específico (con GET condicional y fields= / expand=)
     """
-    teams = db.query(models.Team).filter(
+    node = resolve_fieldset(selection, "team")
+    state = versioning.resource_state(db, versioning.supervisor_teams_scopes(supervisor_id))
+    if conditional.is_fresh(state):
+        return state.not_modified()
+    
+    query = db.query(models.Team).filter(
         models.Team.supervisor_id == supervisor_id,
         models.Team.team_status == 'A'
-    ).all()
+    )
+    if node:
+        return state.apply(fieldset_response(query, node))
+    teams = query.options(*team_load_options()).all()
     
-    return teams
+    return state.apply(serializers.serialize_list("team", teams))
 
 @app.put("/api/v1/teams/{team_id}", response_model=schemas.Team, tags=["Teams"])
 def update_team(team_id: int, team_data: schemas.TeamUpdate, db: Session = Depends(get_db)):
@@ -642,9 +821,8 @@ def update_team(team_id: int, team_data: schemas.TeamUpdate, db: Session = Depen
         team.supervisor_id = team_data.supervisor_id
     
     db.commit()
-    db.refresh(team)
     
-    return team
+    return get_active_team(db, team_id)
 
 @app.delete("/api/v1/teams/{team_id}", tags=["Teams"])
 def delete_team(team_id: int, db: Session = Depends(get_db)):
@@ -723,10 +901,13 @@ def add_team_member(team_id: int, member_data: schemas.TeamMemberBase, db: Sessi
     )
     
     db.add(team_member)
+    db.flush()  # Para obtener el team_member_id antes de que el commit expire el objeto
+    team_member_id = team_member.team_member_id
     db.commit()
-    db.refresh(team_member)
     
-    return team_member
+    return db.query(models.TeamMember).filter(
+        models.TeamMember.team_member_id == team_member_id
+    ).options(*team_member_load_options()).first()
 
 @app.delete("/api/v1/teams/{team_id}/members/{member_id}", tags=["Teams"])
 def remove_team_member(team_id: int, member_id: int, db: Session = Depends(get_db)):
@@ -747,8 +928,21 @@ def remove_team_member(team_id: int, member_id: int, db: Session = Depends(get_d
     
     return {"message": "Miembro removido del equipo exitosamente"}
 
-@app.post("/api/v1/teams/{team_id}/assign-training", tags=["Teams"])
-def assign_training_to_team(team_id: int, training_data: dict, db: Session = Depends(get_db)):
+def users_with_training(db: Session, user_ids, training_id: int, statuses=None):
+    """
+    Subconjunto de user_ids que ya tienen asignada la capacitación (opcionalmente en ciertos estados)
+    """
+    if not user_ids:
+        return set()
+    query = db.query(models.UserTrainingAssignment.user_id).filter(
+        models.UserTrainingAssignment.user_id.in_(set(user_ids)),
+        models.UserTrainingAssignment.training_id == training_id
+    )
+    if statuses:
+        query = query.filter(models.UserTrainingAssignment.assignment_status.in_(statuses))
+    return {row[0] for row in query.all()}
+
+def assign_training_to_team_members(db: Session, team_id: int, training_data: dict, on_progress=None):
     """
     Asignar una capacitación a todos los miembros de un equipo
     """
@@ -799,14 +993,15 @@ def assign_training_to_team(team_id: int, training_data: dict, db: Session = Dep
     assignments_created = []
     assignments_skipped = []
     
-    for team_member in team_clients:
-        # Verificar si el usuario ya tiene esta capacitación asignada
-        existing_assignment = db.query(models.UserTrainingAssignment).filter(
-            models.UserTrainingAssignment.user_id == team_member.user_id,
-            models.UserTrainingAssignment.training_id == training_id
-        ).first()
+    # Usuarios que ya tienen esta capacitación asignada, en una sola consulta
+    assigned_user_ids = users_with_training(db, [member.user_id for member in team_clients], training_id)
+    
+    for index, team_member in enumerate(team_clients):
+        if on_progress:
+            on_progress(index, len(team_clients))
         
-        if existing_assignment:
+        # Verificar si el usuario ya tiene esta capacitación asignada
+        if team_member.user_id in assigned_user_ids:
             assignments_skipped.append({
                 "user_id": team_member.user_id,
                 "reason": "Usuario ya tiene esta capacitación asignada"
@@ -822,6 +1017,7 @@ def assign_training_to_team(team_id: int, training_data: dict, db: Session = Dep
         )
         
         db.add(assignment)
+        assigned_user_ids.add(team_member.user_id)
         assignments_created.append({
             "user_id": team_member.user_id,
             "assignment_id": None  # Se actualizará después del commit
@@ -854,13 +1050,52 @@ def assign_training_to_team(team_id: int, training_data: dict, db: Session = Dep
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al asignar capacitación al equipo: {str(e)}")
 
+@jobs.register("team-assignment", priority=10, description="Asignación de una capacitación a todos los clientes de un equipo")
+def run_team_assignment_job(ctx, db, params):
+    return assign_training_to_team_members(
+        db, params["team_id"], params["training_data"],
+        on_progress=lambda done, total: ctx.progress(done * 100 // total, f"{done} de {total} clientes")
+    )
+
+@app.post("/api/v1/teams/{team_id}/assign-training", tags=["Teams"])
+def assign_training_to_team(team_id: int, training_data: dict, background: bool = False, db: Session = Depends(get_db)):
+    """
+    Asignar una capacitación a todos los miembros de un equipo.
+    Con background=true se encola como trabajo y responde 202 (para equipos grandes).
+    """
+    if background:
+        if not training_data.get("training_id"):
+            raise HTTPException(status_code=400, detail="training_id es requerido")
+        return enqueue_job("team-assignment", {"team_id": team_id, "training_data": training_data})
+    return assign_training_to_team_members(db, team_id, training_data)
+
 # ENDPOINTS PARA MATERIALES DE APOYO
 
+def material_load_options():
+    """
+    Relaciones que necesita schemas.TrainingMaterial, cargadas en la misma consulta
+    """
+    return [
+        joinedload(models.TrainingMaterial.training).selectinload(models.Training.training_technologies).joinedload(models.TrainingTechnology.technology),
+        joinedload(models.TrainingMaterial.instructor).options(*user_load_options())
+    ]
+
+def get_material_for_response(db: Session, material_id: int):
+    return db.query(models.TrainingMaterial).filter(
+        models.TrainingMaterial.material_id == material_id
+    ).options(*material_load_options()).first()
+
 @app.get("/api/v1/training-materials", response_model=List[schemas.TrainingMaterial], tags=["Training Materials"])
-def get_training_materials(instructor_id: int = None, training_id: int = None, db: Session = Depends(get_db)):
+def get_training_materials(response: Response, instructor_id: int = None, training_id: int = None, conditional: versioning.ConditionalRequest = Depends(), selection: fieldsets.FieldSelection = Depends(fieldsets.field_selection), db: Session = Depends(get_db)):
     """
-    Obtener materiales de apoyo con filtros opcionales
+    Obtener materiales de apoyo con filtros opcionales (con GET condicional y fields= / expand=)
     """
+    node = resolve_fieldset(selection, "material")
+    state = versioning.resource_state(db, versioning.training_materials_scopes())
+    if conditional.is_fresh(state):
+        return state.not_modified()
+    state.apply(response)
+    
     query = db.query(models.TrainingMaterial).filter(models.TrainingMaterial.material_status == 'A')
     
     if instructor_id:
@@ -869,7 +1104,35 @@ def get_training_materials(instructor_id: int = None, training_id: int = None, d
     if training_id:
         query = query.filter(models.TrainingMaterial.training_id == training_id)
     
-    return query.all()
+    if node:
+        return state.apply(fieldset_response(query, node))
+    return query.options(*material_load_options()).all()
+
+@app.get("/api/v1/training-materials/link-status", response_model=List[schemas.MaterialLinkStatus], tags=["Training Materials"])
+def get_training_materials_link_status(training_id: int = None, only_broken: bool = False, db: Session = Depends(get_db)):
+    """
+    Obtener el resultado de la última verificación de los enlaces de materiales
+    """
+    query = db.query(models.MaterialLinkStatus).join(
+        models.TrainingMaterial, models.MaterialLinkStatus.material_id == models.TrainingMaterial.material_id
+    ).filter(models.TrainingMaterial.material_status == 'A')
+    
+    if training_id:
+        query = query.filter(models.TrainingMaterial.training_id == training_id)
+    
+    if only_broken:
+        query = query.filter(models.MaterialLinkStatus.is_ok == 'N')
+    
+    return query.order_by(models.MaterialLinkStatus.last_checked_at.desc()).all()
+
+@app.post("/api/v1/training-materials/check-links", status_code=202, tags=["Training Materials"])
+def check_training_materials_links(background_tasks: BackgroundTasks, force: bool = False):
+    """
+    Lanzar una verificación de enlaces en segundo plano.
+    Con force=true se verifican todos los enlaces sin esperar su próxima fecha programada.
+    """
+    background_tasks.add_task(link_checker.run_check_cycle, force)
+    return {"message": "Verificación de enlaces iniciada"}
 
 @app.get("/api/v1/training-materials/{material_id}", response_model=schemas.TrainingMaterial, tags=["Training Materials"])
 def get_training_material(material_id: int, db: Session = Depends(get_db)):
@@ -879,17 +1142,16 @@ def get_training_material(material_id: int, db: Session = Depends(get_db)):
     material = db.query(models.TrainingMaterial).filter(
         models.TrainingMaterial.material_id == material_id,
         models.TrainingMaterial.material_status == 'A'
-    ).first()
+    ).options(*material_load_options()).first()
     
     if not material:
         raise HTTPException(status_code=404, detail="Material no encontrado")
     
     return material
 
-@app.post("/api/v1/training-materials", response_model=schemas.TrainingMaterial, tags=["Training Materials"])
-def create_training_material(material_data: schemas.TrainingMaterialCreate, instructor_id: int, db: Session = Depends(get_db)):
+def verify_instructor_can_publish(db: Session, instructor_id: int, training_id: int):
     """
-    Crear un nuevo material de apoyo
+    Validar que el instructor existe y tiene asignaciones en la capacitación indicada
     """
     # Verificar que el instructor existe y tiene el rol correcto
     instructor = db.query(models.User).filter(
@@ -902,7 +1164,7 @@ def create_training_material(material_data: schemas.TrainingMaterialCreate, inst
     
     # Verificar que la capacitación existe
     training = db.query(models.Training).filter(
-        models.Training.training_id == material_data.training_id,
+        models.Training.training_id == training_id,
         models.Training.training_status == 'A'
     ).first()
     
@@ -911,12 +1173,19 @@ def create_training_material(material_data: schemas.TrainingMaterialCreate, inst
     
     # Verificar que el instructor tiene asignaciones en esta capacitación
     has_assignment = db.query(models.UserTrainingAssignment).filter(
-        models.UserTrainingAssignment.training_id == material_data.training_id,
+        models.UserTrainingAssignment.training_id == training_id,
         models.UserTrainingAssignment.instructor_id == instructor_id
     ).first()
     
     if not has_assignment:
         raise HTTPException(status_code=403, detail="El instructor no tiene asignaciones en esta capacitación")
+
+@app.post("/api/v1/training-materials", response_model=schemas.TrainingMaterial, tags=["Training Materials"])
+def create_training_material(material_data: schemas.TrainingMaterialCreate, instructor_id: int, db: Session = Depends(get_db)):
+    """
+    Crear un nuevo material de apoyo
+    """
+    verify_instructor_can_publish(db, instructor_id, material_data.training_id)
     
     # Crear el material
     material = models.TrainingMaterial(
@@ -929,10 +1198,94 @@ def create_training_material(material_data: schemas.TrainingMaterialCreate, inst
     )
     
     db.add(material)
+    db.flush()  # Para obtener el material_id antes de que el commit expire el objeto
+    material_id = material.material_id
     db.commit()
-    db.refresh(material)
     
-    return material
+    return get_material_for_response(db, material_id)
+
+@app.post("/api/v1/training-materials/upload", response_model=schemas.TrainingMaterial, tags=["Training Materials"])
+def upload_training_material(
+    instructor_id: int,
+    training_id: int = Form(...),
+    material_title: str = Form(...),
+    material_description: str = Form(None),
+    material_type: str = Form(None),
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db)
+):
+    """
+    Subir un archivo como material de apoyo.
+    El archivo se copia al almacén por bloques y se guarda por su SHA-256,
+    por lo que el mismo archivo subido en varias capacitaciones ocupa disco una sola vez.
+    """
+    verify_instructor_can_publish(db, instructor_id, training_id)
+    
+    try:
+        sha256, size, _ = storage.store_stream(file.file)
+    except storage.UploadTooLarge:
+        raise HTTPException(status_code=413, detail="El archivo supera el tamaño máximo permitido")
+    finally:
+        file.file.close()
+    
+    content_type = file.content_type or "application/octet-stream"
+    
+    # Registrar el objeto solo la primera vez que se sube este contenido; con ON CONFLICT
+    # DO NOTHING dos subidas simultáneas del mismo archivo no chocan en la clave primaria
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    db.execute(
+        insert(models.MaterialFile)
+        .values(file_sha256=sha256, file_size=size, file_content_type=content_type)
+        .on_conflict_do_nothing(index_elements=[models.MaterialFile.file_sha256])
+    )
+    
+    if not material_type:
+        material_type = 'video' if content_type.startswith('video/') else 'document'
+    
+    material = models.TrainingMaterial(
+        training_id=training_id,
+        instructor_id=instructor_id,
+        material_title=material_title,
+        material_description=material_description,
+        material_url="",
+        material_type=material_type,
+        material_file_sha256=sha256,
+        material_file_name=file.filename
+    )
+    db.add(material)
+    db.flush()  # Para obtener el material_id
+    material_id = material.material_id
+    
+    material.material_url = f"/api/v1/training-materials/{material_id}/file"
+    
+    db.commit()
+    
+    return get_material_for_response(db, material_id)
+
+@app.api_route("/api/v1/training-materials/{material_id}/file", methods=["GET", "HEAD"], tags=["Training Materials"])
+def download_training_material_file(material_id: int, if_none_match: str = Header(None), db: Session = Depends(get_db)):
+    """
+    Descargar el archivo de un material subido.
+    Soporta Range/If-Range para reproducir videos por partes y ETag para revalidar (304).
+    """
+    row = db.query(
+        models.TrainingMaterial.material_file_name,
+        models.MaterialFile.file_sha256,
+        models.MaterialFile.file_content_type
+    ).join(
+        models.MaterialFile, models.TrainingMaterial.material_file_sha256 == models.MaterialFile.file_sha256
+    ).filter(
+        models.TrainingMaterial.material_id == material_id,
+        models.TrainingMaterial.material_status == 'A'
+    ).first()
+    
+    if not row:
+        raise HTTPException(status_code=404, detail="Archivo no encontrado")
+    
+    return storage.file_response(row.file_sha256, row.material_file_name, row.file_content_type, if_none_match)
 
 @app.put("/api/v1/training-materials/{material_id}", response_model=schemas.TrainingMaterial, tags=["Training Materials"])
 def update_training_material(material_id: int, material_data: schemas.TrainingMaterialUpdate, instructor_id: int, db: Session = Depends(get_db)):
@@ -963,9 +1316,8 @@ def update_training_material(material_id: int, material_data: schemas.TrainingMa
         material.material_type = material_data.material_type
     
     db.commit()
-    db.refresh(material)
     
-    return material
+    return get_material_for_response(db, material_id)
 
 @app.delete("/api/v1/training-materials/{material_id}", tags=["Training Materials"])
 def delete_training_material(material_id: int, instructor_id: int, db: Session = Depends(get_db)):
@@ -1016,8 +1368,7 @@ def get_instructor_assigned_trainings(instructor_id: int, db: Session = Depends(
     
     return assigned_trainings
 
-@app.post("/api/v1/teams/{team_id}/assign-training-to-clients", tags=["Teams"])
-def assign_training_to_specific_clients(team_id: int, assignment_data: dict, db: Session = Depends(get_db)):
+def assign_training_to_team_clients(db: Session, team_id: int, assignment_data: dict, on_progress=None):
     """
     Asignar una capacitación a clientes específicos de un equipo
     """
@@ -1079,15 +1430,15 @@ def assign_training_to_specific_clients(team_id: int, assignment_data: dict, db:
     assignments_created = []
     assignments_skipped = []
     
-    for client_id in valid_client_ids:
-        # Verificar si el usuario ya tiene esta capacitación asignada
-        existing_assignment = db.query(models.UserTrainingAssignment).filter(
-            models.UserTrainingAssignment.user_id == client_id,
-            models.UserTrainingAssignment.training_id == training_id,
-            models.UserTrainingAssignment.assignment_status.in_(['assigned', 'in_progress'])
-        ).first()
+    # Clientes que ya tienen esta capacitación vigente, en una sola consulta
+    assigned_user_ids = users_with_training(db, valid_client_ids, training_id, statuses=['assigned', 'in_progress'])
+    
+    for index, client_id in enumerate(valid_client_ids):
+        if on_progress:
+            on_progress(index, len(valid_client_ids))
         
-        if existing_assignment:
+        # Verificar si el usuario ya tiene esta capacitación asignada
+        if client_id in assigned_user_ids:
             assignments_skipped.append({
                 "user_id": client_id,
                 "reason": "Ya tiene esta capacitación asignada"
@@ -1103,6 +1454,7 @@ def assign_training_to_specific_clients(team_id: int, assignment_data: dict, db:
         )
         
         db.add(assignment)
+        assigned_user_ids.add(client_id)
         assignments_created.append({
             "user_id": client_id,
             "assignment_id": None  # Se actualizará después del commit
@@ -1131,15 +1483,56 @@ def assign_training_to_specific_clients(team_id: int, assignment_data: dict, db:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error al crear las asignaciones: {str(e)}")
 
+@jobs.register("team-client-assignment", priority=10, description="Asignación de una capacitación a clientes seleccionados de un equipo")
+def run_team_client_assignment_job(ctx, db, params):
+    return assign_training_to_team_clients(
+        db, params["team_id"], params["assignment_data"],
+        on_progress=lambda done, total: ctx.progress(done * 100 // total, f"{done} de {total} clientes")
+    )
+
+@app.post("/api/v1/teams/{team_id}/assign-training-to-clients", tags=["Teams"])
+def assign_training_to_specific_clients(team_id: int, assignment_data: dict, background: bool = False, db: Session = Depends(get_db)):
+    """
+    Asignar una capacitación a clientes específicos de un equipo.
+    Con background=true se encola como trabajo y responde 202.
+    """
+    if background:
+        if not assignment_data.get("training_id"):
+            raise HTTPException(status_code=400, detail="training_id es requerido")
+        if not assignment_data.get("client_ids"):
+            raise HTTPException(status_code=400, detail="Debe seleccionar al menos un cliente")
+        return enqueue_job("team-client-assignment", {"team_id": team_id, "assignment_data": assignment_data})
+    return assign_training_to_team_clients(db, team_id, assignment_data)
+
 # ================================
 # ENDPOINTS PARA PROGRESO DE TECNOLOGÍAS
 # ================================
 
+def technology_progress_load_options():
+    """
+    Relaciones que necesita schemas.UserTechnologyProgress, cargadas en la misma consulta
+    """
+    return [
+        joinedload(models.UserTechnologyProgress.technology),
+        joinedload(models.UserTechnologyProgress.assignment).options(*assignment_load_options())
+    ]
+
+def get_technology_progress_for_response(db: Session, progress_id: int):
+    return db.query(models.UserTechnologyProgress).filter(
+        models.UserTechnologyProgress.progress_id == progress_id
+    ).options(*technology_progress_load_options()).first()
+
 @app.get("/api/v1/user-technology-progress/assignment/{assignment_id}", response_model=List[schemas.UserTechnologyProgress], tags=["Progress"])
-def get_technology_progress_by_assignment(assignment_id: int, db: Session = Depends(get_db)):
+def get_technology_progress_by_assignment(assignment_id: int, response: Response, conditional: versioning.ConditionalRequest = Depends(), selection: fieldsets.FieldSelection = Depends(fieldsets.field_selection), db: Session = Depends(get_db)):
     """
-    Obtener progreso de tecnologías para una asignación específica
+    Obtener progreso de tecnologías para una asignación específica (con GET condicional y fields= / expand=)
     """
+    node = resolve_fieldset(selection, "technology_progress")
+    state = versioning.resource_state(db, versioning.technology_progress_scopes(assignment_id))
+    if conditional.is_fresh(state):
+        return state.not_modified()
+    state.apply(response)
+    
     # Verificar que la asignación existe
     assignment = db.query(models.UserTrainingAssignment).filter(
         models.UserTrainingAssignment.assignment_id == assignment_id
@@ -1149,9 +1542,12 @@ def get_technology_progress_by_assignment(assignment_id: int, db: Session = Depe
         raise HTTPException(status_code=404, detail="Asignación no encontrada")
     
     # Obtener progreso existente
-    progress = db.query(models.UserTechnologyProgress).filter(
+    query = db.query(models.UserTechnologyProgress).filter(
         models.UserTechnologyProgress.assignment_id == assignment_id
-    ).all()
+    )
+    if node:
+        return state.apply(fieldset_response(query, node))
+    progress = query.options(*technology_progress_load_options()).all()
     
     return progress
 
@@ -1174,9 +1570,9 @@ def create_technology_progress(progress_data: schemas.UserTechnologyProgressCrea
         else:
             existing_progress.completed_at = None
         
+        progress_id = existing_progress.progress_id
         db.commit()
-        db.refresh(existing_progress)
-        return existing_progress
+        return get_technology_progress_for_response(db, progress_id)
     else:
         # Crear nuevo progreso
         progress = models.UserTechnologyProgress(
@@ -1187,9 +1583,10 @@ def create_technology_progress(progress_data: schemas.UserTechnologyProgressCrea
         )
         
         db.add(progress)
+        db.flush()  # Para obtener el progress_id antes de que el commit expire el objeto
+        progress_id = progress.progress_id
         db.commit()
-        db.refresh(progress)
-        return progress
+        return get_technology_progress_for_response(db, progress_id)
 
 @app.put("/api/v1/user-technology-progress/{progress_id}", response_model=schemas.UserTechnologyProgress, tags=["Progress"])
 def update_technology_progress(progress_id: int, progress_data: schemas.UserTechnologyProgressUpdate, db: Session = Depends(get_db)):
@@ -1210,18 +1607,38 @@ def update_technology_progress(progress_id: int, progress_data: schemas.UserTech
         progress.completed_at = None
     
     db.commit()
-    db.refresh(progress)
-    return progress
+    return get_technology_progress_for_response(db, progress_id)
 
 # ================================
 # ENDPOINTS PARA PROGRESO DE MATERIALES
 # ================================
 
+def material_progress_load_options():
+    """
+    Relaciones que necesita schemas.UserMaterialProgress, cargadas en la misma consulta
+    """
+    return [
+        joinedload(models.UserMaterialProgress.user).options(*user_load_options()),
+        joinedload(models.UserMaterialProgress.material).options(*material_load_options()),
+        joinedload(models.UserMaterialProgress.assignment).options(*assignment_load_options())
+    ]
+
+def get_material_progress_for_response(db: Session, progress_id: int):
+    return db.query(models.UserMaterialProgress).filter(
+        models.UserMaterialProgress.progress_id == progress_id
+    ).options(*material_progress_load_options()).first()
+
 @app.get("/api/v1/user-material-progress/assignment/{assignment_id}", response_model=List[schemas.UserMaterialProgress], tags=["Progress"])
-def get_material_progress_by_assignment(assignment_id: int, db: Session = Depends(get_db)):
+def get_material_progress_by_assignment(assignment_id: int, response: Response, conditional: versioning.ConditionalRequest = Depends(), selection: fieldsets.FieldSelection = Depends(fieldsets.field_selection), db: Session = Depends(get_db)):
     """
-    Obtener progreso de materiales para una asignación específica
+    Obtener progreso de materiales para una asignación específica (con GET condicional y fields= / expand=)
     """
+    node = resolve_fieldset(selection, "material_progress")
+    state = versioning.resource_state(db, versioning.material_progress_scopes(assignment_id))
+    if conditional.is_fresh(state):
+        return state.not_modified()
+    state.apply(response)
+    
     # Verificar que la asignación existe
     assignment = db.query(models.UserTrainingAssignment).filter(
         models.UserTrainingAssignment.assignment_id == assignment_id
@@ -1231,9 +1648,12 @@ def get_material_progress_by_assignment(assignment_id: int, db: Session = Depend
         raise HTTPException(status_code=404, detail="Asignación no encontrada")
     
     # Obtener progreso existente
-    progress = db.query(models.UserMaterialProgress).filter(
+    query = db.query(models.UserMaterialProgress).filter(
         models.UserMaterialProgress.assignment_id == assignment_id
-    ).all()
+    )
+    if node:
+        return state.apply(fieldset_response(query, node))
+    progress = query.options(*material_progress_load_options()).all()
     
     return progress
 
@@ -1257,9 +1677,9 @@ def create_material_progress(progress_data: schemas.UserMaterialProgressCreate,
         else:
             existing_progress.completed_at = None
         
+        progress_id = existing_progress.progress_id
         db.commit()
-        db.refresh(existing_progress)
-        return existing_progress
+        return get_material_progress_for_response(db, progress_id)
     else:
         # Crear nuevo progreso
         progress = models.UserMaterialProgress(
@@ -1271,9 +1691,10 @@ def create_material_progress(progress_data: schemas.UserMaterialProgressCreate,
         )
         
         db.add(progress)
+        db.flush()  # Para obtener el progress_id antes de que el commit expire el objeto
+        progress_id = progress.progress_id
         db.commit()
-        db.refresh(progress)
-        return progress
+        return get_material_progress_for_response(db, progress_id)
 
 @app.put("/api/v1/user-material-progress/{progress_id}", response_model=schemas.UserMaterialProgress, tags=["Progress"])
 def update_material_progress(progress_id: int, progress_data: schemas.UserMaterialProgressUpdate, db: Session = Depends(get_db)):
@@ -1294,12 +1715,14 @@ def update_material_progress(progress_id: int, progress_data: schemas.UserMateri
         progress.completed_at = None
     
     db.commit()
-    db.refresh(progress)
-    return progress
+    return get_material_progress_for_response(db, progress_id)
 #dashboard powerbi
 # Agregar estos imports al inicio
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, FileResponse, Response
+from starlette.background import BackgroundTask
 import json
+import os
+import tempfile
 
 # Agregar estos endpoints al final de tu main.py
 
@@ -1307,302 +1730,512 @@ import json
 # ENDPOINTS ESPECÍFICOS PARA POWER BI
 # ================================
 
+def powerbi_response(db: Session, dataset: str, format: str = "json", since: datetime = None, until: datetime = None, max_age: int = None, options: odata.QueryOptions = None):
+    """
+    Ejecutar un dataset de Power BI (una sola consulta SQL) y armar la respuesta.
+    La carga completa en JSON se sirve desde el snapshot programado (cabecera X-Snapshot-Age);
+    max_age (segundos) exige un snapshot más reciente y max_age=0 lo verifica en el momento.
+    Con format=ndjson|csv las filas se envían a medida que se leen del cursor,
+    con memoria constante sin importar el tamaño del dataset.
+    Con format=parquet|arrow se genera un archivo columnar con diccionarios para los textos repetidos.
+    Con since/until solo se envían las filas modificadas en ese intervalo; la respuesta
+    incluye la marca de agua a usar como since en la próxima actualización.
+    Las opciones $select/$filter/$orderby/$top/$skip se traducen a SQL y se resuelven en la base.
+    """
+    if max_age is not None and max_age < 0:
+        raise HTTPException(status_code=400, detail="max_age no puede ser negativo")
+    
+    has_options = options is not None and not options.is_empty()
+    if has_options:
+        # Validar las opciones antes de empezar a enviar la respuesta
+        try:
+            powerbi.build_query(dataset, options=options)
+        except odata.ODataError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    if format == "json" and since is None and until is None and not has_options and snapshots.SNAPSHOT_INTERVALS[dataset] > 0:
+        try:
+            snapshot = snapshots.get_snapshot(dataset, max_age)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+        headers = {
+            "X-Watermark": snapshot.watermark.isoformat(),
+            "X-Snapshot-Age": str(int(snapshot.age())),
+            "Vary": "Accept-Encoding"
+        }
+        # Los bytes comprimidos también quedan en el snapshot
+        body, encoding = snapshot.encoded()
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type="application/json", headers=headers)
+    
+    since, until, watermark = powerbi.resolve_window(since, until)
+    if since is not None and until <= since:
+        raise HTTPException(status_code=400, detail="until debe ser posterior a since")
+    
+    headers = {"X-Watermark": watermark.isoformat()}
+    
+    if format in powerbi.STREAM_MEDIA_TYPES:
+        if format == "csv":
+            headers["Content-Disposition"] = f'attachment; filename="{dataset}.csv"'
+        return StreamingResponse(
+            powerbi.stream_dataset(dataset, format, since, until, options),
+            media_type=powerbi.STREAM_MEDIA_TYPES[format],
+            headers=headers
+        )
+    
+    if format in powerbi.COLUMNAR_MEDIA_TYPES:
+        fd, path = tempfile.mkstemp(suffix=f".{format}")
+        os.close(fd)
+        try:
+            powerbi.write_columnar(dataset, format, path, since, until, options)
+        except Exception as e:
+            os.unlink(path)
+            raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+        # FileResponse envía Content-Length; el archivo temporal se borra al terminar
+        return FileResponse(
+            path,
+            media_type=powerbi.COLUMNAR_MEDIA_TYPES[format],
+            filename=f"{dataset}.{format}",
+            headers=headers,
+            background=BackgroundTask(os.unlink, path)
+        )
+    
+    if format != "json":
+        raise HTTPException(status_code=400, detail="Formato inválido. Debe ser 'json', 'ndjson', 'csv', 'parquet' o 'arrow'")
+    
+    try:
+        result = powerbi.fetch_dataset(db, dataset, since, until, options)
+        return JSONResponse(
+            {"data": result, "count": len(result), "watermark": watermark.isoformat()},
+            headers=headers
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+
 @app.get("/api/v1/powerbi/users-summary", tags=["Power BI"])
-def get_users_summary_for_powerbi(db: Session = Depends(get_db)):
+def get_users_summary_for_powerbi(format: str = "json", since: datetime = None, until: datetime = None, max_age: int = None, options: odata.QueryOptions = Depends(odata.query_options), db: Session = Depends(get_db)):
     """
     Endpoint optimizado para Power BI - Resumen de usuarios
     """
-    try:
-        users_data = db.query(
-            models.User.user_id,
-            models.User.user_username,
-            models.Person.person_first_name,
-            models.Person.person_last_name,
-            models.Person.person_email,
-            models.Person.person_dni,
-            models.Gender.gender_name,
-            models.Role.role_name,
-            models.User.created_at
-        ).join(
-            models.Person, models.User.person_id == models.Person.person_id
-        ).join(
-            models.Gender, models.Person.person_gender == models.Gender.gender_id
-        ).join(
-            models.Role, models.User.user_role == models.Role.role_id
-        ).all()
-
-        result = []
-        for row in users_data:
-            result.append({
-                "user_id": row.user_id,
-                "username": row.user_username,
-                "full_name": f"{row.person_first_name} {row.person_last_name}",
-                "first_name": row.person_first_name,
-                "last_name": row.person_last_name,
-                "email": row.person_email,
-                "dni": row.person_dni,
-                "gender": row.gender_name,
-                "role": row.role_name,
-                "created_at": row.created_at.isoformat() if row.created_at else None
-            })
-        
-        return {"data": result, "count": len(result)}
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+    return powerbi_response(db, "users-summary", format, since, until, max_age, options)
 
 @app.get("/api/v1/powerbi/trainings-summary", tags=["Power BI"])
-def get_trainings_summary_for_powerbi(db: Session = Depends(get_db)):
+def get_trainings_summary_for_powerbi(format: str = "json", since: datetime = None, until: datetime = None, max_age: int = None, options: odata.QueryOptions = Depends(odata.query_options), db: Session = Depends(get_db)):
     """
     Endpoint optimizado para Power BI - Resumen de capacitaciones
     """
-    try:
-        # Obtener capacitaciones con conteo de asignaciones
-        trainings_query = db.query(
-            models.Training.training_id,
-            models.Training.training_name,
-            models.Training.training_description,
-            models.Training.created_at
-        ).filter(models.Training.training_status == 'A')
-        
-        result = []
-        for training in trainings_query.all():
-            # Contar asignaciones por estado
-            assignments = db.query(models.UserTrainingAssignment).filter(
-                models.UserTrainingAssignment.training_id == training.training_id
-            ).all()
-            
-            # Obtener tecnologías asociadas
-            technologies = db.query(models.Technology.technology_name).join(
-                models.TrainingTechnology,
-                models.Technology.technology_id == models.TrainingTechnology.technology_id
-            ).filter(
-                models.TrainingTechnology.training_id == training.training_id
-            ).all()
-            
-            tech_names = [tech.technology_name for tech in technologies]
-            
-            assignment_stats = {
-                'not_started': len([a for a in assignments if a.assignment_status == 'not_started']),
-                'assigned': len([a for a in assignments if a.assignment_status == 'assigned']),
-                'in_progress': len([a for a in assignments if a.assignment_status == 'in_progress']),
-                'completed': len([a for a in assignments if a.assignment_status == 'completed']),
-                'total': len(assignments)
-            }
-            
-            result.append({
-                "training_id": training.training_id,
-                "training_name": training.training_name,
-                "training_description": training.training_description,
-                "technologies": ", ".join(tech_names),
-                "technology_count": len(tech_names),
-                "created_at": training.created_at.isoformat() if training.created_at else None,
-                **assignment_stats
-            })
-        
-        return {"data": result, "count": len(result)}
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+    return powerbi_response(db, "trainings-summary", format, since, until, max_age, options)
 
 @app.get("/api/v1/powerbi/assignments-detail", tags=["Power BI"])
-def get_assignments_detail_for_powerbi(db: Session = Depends(get_db)):
+def get_assignments_detail_for_powerbi(format: str = "json", since: datetime = None, until: datetime = None, max_age: int = None, options: odata.QueryOptions = Depends(odata.query_options), db: Session = Depends(get_db)):
     """
     Endpoint optimizado para Power BI - Detalle de asignaciones
     """
-    try:
-        assignments_data = db.query(
-            models.UserTrainingAssignment.assignment_id,
-            models.UserTrainingAssignment.assignment_status,
-            models.UserTrainingAssignment.created_at,
-            models.UserTrainingAssignment.updated_at,
-            # Usuario (cliente)
-            models.User.user_id.label('client_id'),
-            models.User.user_username.label('client_username'),
-            models.Person.person_first_name.label('client_first_name'),
-            models.Person.person_last_name.label('client_last_name'),
-            models.Person.person_email.label('client_email'),
-            models.Gender.gender_name.label('client_gender'),
-            # Capacitación
-            models.Training.training_id,
-            models.Training.training_name,
-            models.Training.training_description,
-        ).join(
-            models.User, models.UserTrainingAssignment.user_id == models.User.user_id
-        ).join(
-            models.Person, models.User.person_id == models.Person.person_id
-        ).join(
-            models.Gender, models.Person.person_gender == models.Gender.gender_id
-        ).join(
-            models.Training, models.UserTrainingAssignment.training_id == models.Training.training_id
-        ).all()
-
-        result = []
-        for row in assignments_data:
-            # Obtener instructor si existe
-            instructor_info = None
-            if hasattr(row, 'instructor_id') and row.instructor_id:
-                instructor = db.query(
-                    models.User.user_username,
-                    models.Person.person_first_name,
-                    models.Person.person_last_name
-                ).join(
-                    models.Person, models.User.person_id == models.Person.person_id
-                ).filter(models.User.user_id == row.instructor_id).first()
-                
-                if instructor:
-                    instructor_info = f"{instructor.person_first_name} {instructor.person_last_name}"
-            
-            result.append({
-                "assignment_id": row.assignment_id,
-                "assignment_status": row.assignment_status,
-                "created_at": row.created_at.isoformat() if row.created_at else None,
-                "updated_at": row.updated_at.isoformat() if row.updated_at else None,
-                "client_id": row.client_id,
-                "client_username": row.client_username,
-                "client_name": f"{row.client_first_name} {row.client_last_name}",
-                "client_first_name": row.client_first_name,
-                "client_last_name": row.client_last_name,
-                "client_email": row.client_email,
-                "client_gender": row.client_gender,
-                "training_id": row.training_id,
-                "training_name": row.training_name,
-                "training_description": row.training_description,
-                "instructor_name": instructor_info
-            })
-        
-        return {"data": result, "count": len(result)}
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+    return powerbi_response(db, "assignments-detail", format, since, until, max_age, options)
 
 @app.get("/api/v1/powerbi/teams-summary", tags=["Power BI"])
-def get_teams_summary_for_powerbi(db: Session = Depends(get_db)):
+def get_teams_summary_for_powerbi(format: str = "json", since: datetime = None, until: datetime = None, max_age: int = None, options: odata.QueryOptions = Depends(odata.query_options), db: Session = Depends(get_db)):
     """
     Endpoint optimizado para Power BI - Resumen de equipos
     """
-    try:
-        teams_data = db.query(
-            models.Team.team_id,
-            models.Team.team_name,
-            models.Team.team_description,
-            models.Team.created_at,
-            # Supervisor
-            models.User.user_username.label('supervisor_username'),
-            models.Person.person_first_name.label('supervisor_first_name'),
-            models.Person.person_last_name.label('supervisor_last_name')
-        ).join(
-            models.User, models.Team.supervisor_id == models.User.user_id
-        ).join(
-            models.Person, models.User.person_id == models.Person.person_id
-        ).filter(models.Team.team_status == 'A').all()
-
-        result = []
-        for team in teams_data:
-            # Contar miembros por tipo
-            members = db.query(models.TeamMember).filter(
-                models.TeamMember.team_id == team.team_id,
-                models.TeamMember.member_status == 'A'
-            ).all()
-            
-            member_stats = {
-                'instructors': len([m for m in members if m.member_role == 'instructor']),
-                'clients': len([m for m in members if m.member_role == 'client']),
-                'total_members': len(members)
-            }
-            
-            result.append({
-                "team_id": team.team_id,
-                "team_name": team.team_name,
-                "team_description": team.team_description,
-                "created_at": team.created_at.isoformat() if team.created_at else None,
-                "supervisor_name": f"{team.supervisor_first_name} {team.supervisor_last_name}",
-                "supervisor_username": team.supervisor_username,
-                **member_stats
-            })
-        
-        return {"data": result, "count": len(result)}
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+    return powerbi_response(db, "teams-summary", format, since, until, max_age, options)
 
 @app.get("/api/v1/powerbi/progress-summary", tags=["Power BI"])
-def get_progress_summary_for_powerbi(db: Session = Depends(get_db)):
+def get_progress_summary_for_powerbi(format: str = "json", since: datetime = None, until: datetime = None, max_age: int = None, options: odata.QueryOptions = Depends(odata.query_options), db: Session = Depends(get_db)):
     """
     Endpoint para mostrar progreso general en Power BI
     """
-    try:
-        # Progreso de tecnologías por usuario y capacitación
-        tech_progress = db.query(
-            models.UserTechnologyProgress.assignment_id,
-            models.UserTechnologyProgress.is_completed,
-            models.UserTechnologyProgress.completed_at,
-            models.Technology.technology_name,
-            models.User.user_username,
-            models.Person.person_first_name,
-            models.Person.person_last_name,
-            models.Training.training_name
-        ).join(
-            models.Technology, models.UserTechnologyProgress.technology_id == models.Technology.technology_id
-        ).join(
-            models.UserTrainingAssignment, models.UserTechnologyProgress.assignment_id == models.UserTrainingAssignment.assignment_id
-        ).join(
-            models.User, models.UserTrainingAssignment.user_id == models.User.user_id
-        ).join(
-            models.Person, models.User.person_id == models.Person.person_id
-        ).join(
-            models.Training, models.UserTrainingAssignment.training_id == models.Training.training_id
-        ).all()
-
-        result = []
-        for progress in tech_progress:
-            result.append({
-                "assignment_id": progress.assignment_id,
-                "technology_name": progress.technology_name,
-                "is_completed": progress.is_completed == 'Y',
-                "completed_at": progress.completed_at.isoformat() if progress.completed_at else None,
-                "user_name": f"{progress.person_first_name} {progress.person_last_name}",
-                "username": progress.user_username,
-                "training_name": progress.training_name
-            })
-        
-        return {"data": result, "count": len(result)}
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+    return powerbi_response(db, "progress-summary", format, since, until, max_age, options)
+
+@app.get("/api/v1/powerbi/snapshots", tags=["Power BI"])
+def get_powerbi_snapshots():
+    """
+    Estado de los snapshots programados: antigüedad, filas y tamaño de cada dataset
+    """
+    return {"snapshots": snapshots.snapshot_status()}
 
 # Endpoint general para obtener todas las tablas disponibles
+POWERBI_TABLES = [
+    ("users_summary", "users-summary", "Resumen completo de usuarios con roles y datos personales"),
+    ("trainings_summary", "trainings-summary", "Resumen de capacitaciones con estadísticas de asignaciones"),
+    ("assignments_detail", "assignments-detail", "Detalle completo de asignaciones de capacitaciones"),
+    ("teams_summary", "teams-summary", "Resumen de equipos con contadores de miembros"),
+    ("progress_summary", "progress-summary", "Progreso de tecnologías por usuario y capacitación"),
+]
+
 @app.get("/api/v1/powerbi/tables", tags=["Power BI"])
 def get_available_tables_for_powerbi():
     """
-    Listar todos los endpoints disponibles para Power BI
+    Listar todos los endpoints disponibles para Power BI con sus columnas
+    y las opciones de consulta que se resuelven en la base de datos
     """
     return {
         "available_endpoints": [
             {
-                "name": "users_summary",
-                "url": "/api/v1/powerbi/users-summary",
-                "description": "Resumen completo de usuarios con roles y datos personales"
-            },
-            {
-                "name": "trainings_summary", 
-                "url": "/api/v1/powerbi/trainings-summary",
-                "description": "Resumen de capacitaciones con estadísticas de asignaciones"
-            },
-            {
-                "name": "assignments_detail",
-                "url": "/api/v1/powerbi/assignments-detail", 
-                "description": "Detalle completo de asignaciones de capacitaciones"
-            },
-            {
-                "name": "teams_summary",
-                "url": "/api/v1/powerbi/teams-summary",
-                "description": "Resumen de equipos con contadores de miembros"
-            },
+                "name": name,
+                "url": f"/api/v1/powerbi/{dataset}",
+                "description": description,
+                "columns": odata.describe_columns(powerbi.DATASETS[dataset]())
+            }
+            for name, dataset, description in POWERBI_TABLES
+        ],
+        "query_options": {
+            "$select": "Columnas separadas por coma. Ej: $select=user_id,username",
+            "$filter": "Operadores eq, ne, gt, ge, lt, le, and, or, not y paréntesis sobre las columnas del endpoint. "
+                       "Textos entre comillas simples, fechas ISO 8601, true/false/null. Ej: $filter=role eq 'Cliente' and created_at ge 2025-01-01",
+            "$orderby": "Columnas con asc/desc opcional. Ej: $orderby=created_at desc",
+            "$top": "Cantidad máxima de filas",
+            "$skip": "Filas a omitir"
+        },
+        "formats": ["json", "ndjson", "csv", "parquet", "arrow"],
+        "incremental": "since/until (ISO 8601) devuelven solo las filas modificadas; usar X-Watermark como próximo since"
+    }
+
+# ================================
+# REPORTES EXCEL
+# ================================
+import reports
+
+def get_report_or_404(report: str):
+    if report not in reports.REPORTS:
+        raise HTTPException(status_code=404, detail="Reporte no encontrado")
+    return reports.REPORTS[report]
+
+def export_busy_error():
+    return HTTPException(
+        status_code=429,
+        detail="Hay demasiadas exportaciones en curso, intente nuevamente en unos minutos",
+        headers={"Retry-After": "30"}
+    )
+
+@app.get("/api/v1/reports", tags=["Reports"])
+def get_reports():
+    """
+    Listar los reportes disponibles para exportar a Excel
+    """
+    return {
+        "reports": [
             {
-                "name": "progress_summary",
-                "url": "/api/v1/powerbi/progress-summary",
-                "description": "Progreso de tecnologías por usuario y capacitación"
+                "name": name,
+                "title": report["title"],
+                "description": report["description"],
+                "download_url": f"/api/v1/reports/{name}/xlsx",
+                "export_url": f"/api/v1/reports/{name}/exports"
             }
-        ]
+            for name, report in reports.REPORTS.items()
+        ],
+        "filters": ["team_id", "supervisor_id"]
+    }
+
+@app.get("/api/v1/reports/{report}/xlsx", tags=["Reports"])
+def download_report(report: str, team_id: int = None, supervisor_id: int = None):
+    """
+    Generar y descargar el reporte en el momento (para reportes chicos).
+    Para reportes grandes usar POST /api/v1/reports/{report}/exports.
+    """
+    get_report_or_404(report)
+    os.makedirs(reports.REPORTS_EXPORT_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=".xlsx", dir=reports.REPORTS_EXPORT_DIR)
+    os.close(fd)
+    try:
+        reports.export_now(report, path, team_id, supervisor_id)
+    except reports.ExportBusy:
+        os.unlink(path)
+        raise export_busy_error()
+    except Exception as e:
+        os.unlink(path)
+        raise HTTPException(status_code=500, detail=f"Error generando el reporte: {str(e)}")
+    return FileResponse(
+        path,
+        media_type=reports.XLSX_MEDIA_TYPE,
+        filename=reports.report_filename(report, team_id),
+        background=BackgroundTask(os.unlink, path)
+    )
+
+@app.post("/api/v1/reports/{report}/exports", status_code=status.HTTP_202_ACCEPTED, tags=["Reports"])
+def create_report_export(report: str, team_id: int = None, supervisor_id: int = None):
+    """
+    Encolar la exportación de un reporte. Consultar el estado en status_url
+    y descargar el archivo desde download_url cuando termine.
+    """
+    get_report_or_404(report)
+    try:
+        return reports.submit_export(report, team_id, supervisor_id)
+    except reports.ExportBusy:
+        raise export_busy_error()
+
+@app.get("/api/v1/reports/exports/{job_id}", tags=["Reports"])
+def get_report_export(job_id: str):
+    """
+    Estado de una exportación en segundo plano (equivalente a GET /api/v1/jobs/{job_id})
+    """
+    return jobs.job_to_dict(get_job_or_404(job_id, "report-export"))
+
+@app.get("/api/v1/reports/exports/{job_id}/download", tags=["Reports"])
+def download_report_export(job_id: str):
+    """
+    Descargar el archivo de una exportación terminada
+    """
+    return job_file_response(get_job_or_404(job_id, "report-export"))
+
+# ================================
+# WAREHOUSE ANALÍTICO
+# ================================
+
+@jobs.register("warehouse-refresh", priority=0, description="Actualización del warehouse analítico")
+def run_warehouse_refresh_job(ctx, db, params):
+    return {"tables": warehouse.build_warehouse(full=params.get("full", False))}
+
+@app.post("/api/v1/warehouse/refresh", status_code=status.HTTP_202_ACCEPTED, tags=["Warehouse"])
+def refresh_warehouse(full: bool = False):
+    """
+    Actualizar el warehouse en segundo plano (incremental, o completo con full=true).
+    Responde 202 con el trabajo; el avance se consulta en status_url.
+    """
+    return enqueue_job("warehouse-refresh", {"full": full})
+
+@app.get("/api/v1/warehouse/status", tags=["Warehouse"])
+def get_warehouse_status():
+    """
+    Filas por tabla y marca de agua de la última carga
+    """
+    return warehouse.warehouse_status()
+
+@app.get("/api/v1/warehouse/download", tags=["Warehouse"])
+def download_warehouse():
+    """
+    Descargar el archivo SQLite del warehouse para abrirlo desde la herramienta de BI
+    """
+    if not os.path.exists(warehouse.WAREHOUSE_PATH):
+        raise HTTPException(status_code=404, detail="El warehouse aún no fue generado")
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        warehouse.snapshot_copy(path)
+    except Exception as e:
+        os.unlink(path)
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+    return FileResponse(
+        path,
+        media_type="application/vnd.sqlite3",
+        filename="analytics.db",
+        background=BackgroundTask(os.unlink, path)
+    )
+
+# ================================
+# TRABAJOS EN SEGUNDO PLANO
+# ================================
+
+def get_job_or_404(job_id: str, job_type: str = None):
+    job = jobs.get_job(job_id)
+    if not job or (job_type and job.job_type != job_type):
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado o vencido")
+    return job
+
+def job_file_response(job):
+    if job.job_status != "completed":
+        raise HTTPException(status_code=409, detail=f"El trabajo aún no terminó (estado: {job.job_status})")
+    file = jobs.result_file(job)
+    if not file or not os.path.exists(file["path"]):
+        raise HTTPException(status_code=404, detail="El trabajo no generó un archivo o ya fue eliminado")
+    return FileResponse(file["path"], media_type=file["media_type"], filename=file["filename"])
+
+@app.post("/api/v1/jobs", status_code=status.HTTP_202_ACCEPTED, tags=["Jobs"])
+def create_job(job_data: dict):
+    """
+    Encolar un trabajo: {"job_type": "...", "params": {...}, "priority": 0}.
+    Los tipos disponibles se listan en GET /api/v1/jobs/types.
+    """
+    job_type = job_data.get("job_type")
+    if job_type not in jobs.JOB_TYPES:
+        raise HTTPException(status_code=400, detail=f"Tipo de trabajo inválido. Opciones: {', '.join(jobs.JOB_TYPES)}")
+    params = job_data.get("params") or {}
+    if job_type == "report-export":
+        get_report_or_404(params.get("report"))
+    return enqueue_job(job_type, params, job_data.get("priority"))
+
+@app.get("/api/v1/jobs/types", tags=["Jobs"])
+def get_job_types():
+    """
+    Tipos de trabajo registrados, con su prioridad por defecto
+    """
+    return jobs.queue_status()
+
+@app.get("/api/v1/jobs", tags=["Jobs"])
+def get_jobs(status: str = None, job_type: str = None, limit: int = 50):
+    """
+    Trabajos recientes, con filtros opcionales por estado y tipo
+    """
+    return jobs.list_jobs(status, job_type, min(max(limit, 1), 500))
+
+@app.get("/api/v1/jobs/{job_id}", tags=["Jobs"])
+def get_job(job_id: str):
+    """
+    Estado, progreso y resultado de un trabajo
+    """
+    return jobs.job_to_dict(get_job_or_404(job_id))
+
+@app.post("/api/v1/jobs/{job_id}/cancel", tags=["Jobs"])
+def cancel_job(job_id: str):
+    """
+    Cancelar un trabajo en cola o en ejecución
+    """
+    job = jobs.cancel_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado o vencido")
+    return job
+
+@app.get("/api/v1/jobs/{job_id}/download", tags=["Jobs"])
+def download_job_result(job_id: str):
+    """
+    Descargar el archivo generado por un trabajo terminado
+    """
+    return job_file_response(get_job_or_404(job_id))
+
+# ================================
+# PROYECCIÓN DE ASIGNACIONES
+# ================================
+
+def assignment_view_query(db: Session, columns, user_id: int = None, instructor_id: int = None, training_id: int = None, team_id: int = None, assignment_status: str = None):
+    """
+    Consulta sobre acd_v_assignment_view con los filtros indicados (todos opcionales)
+    """
+    view = models.AssignmentView
+    query = db.query(*columns)
+    if user_id is not None:
+        query = query.filter(view.user_id == user_id)
+    if instructor_id is not None:
+        query = query.filter(view.instructor_id == instructor_id)
+    if training_id is not None:
+        query = query.filter(view.training_id == training_id)
+    if team_id is not None:
+        query = query.filter(view.team_ids.contains(f",{team_id},"))
+    if assignment_status is not None:
+        query = query.filter(view.assignment_status == assignment_status)
+    return query
+
+@app.get("/api/v1/assignment-view", response_model=List[schemas.AssignmentViewRow], tags=["Training Assignments"])
+def get_assignment_view(user_id: int = None, instructor_id: int = None, training_id: int = None, team_id: int = None, assignment_status: str = None, skip: int = 0, limit: int = 100, conditional: versioning.ConditionalRequest = Depends(), db: Session = Depends(get_db)):
+    """
+    Asignaciones en filas planas (cliente, capacitación, instructor, estado, avance y equipos
+    activos del cliente) leídas de la proyección acd_v_assignment_view, sin uniones.
+    Filtros opcionales por cliente, instructor, capacitación, equipo y estado.
+    Soporta GET condicional (If-None-Match / If-Modified-Since).
+    """
+    state = versioning.resource_state(db, versioning.assignment_view_scopes())
+    if conditional.is_fresh(state):
+        return state.not_modified()
+    
+    rows = assignment_view_query(
+        db, models.AssignmentView.__table__.columns, user_id, instructor_id, training_id, team_id, assignment_status
+    ).order_by(models.AssignmentView.assignment_id).offset(skip).limit(limit).all()
+    result = []
+    for row in rows:
+        item = dict(row._mapping)
+        item["team_ids"] = [int(team) for team in item["team_ids"].split(",") if team]
+        result.append(item)
+    return state.apply(serializers.FastJSONResponse(content=result))
+
+@app.get("/api/v1/assignment-view/summary", response_model=schemas.AssignmentViewSummary, tags=["Training Assignments"])
+def get_assignment_view_summary(user_id: int = None, instructor_id: int = None, training_id: int = None, team_id: int = None, conditional: versioning.ConditionalRequest = Depends(), db: Session = Depends(get_db)):
+    """
+    Resumen para dashboards: asignaciones por estado, avance promedio y tecnologías
+    completadas, con los mismos filtros que /api/v1/assignment-view (una consulta agregada)
+    """
+    state = versioning.resource_state(db, versioning.assignment_view_scopes())
+    if conditional.is_fresh(state):
+        return state.not_modified()
+    
+    view = models.AssignmentView
+    rows = assignment_view_query(
+        db,
+        [
+            view.assignment_status,
+            func.count(),
+            func.coalesce(func.sum(view.completion_percentage), 0),
+            func.coalesce(func.sum(view.technologies_total), 0),
+            func.coalesce(func.sum(view.technologies_completed), 0),
+        ],
+        user_id, instructor_id, training_id, team_id
+    ).group_by(view.assignment_status).all()
+    total = sum(row[1] for row in rows)
+    return state.apply(serializers.FastJSONResponse(content={
+        "total": total,
+        "by_status": {row[0]: row[1] for row in rows},
+        "average_completion": round(float(sum(row[2] for row in rows)) / total, 2) if total else 0.0,
+        "technologies_total": int(sum(row[3] for row in rows)),
+        "technologies_completed": int(sum(row[4] for row in rows)),
+    }))
+
+# ================================
+# SOLICITUDES EN LOTE
+# ================================
+
+@app.post("/api/v1/batch", response_model=schemas.BatchResponse, tags=["Batch"])
+async def run_batch(batch_request: schemas.BatchRequest, request: Request):
+    """
+    Ejecutar varias solicitudes a la API en un solo viaje (como máximo BATCH_MAX_REQUESTS).
+    Los GET independientes corren a la vez; las escrituras, en el orden del lote.
+    Cada respuesta trae su propio status: el lote responde 200 aunque alguna falle.
+    """
+    try:
+        ids = batch.validate(batch_request.requests)
+    except batch.BatchError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    responses = await batch.run(app.router, request.scope, batch_request.requests, ids)
+    return serializers.FastJSONResponse(content={"responses": responses})
+
+# ================================
+# EVENTOS EN TIEMPO REAL
+# ================================
+
+@app.get("/api/v1/events", tags=["Events"])
+async def stream_events(topics: str, last_event_id: str = Header(None)):
+    """
+    Flujo Server-Sent Events con los cambios de asignaciones, progreso y miembros de equipo.
+    topics: temas separados por coma (user:{id}, team:{id}, training:{id}).
+    Cada evento trae solo las claves y los campos que cambiaron; el evento "resync"
+    indica que el cliente debe recargar sus listas.
+    """
+    try:
+        topic_list = events.parse_topics(topics)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if events.bus.connections >= events.EVENTS_MAX_CONNECTIONS:
+        raise HTTPException(
+            status_code=503,
+            detail="Demasiadas conexiones de eventos, intente nuevamente en unos segundos",
+            headers={"Retry-After": str(bulkhead.BULKHEAD_RETRY_AFTER_SECONDS)}
+        )
+    
+    # Suscribir antes de leer el historial para no perder eventos entre ambos pasos
+    subscriber = events.bus.subscribe(topic_list)
+    try:
+        initial = await events.missed_events(last_event_id, topic_list)
+    except Exception:
+        events.bus.unsubscribe(subscriber)
+        raise
+    return StreamingResponse(
+        events.stream(subscriber, initial),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# ================================
+# MÉTRICAS
+# ================================
+
+@app.get("/api/v1/metrics", tags=["Metrics"])
+async def get_metrics():
+    """
+    Estado de los bulkheads por clase de ruta (límite, activas, en cola, rechazadas),
+    ocupación del threadpool, coalescencia de solicitudes, cola de trabajos y conexiones
+    de eventos de este worker
+    """
+    return {
+        "bulkheads": bulkhead.metrics(),
+        "singleflight": singleflight.stats(),
+        "jobs": await asyncio.to_thread(jobs.queue_status),
+        "events": events.bus.status()
     }
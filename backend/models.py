@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, DECIMAL, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, DECIMAL, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -10,6 +10,7 @@ class Gender(Base):
     gender_name = Column(String(20), nullable=False)
     gender_status = Column(String(1), nullable=False, default='A')
     gender_created_at = Column(DateTime, default=datetime.utcnow)
+    gender_updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     persons = relationship("Person", back_populates="gender")
 
@@ -21,6 +22,7 @@ class Role(Base):
     role_description = Column(String(100), nullable=False)
     role_status = Column(String(1), nullable=False, default='A')
     role_created_at = Column(DateTime, default=datetime.utcnow)
+    role_updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     users = relationship("User", back_populates="role")
 
@@ -35,6 +37,7 @@ class Person(Base):
     person_email = Column(String(30), nullable=False, unique=True)
     person_status = Column(String(1), nullable=False, default='A')
     person_created_at = Column(DateTime, default=datetime.utcnow)
+    person_updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     gender = relationship("Gender", back_populates="persons")
     user = relationship("User", back_populates="person", uselist=False)
@@ -45,10 +48,11 @@ class User(Base):
     user_id = Column(Integer, primary_key=True, index=True)
     user_username = Column(String(50), nullable=False, unique=True)
     user_password = Column(String(255), nullable=False)
-    person_id = Column(Integer, ForeignKey("per_m_person.person_id"), nullable=False)
+    person_id = Column(Integer, ForeignKey("per_m_person.person_id"), nullable=False, index=True)
     user_role = Column(Integer, ForeignKey("per_c_role.role_id"), nullable=False)
     user_status = Column(String(1), nullable=False, default='A')
     user_created_at = Column(DateTime, default=datetime.utcnow)
+    user_updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     person = relationship("Person", back_populates="user")
     role = relationship("Role", back_populates="users")
@@ -59,6 +63,7 @@ class Technology(Base):
     technology_id = Column(Integer, primary_key=True, index=True)
     technology_name = Column(String(50), nullable=False)
     technology_created_at = Column(DateTime, default=datetime.utcnow)
+    technology_updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
 
 class Training(Base):
     __tablename__ = "acd_m_training"
@@ -68,6 +73,7 @@ class Training(Base):
     training_description = Column(Text, nullable=True)
     training_status = Column(String(1), nullable=False, default='A')
     training_created_at = Column(DateTime, default=datetime.utcnow)
+    training_updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     training_technologies = relationship("TrainingTechnology", back_populates="training")
 
@@ -75,9 +81,10 @@ class TrainingTechnology(Base):
     __tablename__ = "acd_t_training_technology"
     
     training_technology_id = Column(Integer, primary_key=True, index=True)
-    training_id = Column(Integer, ForeignKey("acd_m_training.training_id"), nullable=False)
-    technology_id = Column(Integer, ForeignKey("acd_m_technology.technology_id"), nullable=False)
+    training_id = Column(Integer, ForeignKey("acd_m_training.training_id"), nullable=False, index=True)
+    technology_id = Column(Integer, ForeignKey("acd_m_technology.technology_id"), nullable=False, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     training = relationship("Training", back_populates="training_technologies")
     technology = relationship("Technology")
@@ -86,11 +93,12 @@ class UserTrainingAssignment(Base):
     __tablename__ = "acd_t_user_training_assignment"
     
     assignment_id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("per_m_user.user_id"), nullable=False)
-    training_id = Column(Integer, ForeignKey("acd_m_training.training_id"), nullable=False)
-    instructor_id = Column(Integer, ForeignKey("per_m_user.user_id"), nullable=True)
+    user_id = Column(Integer, ForeignKey("per_m_user.user_id"), nullable=False, index=True)
+    training_id = Column(Integer, ForeignKey("acd_m_training.training_id"), nullable=False, index=True)
+    instructor_id = Column(Integer, ForeignKey("per_m_user.user_id"), nullable=True, index=True)
     assignment_status = Column(String(20), nullable=False, default='assigned')  # assigned, in_progress, completed
     assignment_created_at = Column(DateTime, default=datetime.utcnow)
+    assignment_updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     completion_percentage = Column(DECIMAL(5,2), nullable=False, default=0.00)
     instructor_meeting_link = Column(String(500), nullable=True)
     
@@ -103,11 +111,12 @@ class UserTechnologyProgress(Base):
     __tablename__ = "acd_t_user_technology_progress"
     
     progress_id = Column(Integer, primary_key=True, index=True)
-    assignment_id = Column(Integer, ForeignKey("acd_t_user_training_assignment.assignment_id"), nullable=False)
-    technology_id = Column(Integer, ForeignKey("acd_m_technology.technology_id"), nullable=False)
+    assignment_id = Column(Integer, ForeignKey("acd_t_user_training_assignment.assignment_id"), nullable=False, index=True)
+    technology_id = Column(Integer, ForeignKey("acd_m_technology.technology_id"), nullable=False, index=True)
     is_completed = Column(String(1), nullable=False, default='N')  # Y/N
     completed_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     assignment = relationship("UserTrainingAssignment", back_populates="technology_progress")
     technology = relationship("Technology")
@@ -121,7 +130,7 @@ class UserTrainingStatus(Base):
     trainings_completed = Column(Integer, nullable=False, default=0)
     trainings_in_progress = Column(Integer, nullable=False, default=0)
     overall_status = Column(String(20), nullable=False, default='no_training')  # no_training, in_progress, completed
-    last_updated = Column(DateTime, default=datetime.utcnow)
+    last_updated = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
     user = relationship("User")
@@ -132,9 +141,10 @@ class Team(Base):
     team_id = Column(Integer, primary_key=True, index=True)
     team_name = Column(String(100), nullable=False)
     team_description = Column(Text, nullable=True)
-    supervisor_id = Column(Integer, ForeignKey("per_m_user.user_id"), nullable=False)
+    supervisor_id = Column(Integer, ForeignKey("per_m_user.user_id"), nullable=False, index=True)
     team_status = Column(String(1), nullable=False, default='A')
     team_created_at = Column(DateTime, default=datetime.utcnow)
+    team_updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     supervisor = relationship("User", foreign_keys=[supervisor_id])
     team_members = relationship("TeamMember", back_populates="team")
@@ -143,15 +153,24 @@ class TeamMember(Base):
     __tablename__ = "per_t_team_member"
     
     team_member_id = Column(Integer, primary_key=True, index=True)
-    team_id = Column(Integer, ForeignKey("per_m_team.team_id"), nullable=False)
-    user_id = Column(Integer, ForeignKey("per_m_user.user_id"), nullable=False)
+    team_id = Column(Integer, ForeignKey("per_m_team.team_id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("per_m_user.user_id"), nullable=False, index=True)
     member_role = Column(String(20), nullable=False)  # 'instructor' or 'client'
     member_status = Column(String(1), nullable=False, default='A')
     joined_at = Column(DateTime, default=datetime.utcnow)
+    member_updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     team = relationship("Team", back_populates="team_members")
     user = relationship("User")
 
+class MaterialFile(Base):
+    __tablename__ = "acd_m_material_file"
+    
+    file_sha256 = Column(String(64), primary_key=True)  # contenido direccionado por hash
+    file_size = Column(Integer, nullable=False)
+    file_content_type = Column(String(100), nullable=False, default='application/octet-stream')
+    file_created_at = Column(DateTime, default=datetime.utcnow)
+
 class TrainingMaterial(Base):
     __tablename__ = "acd_m_training_material"
     
@@ -164,9 +183,13 @@ class TrainingMaterial(Base):
     material_type = Column(String(50), nullable=False, default='link')  # 'link', 'document', 'video'
     material_status = Column(String(1), nullable=False, default='A')
     material_created_at = Column(DateTime, default=datetime.utcnow)
+    material_updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    material_file_sha256 = Column(String(64), ForeignKey("acd_m_material_file.file_sha256"), nullable=True)  # solo materiales subidos
+    material_file_name = Column(String(255), nullable=True)
     
     training = relationship("Training")
     instructor = relationship("User")
+    file = relationship("MaterialFile")
 
 class UserMaterialProgress(Base):
     __tablename__ = "acd_t_user_material_progress"
@@ -178,7 +201,96 @@ class UserMaterialProgress(Base):
     is_completed = Column(String(1), nullable=False, default='N')  # Y/N
     completed_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
     
     user = relationship("User")
     material = relationship("TrainingMaterial")
-    assignment = relationship("UserTrainingAssignment")
\ No newline at end of file
+    assignment = relationship("UserTrainingAssignment")
+
+
+class MaterialLinkStatus(Base):
+    __tablename__ = "acd_t_material_link_status"
+    
+    status_id = Column(Integer, primary_key=True, index=True)
+    material_id = Column(Integer, ForeignKey("acd_m_training_material.material_id"), nullable=False, unique=True)
+    checked_url = Column(String(500), nullable=False)
+    http_status = Column(Integer, nullable=True)  # null si no hubo respuesta (timeout, DNS, etc.)
+    is_ok = Column(String(1), nullable=False, default='N')  # Y/N
+    error_message = Column(String(255), nullable=True)
+    consecutive_failures = Column(Integer, nullable=False, default=0)
+    last_checked_at = Column(DateTime, nullable=True)
+    next_check_at = Column(DateTime, nullable=True, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    material = relationship("TrainingMaterial")
+
+class AssignmentView(Base):
+    __tablename__ = "acd_v_assignment_view"
+    
+    # Proyección de lectura (una fila por asignación) mantenida por assignment_view.py
+    # en la misma transacción que las escrituras; no se escribe directamente
+    assignment_id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False, index=True)
+    client_username = Column(String(50), nullable=False)
+    client_first_name = Column(String(20), nullable=False)
+    client_last_name = Column(String(20), nullable=False)
+    client_email = Column(String(30), nullable=False)
+    client_gender = Column(String(20), nullable=False)
+    training_id = Column(Integer, nullable=False, index=True)
+    training_name = Column(String(100), nullable=False)
+    training_description = Column(Text, nullable=True)
+    instructor_id = Column(Integer, nullable=True, index=True)
+    instructor_username = Column(String(50), nullable=True)
+    instructor_first_name = Column(String(20), nullable=True)
+    instructor_last_name = Column(String(20), nullable=True)
+    instructor_meeting_link = Column(String(500), nullable=True)
+    assignment_status = Column(String(20), nullable=False, index=True)
+    completion_percentage = Column(DECIMAL(5,2), nullable=False, default=0.00)
+    technologies_total = Column(Integer, nullable=False, default=0)
+    technologies_completed = Column(Integer, nullable=False, default=0)
+    team_ids = Column(String(255), nullable=False, default='')  # equipos activos del cliente: ",3,7,"
+    assignment_created_at = Column(DateTime, nullable=True)
+    # Modificación más reciente entre asignación, cliente, persona, género, capacitación e instructor
+    # (la misma fecha que usa el dataset assignments-detail de Power BI)
+    row_updated_at = Column(DateTime, nullable=False, index=True)
+
+class ResourceVersion(Base):
+    __tablename__ = "sys_t_resource_version"
+    
+    # Contador de cambios por recurso (p. ej. 'assignments:user:12'), usado para ETag/Last-Modified
+    resource_scope = Column(String(100), primary_key=True)
+    resource_version = Column(Integer, nullable=False, default=0)
+    resource_updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class Job(Base):
+    __tablename__ = "sys_t_job"
+    __table_args__ = (
+        Index("ix_sys_t_job_queue", "job_status", "job_priority", "job_created_at"),
+    )
+    
+    job_id = Column(String(32), primary_key=True)
+    job_type = Column(String(50), nullable=False, index=True)
+    job_status = Column(String(20), nullable=False, default='queued')  # queued, running, completed, failed, cancelled
+    job_priority = Column(Integer, nullable=False, default=0)  # mayor prioridad se ejecuta primero
+    job_params = Column(Text, nullable=True)  # JSON
+    job_result = Column(Text, nullable=True)  # JSON
+    job_error = Column(Text, nullable=True)
+    job_progress = Column(Integer, nullable=False, default=0)  # 0-100
+    job_progress_message = Column(String(255), nullable=True)
+    job_cancel_requested = Column(String(1), nullable=False, default='N')  # Y/N
+    job_worker = Column(String(100), nullable=True)
+    job_created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    job_started_at = Column(DateTime, nullable=True)
+    job_heartbeat_at = Column(DateTime, nullable=True)
+    job_finished_at = Column(DateTime, nullable=True)
+    job_expires_at = Column(DateTime, nullable=True, index=True)
+
+class Event(Base):
+    __tablename__ = "sys_t_event"
+    
+    event_id = Column(Integer, primary_key=True, autoincrement=True)
+    event_type = Column(String(50), nullable=False)
+    event_topics = Column(Text, nullable=False)  # separados por coma: user:1,team:2,training:3
+    event_data = Column(Text, nullable=False)  # JSON
+    event_created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
@@ -0,0 +1,290 @@
+import re
+from datetime import datetime, timezone
+
+from fastapi import Query
+from sqlalchemy import and_, or_, not_, Boolean, Integer, Numeric, DateTime
+
+# ================================
+# OPCIONES DE CONSULTA ESTILO ODATA
+# ================================
+# Subconjunto de OData v4 para los datasets de Power BI:
+#   $select=col1,col2
+#   $filter=col eq 'texto' and (total gt 10 or is_deleted eq true)
+#   $orderby=col desc,col2
+#   $top=100&$skip=200
+# Solo se aceptan las columnas que expone el dataset; los valores siempre viajan
+# como parámetros enlazados, nunca se concatenan al SQL.
+
+# Límites para que un $filter no pueda generar una consulta desproporcionada
+MAX_FILTER_LENGTH = 2000
+MAX_FILTER_DEPTH = 20
+
+COMPARISON_OPERATORS = {
+    "eq": lambda column, value: column.is_(None) if value is None else column == value,
+    "ne": lambda column, value: column.is_not(None) if value is None else column != value,
+    "gt": lambda column, value: column > value,
+    "ge": lambda column, value: column >= value,
+    "lt": lambda column, value: column < value,
+    "le": lambda column, value: column <= value,
+}
+
+TOKEN_PATTERN = re.compile(r"""
+    \s*(?:
+        (?P<string>'(?:[^']|'')*')
+      | (?P<datetime>\d{4}-\d{2}-\d{2}(?:T\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?(?:Z|[+-]\d{2}:\d{2})?)?)
+      | (?P<number>-?\d+(?:\.\d+)?)
+      | (?P<paren>[()])
+      | (?P<word>[A-Za-z_][A-Za-z0-9_]*)
+    )\s*
+""", re.VERBOSE)
+
+
+class ODataError(ValueError):
+    pass
+
+
+class QueryOptions:
+    """
+    Opciones de consulta ya leídas de la URL (aún sin validar contra el dataset)
+    """
+
+    def __init__(self, select: str = None, filter: str = None, orderby: str = None, top: int = None, skip: int = None):
+        self.select = select
+        self.filter = filter
+        self.orderby = orderby
+        self.top = top
+        self.skip = skip
+
+    def is_empty(self) -> bool:
+        return not any([self.select, self.filter, self.orderby, self.top is not None, self.skip is not None])
+
+
+def query_options(
+    select: str = Query(None, alias="$select", description="Columnas separadas por coma"),
+    filter: str = Query(None, alias="$filter", description="Ej: role eq 'Cliente' and total gt 0"),
+    orderby: str = Query(None, alias="$orderby", description="Ej: created_at desc,user_id"),
+    top: int = Query(None, alias="$top", ge=0),
+    skip: int = Query(None, alias="$skip", ge=0)
+) -> QueryOptions:
+    """
+    Dependencia de FastAPI para los endpoints de Power BI
+    """
+    return QueryOptions(select, filter, orderby, top, skip)
+
+
+def column_type_name(column) -> str:
+    if isinstance(column.type, Boolean):
+        return "boolean"
+    if isinstance(column.type, Integer):
+        return "integer"
+    if isinstance(column.type, Numeric):
+        return "number"
+    if isinstance(column.type, DateTime):
+        return "datetime"
+    return "string"
+
+
+def source_expression(column):
+    # Las columnas del dataset son etiquetas (expresión AS nombre)
+    return getattr(column, "element", column)
+
+
+def describe_columns(query):
+    """
+    Columnas del dataset con su tipo, para anunciarlas en /powerbi/tables
+    """
+    return [
+        {"name": column.key, "type": column_type_name(column), "filterable": True, "sortable": True}
+        for column in query.selected_columns
+    ]
+
+
+def tokenize(text: str):
+    tokens = []
+    position = 0
+    while position < len(text):
+        match = TOKEN_PATTERN.match(text, position)
+        if not match or match.end() == position:
+            raise ODataError(f"$filter inválido cerca de: {text[position:position + 20]!r}")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        position = match.end()
+    return tokens
+
+
+def parse_datetime(value: str) -> datetime:
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise ODataError(f"Fecha inválida en $filter: {value}")
+    if parsed.tzinfo is not None:
+        # La base guarda fechas UTC sin zona horaria
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def coerce_literal(column, kind: str, text: str):
+    """
+    Convertir el literal del $filter al tipo de la columna con la que se compara
+    """
+    if kind == "word" and text == "null":
+        return None
+    type_name = column_type_name(column)
+
+    if type_name == "boolean":
+        if kind == "word" and text in ("true", "false"):
+            return text == "true"
+    elif type_name == "integer":
+        if kind == "number" and "." not in text:
+            return int(text)
+    elif type_name == "number":
+        if kind == "number":
+            return float(text)
+    elif type_name == "datetime":
+        if kind == "datetime":
+            return parse_datetime(text)
+        if kind == "string":
+            return parse_datetime(text[1:-1])
+    elif kind == "string":
+        return text[1:-1].replace("''", "'")
+
+    raise ODataError(f"Valor {text} no válido para la columna {column.key} ({type_name})")
+
+
+class FilterParser:
+    """
+    Analizador descendente recursivo:
+        expr       := and_expr ('or' and_expr)*
+        and_expr   := unary ('and' unary)*
+        unary      := 'not' unary | '(' expr ')' | comparison
+        comparison := columna operador literal
+    """
+
+    def __init__(self, text: str, columns):
+        if len(text) > MAX_FILTER_LENGTH:
+            raise ODataError(f"$filter no puede superar {MAX_FILTER_LENGTH} caracteres")
+        self.tokens = tokenize(text)
+        self.position = 0
+        self.columns = columns
+        self.depth = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        if token[0] is None:
+            raise ODataError("$filter incompleto")
+        self.position += 1
+        return token
+
+    def accept_word(self, word: str) -> bool:
+        if self.peek() == ("word", word):
+            self.position += 1
+            return True
+        return False
+
+    def parse(self):
+        expression = self.parse_or()
+        if self.position != len(self.tokens):
+            raise ODataError(f"$filter inválido cerca de: {self.peek()[1]}")
+        return expression
+
+    def nested(self, parse):
+        self.depth += 1
+        if self.depth > MAX_FILTER_DEPTH:
+            raise ODataError("$filter tiene demasiados niveles de anidación")
+        expression = parse()
+        self.depth -= 1
+        return expression
+
+    def parse_or(self):
+        clauses = [self.parse_and()]
+        while self.accept_word("or"):
+            clauses.append(self.parse_and())
+        return clauses[0] if len(clauses) == 1 else or_(*clauses)
+
+    def parse_and(self):
+        clauses = [self.parse_unary()]
+        while self.accept_word("and"):
+            clauses.append(self.parse_unary())
+        return clauses[0] if len(clauses) == 1 else and_(*clauses)
+
+    def parse_unary(self):
+        if self.accept_word("not"):
+            return not_(self.nested(self.parse_unary))
+        if self.peek() == ("paren", "("):
+            self.position += 1
+            expression = self.nested(self.parse_or)
+            if self.take() != ("paren", ")"):
+                raise ODataError("Falta cerrar un paréntesis en $filter")
+            return expression
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        kind, name = self.take()
+        if kind != "word":
+            raise ODataError(f"Se esperaba un nombre de columna en $filter y se recibió: {name}")
+        column = self.columns.get(name)
+        if column is None:
+            raise ODataError(f"Columna no permitida en $filter: {name}")
+
+        kind, operator = self.take()
+        if kind != "word" or operator not in COMPARISON_OPERATORS:
+            raise ODataError(f"Operador no soportado en $filter: {operator}")
+
+        kind, literal = self.take()
+        if kind == "paren":
+            raise ODataError(f"Se esperaba un valor para la columna {name}")
+        value = coerce_literal(column, kind, literal)
+        if value is None and operator not in ("eq", "ne"):
+            raise ODataError(f"null solo se puede comparar con eq o ne ({name})")
+        # Se compara contra la expresión original, no contra la etiqueta,
+        # así SQLite puede usar los índices de la tabla de origen
+        return COMPARISON_OPERATORS[operator](source_expression(column), value)
+
+
+def parse_column_list(text: str, columns, option: str):
+    names = [name.strip() for name in text.split(",") if name.strip()]
+    if not names:
+        raise ODataError(f"{option} está vacío")
+    for name in names:
+        if name not in columns:
+            raise ODataError(f"Columna no permitida en {option}: {name}")
+    return names
+
+
+def apply_query_options(query, options: QueryOptions):
+    """
+    Traducir las opciones de consulta a la sentencia SQLAlchemy del dataset,
+    de modo que el filtrado, la proyección y la paginación se resuelvan en la base
+    """
+    if options is None or options.is_empty():
+        return query
+
+    columns = {column.key: column for column in query.selected_columns}
+
+    if options.filter:
+        query = query.where(FilterParser(options.filter, columns).parse())
+
+    if options.orderby:
+        order = []
+        for item in options.orderby.split(","):
+            parts = item.split()
+            if not parts or len(parts) > 2 or (len(parts) == 2 and parts[1] not in ("asc", "desc")):
+                raise ODataError(f"$orderby inválido: {item.strip()}")
+            if parts[0] not in columns:
+                raise ODataError(f"Columna no permitida en $orderby: {parts[0]}")
+            expression = source_expression(columns[parts[0]])
+            order.append(expression.desc() if len(parts) == 2 and parts[1] == "desc" else expression.asc())
+        query = query.order_by(None).order_by(*order)
+
+    if options.select:
+        names = parse_column_list(options.select, columns, "$select")
+        query = query.with_only_columns(*[columns[name] for name in names])
+
+    if options.top is not None:
+        query = query.limit(options.top)
+    if options.skip is not None:
+        query = query.offset(options.skip)
+    return query
@@ -0,0 +1,467 @@
+import io
+import os
+import csv
+import json
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from sqlalchemy import select, func, case, and_, union, literal, DateTime, Boolean, Integer, Numeric
+from sqlalchemy.orm import aliased
+
+import models
+import odata
+from database import engine
+
+# Filas por lote al leer del cursor y por fragmento enviado al cliente
+STREAM_BATCH_SIZE = 1000
+
+STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+# Formatos columnares: filas por lote leído con pandas y tipo de archivo
+COLUMNAR_CHUNK_SIZE = 50000
+
+COLUMNAR_MEDIA_TYPES = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+# Textos que se repiten en muchas filas: se codifican como diccionario (índice + valores únicos)
+DICTIONARY_COLUMNS = {
+    "role", "gender", "client_gender", "assignment_status", "training_name", "training_description",
+    "technology_name", "technologies", "instructor_name", "supervisor_name", "supervisor_username",
+    "user_name", "username",
+}
+
+# Margen de la marca de agua: una transacción que confirma unos segundos tarde
+# con un updated_at anterior no se pierde en la siguiente carga incremental
+WATERMARK_LAG = timedelta(seconds=int(os.getenv("POWERBI_WATERMARK_LAG_SECONDS", "5")))
+
+# ================================
+# DATASETS PARA POWER BI
+# ================================
+# Cada dataset es una única sentencia SQL cuyas columnas ya tienen el nombre final
+# del campo en la respuesta, así la cantidad de consultas no crece con los datos.
+#
+# Carga incremental: cada fila expone `updated_at`, la fecha de modificación más reciente
+# entre todas las tablas que la componen. Con since/until solo se devuelven las filas
+# cuyo updated_at cae en (since, until]; las bajas lógicas (status 'I') se incluyen
+# como lápidas con is_deleted=true para que el consumidor las elimine.
+
+# Fecha usada en lugar de NULL al comparar fechas de tablas unidas con OUTER JOIN
+EPOCH = datetime(1970, 1, 1)
+
+
+def count_where(condition):
+    """
+    SUM(CASE WHEN condición THEN 1 ELSE 0 END)
+    """
+    return func.sum(case((condition, 1), else_=0))
+
+
+def greatest(*columns):
+    """
+    Máximo escalar entre varias fechas (max() con varios argumentos en SQLite)
+    """
+    return func.max(*[func.coalesce(column, literal(EPOCH, DateTime)) for column in columns], type_=DateTime)
+
+
+def apply_window(query, key, change_columns, row_updated, since, until):
+    """
+    Restringir el dataset a las filas modificadas en (since, until].
+    Las claves modificadas se obtienen con un UNION de una consulta por tabla de origen,
+    cada una resuelta con el índice de su columna updated_at.
+    """
+    if since is not None:
+        changed_keys = union(*[
+            query.with_only_columns(key).order_by(None).where(column > since)
+            for column in change_columns
+        ])
+        query = query.where(key.in_(changed_keys))
+    if until is not None:
+        query = query.where(row_updated <= until)
+    return query
+
+
+def users_summary_query(since=None, until=None):
+    row_updated = greatest(
+        models.User.user_updated_at, models.Person.person_updated_at,
+        models.Gender.gender_updated_at, models.Role.role_updated_at
+    )
+    query = select(
+        models.User.user_id.label("user_id"),
+        models.User.user_username.label("username"),
+        (models.Person.person_first_name + " " + models.Person.person_last_name).label("full_name"),
+        models.Person.person_first_name.label("first_name"),
+        models.Person.person_last_name.label("last_name"),
+        models.Person.person_email.label("email"),
+        models.Person.person_dni.label("dni"),
+        models.Gender.gender_name.label("gender"),
+        models.Role.role_name.label("role"),
+        models.User.user_created_at.label("created_at"),
+        row_updated.label("updated_at"),
+        (models.User.user_status != 'A').label("is_deleted")
+    ).select_from(models.User).join(
+        models.Person, models.User.person_id == models.Person.person_id
+    ).join(
+        models.Gender, models.Person.person_gender == models.Gender.gender_id
+    ).join(
+        models.Role, models.User.user_role == models.Role.role_id
+    ).order_by(models.User.user_id)
+
+    return apply_window(query, models.User.user_id, [
+        models.User.user_updated_at, models.Person.person_updated_at,
+        models.Gender.gender_updated_at, models.Role.role_updated_at
+    ], row_updated, since, until)
+
+
+def trainings_summary_query(since=None, until=None):
+    assignment = models.UserTrainingAssignment
+
+    # Conteo de asignaciones por estado, agregado por capacitación
+    assignment_stats = select(
+        assignment.training_id.label("training_id"),
+        count_where(assignment.assignment_status == 'not_started').label("not_started"),
+        count_where(assignment.assignment_status == 'assigned').label("assigned"),
+        count_where(assignment.assignment_status == 'in_progress').label("in_progress"),
+        count_where(assignment.assignment_status == 'completed').label("completed"),
+        func.count().label("total"),
+        func.max(assignment.assignment_updated_at).label("last_updated")
+    ).group_by(assignment.training_id).subquery()
+
+    # Tecnologías de cada capacitación concatenadas en una sola columna
+    technologies = select(
+        models.TrainingTechnology.training_id.label("training_id"),
+        func.group_concat(models.Technology.technology_name, ", ").label("technologies"),
+        func.count().label("technology_count"),
+        func.max(greatest(models.TrainingTechnology.updated_at, models.Technology.technology_updated_at)).label("last_updated")
+    ).join(
+        models.Technology, models.TrainingTechnology.technology_id == models.Technology.technology_id
+    ).group_by(models.TrainingTechnology.training_id).subquery()
+
+    row_updated = greatest(
+        models.Training.training_updated_at, technologies.c.last_updated, assignment_stats.c.last_updated
+    )
+    query = select(
+        models.Training.training_id.label("training_id"),
+        models.Training.training_name.label("training_name"),
+        models.Training.training_description.label("training_description"),
+        func.coalesce(technologies.c.technologies, "").label("technologies"),
+        func.coalesce(technologies.c.technology_count, 0).label("technology_count"),
+        models.Training.training_created_at.label("created_at"),
+        func.coalesce(assignment_stats.c.not_started, 0).label("not_started"),
+        func.coalesce(assignment_stats.c.assigned, 0).label("assigned"),
+        func.coalesce(assignment_stats.c.in_progress, 0).label("in_progress"),
+        func.coalesce(assignment_stats.c.completed, 0).label("completed"),
+        func.coalesce(assignment_stats.c.total, 0).label("total"),
+        row_updated.label("updated_at"),
+        (models.Training.training_status != 'A').label("is_deleted")
+    ).select_from(models.Training).outerjoin(
+        technologies, technologies.c.training_id == models.Training.training_id
+    ).outerjoin(
+        assignment_stats, assignment_stats.c.training_id == models.Training.training_id
+    ).order_by(models.Training.training_id)
+
+    if since is None:
+        # En la carga completa solo interesan las capacitaciones activas
+        query = query.where(models.Training.training_status == 'A')
+
+    return apply_window(query, models.Training.training_id, [
+        models.Training.training_updated_at, technologies.c.last_updated, assignment_stats.c.last_updated
+    ], row_updated, since, until)
+
+
+def assignments_detail_query(since=None, until=None):
+    # Lee la proyección acd_v_assignment_view (assignment_view.py): la unión de asignación,
+    # cliente, persona, género, capacitación e instructor ya está resuelta, y row_updated_at
+    # es la fecha de modificación más reciente entre esas tablas (indexada)
+    view = models.AssignmentView
+    query = select(
+        view.assignment_id.label("assignment_id"),
+        view.assignment_status.label("assignment_status"),
+        view.assignment_created_at.label("created_at"),
+        view.row_updated_at.label("updated_at"),
+        # Usuario (cliente)
+        view.user_id.label("client_id"),
+        view.client_username.label("client_username"),
+        (view.client_first_name + " " + view.client_last_name).label("client_name"),
+        view.client_first_name.label("client_first_name"),
+        view.client_last_name.label("client_last_name"),
+        view.client_email.label("client_email"),
+        view.client_gender.label("client_gender"),
+        # Capacitación
+        view.training_id.label("training_id"),
+        view.training_name.label("training_name"),
+        view.training_description.label("training_description"),
+        # Instructor (opcional): NULL si la asignación no tiene instructor
+        (view.instructor_first_name + " " + view.instructor_last_name).label("instructor_name")
+    ).order_by(view.assignment_id)
+
+    # Una sola columna de modificación: la ventana es un rango sobre su índice
+    if since is not None:
+        query = query.where(view.row_updated_at > since)
+    if until is not None:
+        query = query.where(view.row_updated_at <= until)
+    return query
+
+
+def teams_summary_query(since=None, until=None):
+    supervisor = aliased(models.User)
+    supervisor_person = aliased(models.Person)
+    active = models.TeamMember.member_status == 'A'
+
+    # Conteo de miembros activos por rol, agregado por equipo. Los inactivos no suman,
+    # pero su fecha de modificación sí cuenta: dar de baja un miembro cambia el equipo.
+    member_stats = select(
+        models.TeamMember.team_id.label("team_id"),
+        count_where(and_(active, models.TeamMember.member_role == 'instructor')).label("instructors"),
+        count_where(and_(active, models.TeamMember.member_role == 'client')).label("clients"),
+        count_where(active).label("total_members"),
+        func.max(models.TeamMember.member_updated_at).label("last_updated")
+    ).group_by(models.TeamMember.team_id).subquery()
+
+    row_updated = greatest(
+        models.Team.team_updated_at, supervisor.user_updated_at,
+        supervisor_person.person_updated_at, member_stats.c.last_updated
+    )
+    query = select(
+        models.Team.team_id.label("team_id"),
+        models.Team.team_name.label("team_name"),
+        models.Team.team_description.label("team_description"),
+        models.Team.team_created_at.label("created_at"),
+        (supervisor_person.person_first_name + " " + supervisor_person.person_last_name).label("supervisor_name"),
+        supervisor.user_username.label("supervisor_username"),
+        func.coalesce(member_stats.c.instructors, 0).label("instructors"),
+        func.coalesce(member_stats.c.clients, 0).label("clients"),
+        func.coalesce(member_stats.c.total_members, 0).label("total_members"),
+        row_updated.label("updated_at"),
+        (models.Team.team_status != 'A').label("is_deleted")
+    ).select_from(models.Team).join(
+        supervisor, models.Team.supervisor_id == supervisor.user_id
+    ).join(
+        supervisor_person, supervisor.person_id == supervisor_person.person_id
+    ).outerjoin(
+        member_stats, member_stats.c.team_id == models.Team.team_id
+    ).order_by(models.Team.team_id)
+
+    if since is None:
+        # En la carga completa solo interesan los equipos activos
+        query = query.where(models.Team.team_status == 'A')
+
+    return apply_window(query, models.Team.team_id, [
+        models.Team.team_updated_at, supervisor.user_updated_at,
+        supervisor_person.person_updated_at, member_stats.c.last_updated
+    ], row_updated, since, until)
+
+
+def progress_summary_query(since=None, until=None):
+    row_updated = greatest(
+        models.UserTechnologyProgress.updated_at, models.Technology.technology_updated_at,
+        models.UserTrainingAssignment.assignment_updated_at, models.User.user_updated_at,
+        models.Person.person_updated_at, models.Training.training_updated_at
+    )
+    query = select(
+        models.UserTechnologyProgress.progress_id.label("progress_id"),
+        models.UserTechnologyProgress.assignment_id.label("assignment_id"),
+        models.Technology.technology_name.label("technology_name"),
+        (models.UserTechnologyProgress.is_completed == 'Y').label("is_completed"),
+        models.UserTechnologyProgress.completed_at.label("completed_at"),
+        (models.Person.person_first_name + " " + models.Person.person_last_name).label("user_name"),
+        models.User.user_username.label("username"),
+        models.Training.training_name.label("training_name"),
+        row_updated.label("updated_at")
+    ).select_from(models.UserTechnologyProgress).join(
+        models.Technology, models.UserTechnologyProgress.technology_id == models.Technology.technology_id
+    ).join(
+        models.UserTrainingAssignment, models.UserTechnologyProgress.assignment_id == models.UserTrainingAssignment.assignment_id
+    ).join(
+        models.User, models.UserTrainingAssignment.user_id == models.User.user_id
+    ).join(
+        models.Person, models.User.person_id == models.Person.person_id
+    ).join(
+        models.Training, models.UserTrainingAssignment.training_id == models.Training.training_id
+    ).order_by(models.UserTechnologyProgress.progress_id)
+
+    return apply_window(query, models.UserTechnologyProgress.progress_id, [
+        models.UserTechnologyProgress.updated_at, models.Technology.technology_updated_at,
+        models.UserTrainingAssignment.assignment_updated_at, models.User.user_updated_at,
+        models.Person.person_updated_at, models.Training.training_updated_at
+    ], row_updated, since, until)
+
+
+DATASETS = {
+    "users-summary": users_summary_query,
+    "trainings-summary": trainings_summary_query,
+    "assignments-detail": assignments_detail_query,
+    "teams-summary": teams_summary_query,
+    "progress-summary": progress_summary_query,
+}
+
+
+def json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def row_to_dict(row):
+    return {key: json_value(value) for key, value in row._mapping.items()}
+
+
+def to_utc_naive(value):
+    # La base guarda fechas UTC sin zona horaria
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def resolve_window(since=None, until=None):
+    """
+    Normalizar la ventana (since, until] y calcular la marca de agua para la próxima carga.
+    En una carga completa no se filtra por until: las filas de los últimos segundos
+    se vuelven a enviar en la siguiente carga incremental, lo que es inofensivo.
+    """
+    since, until = to_utc_naive(since), to_utc_naive(until)
+    safe_now = datetime.utcnow() - WATERMARK_LAG
+    if since is not None and until is None:
+        until = safe_now
+    return since, until, until or safe_now
+
+
+def build_query(name: str, since=None, until=None, options=None):
+    """
+    Sentencia del dataset con la ventana incremental y las opciones $select/$filter/... aplicadas
+    """
+    return odata.apply_query_options(DATASETS[name](since, until), options)
+
+
+def fetch_dataset(db, name: str, since=None, until=None, options=None):
+    """
+    Ejecutar el dataset indicado y retornar sus filas como diccionarios
+    """
+    return [row_to_dict(row) for row in db.execute(build_query(name, since, until, options))]
+
+
+def iter_batches(query, batch_size: int = STREAM_BATCH_SIZE):
+    """
+    Recorrer el resultado por lotes desde el cursor, sin materializar todas las filas.
+    Usa su propia conexión porque el generador se consume después de que el endpoint retorna.
+    """
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(query)
+        for batch in result.partitions():
+            yield batch
+
+
+def stream_ndjson(query):
+    for batch in iter_batches(query):
+        yield "".join(
+            json.dumps(row_to_dict(row), ensure_ascii=False) + "\n" for row in batch
+        ).encode("utf-8")
+
+
+def csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return json_value(value)
+
+
+def stream_csv(query):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(query.selected_columns.keys())
+    for batch in iter_batches(query):
+        writer.writerows([csv_value(value) for value in row] for row in batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    # Encabezado de datasets vacíos
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def stream_dataset(name: str, fmt: str, since=None, until=None, options=None):
+    """
+    Generador de bytes del dataset en formato ndjson o csv
+    """
+    query = build_query(name, since, until, options)
+    if fmt == "ndjson":
+        return stream_ndjson(query)
+    return stream_csv(query)
+
+
+def arrow_schema(query):
+    """
+    Esquema Arrow derivado de los tipos SQLAlchemy de las columnas del dataset
+    """
+    import pyarrow as pa
+
+    fields = []
+    for column in query.selected_columns:
+        if isinstance(column.type, Boolean):
+            arrow_type = pa.bool_()
+        elif isinstance(column.type, Integer):
+            arrow_type = pa.int64()
+        elif isinstance(column.type, Numeric):
+            arrow_type = pa.float64()
+        elif isinstance(column.type, DateTime):
+            arrow_type = pa.timestamp("us")
+        elif column.key in DICTIONARY_COLUMNS:
+            arrow_type = pa.dictionary(pa.int32(), pa.string())
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.key, arrow_type))
+    return pa.schema(fields)
+
+
+def iter_column_batches(query, schema):
+    """
+    Leer el dataset en lotes de columnas con pandas directamente desde el cursor
+    y convertir cada lote en una tabla Arrow con el esquema fijo del dataset
+    """
+    import pandas as pd
+    import pyarrow as pa
+
+    with engine.connect() as conn:
+        conn = conn.execution_options(stream_results=True)
+        for frame in pd.read_sql(query, conn, chunksize=COLUMNAR_CHUNK_SIZE):
+            for column in DICTIONARY_COLUMNS.intersection(frame.columns):
+                frame[column] = frame[column].astype("category")
+            yield pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+
+
+def write_columnar(name: str, fmt: str, path: str, since=None, until=None, options=None):
+    """
+    Escribir el dataset en formato parquet o arrow (IPC stream) en la ruta indicada.
+    Cada lote se escribe apenas se lee, así la memoria depende del lote y no del dataset.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    query = build_query(name, since, until, options)
+    schema = arrow_schema(query)
+
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(path, schema, use_dictionary=True, compression="snappy")
+        write = writer.write_table
+    else:
+        # El formato stream permite que cada lote traiga su propio diccionario
+        writer = pa.ipc.new_stream(path, schema, options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+        write = writer.write_table
+
+    try:
+        rows = 0
+        for table in iter_column_batches(query, schema):
+            write(table)
+            rows += table.num_rows
+        if rows == 0:
+            write(schema.empty_table())
+    finally:
+        writer.close()
+    return rows
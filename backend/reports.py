@@ -0,0 +1,350 @@
+import os
+import threading
+from datetime import datetime
+
+from sqlalchemy import select, func, and_, distinct
+from sqlalchemy.orm import aliased
+
+import models
+import powerbi
+import jobs
+
+# ================================
+# REPORTES EXCEL
+# ================================
+# Cada reporte es una única sentencia SQL que se recorre por lotes desde el cursor
+# y se escribe con el modo write-only de openpyxl: las filas van directo a disco,
+# así la memoria no depende de la cantidad de filas del reporte.
+
+REPORTS_EXPORT_DIR = os.getenv("REPORTS_EXPORT_DIR", "./storage/reports")
+
+# Exportaciones simultáneas (descargas directas + trabajos en segundo plano)
+REPORTS_MAX_CONCURRENT_EXPORTS = int(os.getenv("REPORTS_MAX_CONCURRENT_EXPORTS", "2"))
+# Trabajos en cola como máximo; por encima se rechaza la solicitud
+REPORTS_MAX_PENDING_EXPORTS = int(os.getenv("REPORTS_MAX_PENDING_EXPORTS", "10"))
+# Tiempo que se conservan los archivos generados por los trabajos
+REPORTS_EXPORT_TTL_SECONDS = int(os.getenv("REPORTS_EXPORT_TTL_SECONDS", "3600"))
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Límite de filas de una hoja de Excel (incluye el encabezado)
+EXCEL_MAX_ROWS = 1048576
+
+ASSIGNMENT_STATUS_LABELS = {
+    "not_started": "Sin iniciar",
+    "assigned": "Asignada",
+    "in_progress": "En progreso",
+    "completed": "Completada",
+}
+
+
+class ExportBusy(Exception):
+    pass
+
+
+def full_name(person):
+    return person.person_first_name + " " + person.person_last_name
+
+
+def team_user_ids(team_id: int = None, supervisor_id: int = None, role: str = None):
+    """
+    Subconsulta con los usuarios que son miembros activos de los equipos filtrados
+    """
+    query = select(models.TeamMember.user_id).join(
+        models.Team, models.TeamMember.team_id == models.Team.team_id
+    ).where(
+        models.TeamMember.member_status == 'A',
+        models.Team.team_status == 'A'
+    )
+    if role:
+        query = query.where(models.TeamMember.member_role == role)
+    if team_id is not None:
+        query = query.where(models.Team.team_id == team_id)
+    if supervisor_id is not None:
+        query = query.where(models.Team.supervisor_id == supervisor_id)
+    return query
+
+
+def technology_progress_stats():
+    progress = models.UserTechnologyProgress
+    return select(
+        progress.assignment_id.label("assignment_id"),
+        func.count().label("total"),
+        powerbi.count_where(progress.is_completed == 'Y').label("completed")
+    ).group_by(progress.assignment_id).subquery()
+
+
+def assignments_by_team_query(team_id: int = None, supervisor_id: int = None):
+    supervisor = aliased(models.User)
+    supervisor_person = aliased(models.Person)
+    instructor = aliased(models.User)
+    instructor_person = aliased(models.Person)
+    stats = technology_progress_stats()
+
+    query = select(
+        models.Team.team_name.label("Equipo"),
+        full_name(supervisor_person).label("Supervisor"),
+        models.User.user_username.label("Usuario"),
+        full_name(models.Person).label("Cliente"),
+        models.Person.person_email.label("Email"),
+        models.Training.training_name.label("Capacitación"),
+        full_name(instructor_person).label("Instructor"),
+        models.UserTrainingAssignment.assignment_status.label("Estado"),
+        func.coalesce(stats.c.completed, 0).label("Tecnologías completadas"),
+        func.coalesce(stats.c.total, 0).label("Tecnologías totales"),
+        models.UserTrainingAssignment.assignment_created_at.label("Asignada"),
+        models.UserTrainingAssignment.assignment_updated_at.label("Actualizada")
+    ).select_from(models.Team).join(
+        supervisor, models.Team.supervisor_id == supervisor.user_id
+    ).join(
+        supervisor_person, supervisor.person_id == supervisor_person.person_id
+    ).join(
+        models.TeamMember, and_(
+            models.TeamMember.team_id == models.Team.team_id,
+            models.TeamMember.member_status == 'A',
+            models.TeamMember.member_role == 'client'
+        )
+    ).join(
+        models.User, models.TeamMember.user_id == models.User.user_id
+    ).join(
+        models.Person, models.User.person_id == models.Person.person_id
+    ).join(
+        models.UserTrainingAssignment, models.UserTrainingAssignment.user_id == models.User.user_id
+    ).join(
+        models.Training, models.UserTrainingAssignment.training_id == models.Training.training_id
+    ).outerjoin(
+        instructor, models.UserTrainingAssignment.instructor_id == instructor.user_id
+    ).outerjoin(
+        instructor_person, instructor.person_id == instructor_person.person_id
+    ).outerjoin(
+        stats, stats.c.assignment_id == models.UserTrainingAssignment.assignment_id
+    ).where(
+        models.Team.team_status == 'A'
+    ).order_by(
+        models.Team.team_name, models.Team.team_id, models.Person.person_last_name,
+        models.User.user_id, models.UserTrainingAssignment.assignment_id
+    )
+    if team_id is not None:
+        query = query.where(models.Team.team_id == team_id)
+    if supervisor_id is not None:
+        query = query.where(models.Team.supervisor_id == supervisor_id)
+    return query
+
+
+def progress_by_technology_query(team_id: int = None, supervisor_id: int = None):
+    progress = models.UserTechnologyProgress
+    query = select(
+        models.Technology.technology_name.label("Tecnología"),
+        models.Training.training_name.label("Capacitación"),
+        models.User.user_username.label("Usuario"),
+        full_name(models.Person).label("Nombre"),
+        (progress.is_completed == 'Y').label("Completada"),
+        progress.completed_at.label("Fecha de finalización"),
+        models.UserTrainingAssignment.assignment_status.label("Estado de la asignación")
+    ).select_from(progress).join(
+        models.Technology, progress.technology_id == models.Technology.technology_id
+    ).join(
+        models.UserTrainingAssignment, progress.assignment_id == models.UserTrainingAssignment.assignment_id
+    ).join(
+        models.Training, models.UserTrainingAssignment.training_id == models.Training.training_id
+    ).join(
+        models.User, models.UserTrainingAssignment.user_id == models.User.user_id
+    ).join(
+        models.Person, models.User.person_id == models.Person.person_id
+    ).order_by(
+        models.Technology.technology_name, models.Training.training_name,
+        models.User.user_username, progress.progress_id
+    )
+    if team_id is not None or supervisor_id is not None:
+        query = query.where(models.User.user_id.in_(team_user_ids(team_id, supervisor_id, "client")))
+    return query
+
+
+def instructor_workload_query(team_id: int = None, supervisor_id: int = None):
+    assignment = models.UserTrainingAssignment
+    assignment_stats = select(
+        assignment.instructor_id.label("instructor_id"),
+        func.count().label("total"),
+        powerbi.count_where(assignment.assignment_status.in_(['not_started', 'assigned'])).label("pending"),
+        powerbi.count_where(assignment.assignment_status == 'in_progress').label("in_progress"),
+        powerbi.count_where(assignment.assignment_status == 'completed').label("completed"),
+        func.count(distinct(assignment.training_id)).label("trainings"),
+        func.count(distinct(assignment.user_id)).label("clients")
+    ).where(assignment.instructor_id.is_not(None)).group_by(assignment.instructor_id).subquery()
+
+    team_stats = select(
+        models.TeamMember.user_id.label("user_id"),
+        func.count().label("teams")
+    ).where(
+        models.TeamMember.member_status == 'A',
+        models.TeamMember.member_role == 'instructor'
+    ).group_by(models.TeamMember.user_id).subquery()
+
+    material_stats = select(
+        models.TrainingMaterial.instructor_id.label("instructor_id"),
+        func.count().label("materials")
+    ).where(models.TrainingMaterial.material_status == 'A').group_by(models.TrainingMaterial.instructor_id).subquery()
+
+    query = select(
+        models.User.user_username.label("Usuario"),
+        full_name(models.Person).label("Instructor"),
+        models.Person.person_email.label("Email"),
+        func.coalesce(team_stats.c.teams, 0).label("Equipos"),
+        func.coalesce(assignment_stats.c.trainings, 0).label("Capacitaciones"),
+        func.coalesce(assignment_stats.c.clients, 0).label("Clientes"),
+        func.coalesce(assignment_stats.c.total, 0).label("Asignaciones"),
+        func.coalesce(assignment_stats.c.pending, 0).label("Pendientes"),
+        func.coalesce(assignment_stats.c.in_progress, 0).label("En progreso"),
+        func.coalesce(assignment_stats.c.completed, 0).label("Completadas"),
+        func.coalesce(material_stats.c.materials, 0).label("Materiales publicados")
+    ).select_from(models.User).join(
+        models.Person, models.User.person_id == models.Person.person_id
+    ).outerjoin(
+        assignment_stats, assignment_stats.c.instructor_id == models.User.user_id
+    ).outerjoin(
+        team_stats, team_stats.c.user_id == models.User.user_id
+    ).outerjoin(
+        material_stats, material_stats.c.instructor_id == models.User.user_id
+    ).where(
+        models.User.user_role == 4,  # Rol instructor
+        models.User.user_status == 'A'
+    ).order_by(func.coalesce(assignment_stats.c.total, 0).desc(), models.User.user_username)
+    if team_id is not None or supervisor_id is not None:
+        query = query.where(models.User.user_id.in_(team_user_ids(team_id, supervisor_id, "instructor")))
+    return query
+
+
+REPORTS = {
+    "assignments-by-team": {
+        "title": "Asignaciones por equipo",
+        "description": "Asignaciones de los clientes de cada equipo con su avance por tecnologías",
+        "query": assignments_by_team_query,
+    },
+    "progress-by-technology": {
+        "title": "Progreso por tecnología",
+        "description": "Avance de cada usuario en cada tecnología de sus capacitaciones",
+        "query": progress_by_technology_query,
+    },
+    "instructor-workload": {
+        "title": "Carga de instructores",
+        "description": "Capacitaciones, clientes, asignaciones y materiales de cada instructor",
+        "query": instructor_workload_query,
+    },
+}
+
+
+def cell_value(key: str, value):
+    if key.startswith("Estado") and value in ASSIGNMENT_STATUS_LABELS:
+        return ASSIGNMENT_STATUS_LABELS[value]
+    if isinstance(value, bool):
+        return "Sí" if value else "No"
+    return value
+
+
+def write_report(name: str, path: str, team_id: int = None, supervisor_id: int = None, on_progress=None):
+    """
+    Escribir el reporte en un archivo xlsx. Si supera el límite de filas de Excel
+    continúa en hojas adicionales. Retorna la cantidad de filas escritas.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    from openpyxl.utils import get_column_letter
+
+    report = REPORTS[name]
+    query = report["query"](team_id, supervisor_id)
+    keys = list(query.selected_columns.keys())
+
+    workbook = Workbook(write_only=True)
+    bold = Font(bold=True)
+    sheets = []
+
+    def new_sheet():
+        suffix = f" ({len(sheets) + 1})" if sheets else ""
+        sheet = workbook.create_sheet(title=(report["title"][:31 - len(suffix)] + suffix))
+        for index, key in enumerate(keys, start=1):
+            sheet.column_dimensions[get_column_letter(index)].width = max(12, len(key) + 4)
+        sheet.freeze_panes = "A2"
+        header = []
+        for key in keys:
+            cell = WriteOnlyCell(sheet, value=key)
+            cell.font = bold
+            header.append(cell)
+        sheet.append(header)
+        sheets.append(sheet)
+        return sheet
+
+    sheet = new_sheet()
+    sheet_rows = 1
+    rows = 0
+    for batch in powerbi.iter_batches(query):
+        for row in batch:
+            if sheet_rows == EXCEL_MAX_ROWS:
+                sheet = new_sheet()
+                sheet_rows = 1
+            sheet.append([cell_value(key, value) for key, value in zip(keys, row)])
+            sheet_rows += 1
+        rows += len(batch)
+        if on_progress:
+            on_progress(rows)
+
+    workbook.save(path)
+    return rows
+
+
+def report_filename(name: str, team_id: int = None) -> str:
+    suffix = f"-equipo-{team_id}" if team_id is not None else ""
+    return f"{name}{suffix}-{datetime.utcnow():%Y%m%d-%H%M}.xlsx"
+
+
+# ================================
+# TRABAJOS DE EXPORTACIÓN
+# ================================
+
+# Un cupo por exportación en curso, compartido entre descargas directas y trabajos
+_export_slots = threading.BoundedSemaphore(REPORTS_MAX_CONCURRENT_EXPORTS)
+
+
+@jobs.register("report-export", priority=0, description="Exportación de un reporte a Excel", retention_seconds=REPORTS_EXPORT_TTL_SECONDS)
+def run_export_job(ctx, db, params):
+    report = params["report"]
+    team_id = params.get("team_id")
+    supervisor_id = params.get("supervisor_id")
+    os.makedirs(REPORTS_EXPORT_DIR, exist_ok=True)
+    path = os.path.join(REPORTS_EXPORT_DIR, f"{ctx.job_id}.xlsx")
+    tmp_path = path + ".tmp"
+    try:
+        with _export_slots:
+            rows = write_report(
+                report, tmp_path, team_id, supervisor_id,
+                on_progress=lambda rows: ctx.progress(message=f"{rows} filas escritas")
+            )
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    return {
+        "rows": rows,
+        "file": {"path": path, "filename": report_filename(report, team_id), "media_type": XLSX_MEDIA_TYPE},
+    }
+
+
+def submit_export(report: str, team_id: int = None, supervisor_id: int = None) -> dict:
+    if jobs.count_active("report-export") >= REPORTS_MAX_PENDING_EXPORTS:
+        raise ExportBusy()
+    try:
+        return jobs.enqueue("report-export", {"report": report, "team_id": team_id, "supervisor_id": supervisor_id})
+    except jobs.JobQueueFull:
+        raise ExportBusy()
+
+
+def export_now(report: str, path: str, team_id: int = None, supervisor_id: int = None) -> int:
+    """
+    Exportación directa (para reportes chicos). No espera cupo: si no hay, se rechaza.
+    """
+    if not _export_slots.acquire(blocking=False):
+        raise ExportBusy()
+    try:
+        return write_report(report, path, team_id, supervisor_id)
+    finally:
+        _export_slots.release()
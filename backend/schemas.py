@@ -1,6 +1,6 @@
 from pydantic import BaseModel, EmailStr
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 
 # Base schemas
 class GenderBase(BaseModel):
@@ -263,6 +263,8 @@ class TrainingMaterial(TrainingMaterialBase):
     instructor_id: int
     material_status: str
     material_created_at: datetime
+    material_file_sha256: Optional[str] = None
+    material_file_name: Optional[str] = None
     training: Training
     instructor: User
     
@@ -319,4 +321,72 @@ class UserMaterialProgress(UserMaterialProgressBase):
     assignment: Optional['UserTrainingAssignment'] = None
     
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# Esquemas para estado de enlaces de materiales
+class MaterialLinkStatus(BaseModel):
+    status_id: int
+    material_id: int
+    checked_url: str
+    http_status: Optional[int] = None
+    is_ok: str
+    error_message: Optional[str] = None
+    consecutive_failures: int
+    last_checked_at: Optional[datetime] = None
+    next_check_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
+
+# Esquemas para la proyección de asignaciones (filas planas de acd_v_assignment_view)
+class AssignmentViewRow(BaseModel):
+    assignment_id: int
+    user_id: int
+    client_username: str
+    client_first_name: str
+    client_last_name: str
+    client_email: str
+    client_gender: str
+    training_id: int
+    training_name: str
+    training_description: Optional[str] = None
+    instructor_id: Optional[int] = None
+    instructor_username: Optional[str] = None
+    instructor_first_name: Optional[str] = None
+    instructor_last_name: Optional[str] = None
+    instructor_meeting_link: Optional[str] = None
+    assignment_status: str
+    completion_percentage: float
+    technologies_total: int
+    technologies_completed: int
+    team_ids: List[int]
+    assignment_created_at: Optional[datetime] = None
+    row_updated_at: datetime
+
+class AssignmentViewSummary(BaseModel):
+    total: int
+    by_status: Dict[str, int]
+    average_completion: float
+    technologies_total: int
+    technologies_completed: int
+
+# Esquemas para solicitudes en lote (POST /api/v1/batch)
+class BatchRequestItem(BaseModel):
+    id: Optional[str] = None
+    method: str = "GET"
+    url: str
+    headers: Optional[Dict[str, str]] = None
+    body: Optional[Any] = None
+    depends_on: List[str] = []
+
+class BatchRequest(BaseModel):
+    requests: List[BatchRequestItem]
+
+class BatchResponseItem(BaseModel):
+    id: str
+    status: int
+    headers: Dict[str, str]
+    body: Optional[Any] = None
+
+class BatchResponse(BaseModel):
+    responses: List[BatchResponseItem]
\ No newline at end of file
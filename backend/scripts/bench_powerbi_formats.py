@@ -0,0 +1,103 @@
+"""
+Comparar tamaño y tiempo de los formatos de salida de los datasets de Power BI.
+
+Para cada dataset se mide el tiempo de generar la respuesta completa y su tamaño
+en json (la respuesta por defecto), ndjson, csv, parquet y arrow, y el tiempo
+que le toma a pandas volver a leer cada archivo.
+
+Uso (desde backend/):
+    python -m scripts.bench_powerbi_formats
+    python -m scripts.bench_powerbi_formats --users 20000 --datasets progress-summary
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+
+import pandas as pd
+
+import powerbi
+from scripts.seed_data import create_dataset_engine, populate
+
+FORMATS = ["json", "ndjson", "csv", "parquet", "arrow"]
+
+
+def build(Session, dataset, fmt, path):
+    """
+    Generar la salida del dataset en el formato indicado y escribirla en path
+    """
+    if fmt == "json":
+        db = Session()
+        try:
+            result = powerbi.fetch_dataset(db, dataset)
+        finally:
+            db.close()
+        with open(path, "wb") as f:
+            f.write(json.dumps({"data": result, "count": len(result)}, ensure_ascii=False).encode("utf-8"))
+    elif fmt in powerbi.STREAM_MEDIA_TYPES:
+        with open(path, "wb") as f:
+            for chunk in powerbi.stream_dataset(dataset, fmt):
+                f.write(chunk)
+    else:
+        powerbi.write_columnar(dataset, fmt, path)
+
+
+def load(fmt, path):
+    """
+    Leer el archivo generado como lo haría el equipo de BI
+    """
+    if fmt == "json":
+        with open(path, "rb") as f:
+            return pd.DataFrame(json.load(f)["data"])
+    if fmt == "ndjson":
+        return pd.read_json(path, lines=True)
+    if fmt == "csv":
+        return pd.read_csv(path)
+    if fmt == "parquet":
+        return pd.read_parquet(path)
+    import pyarrow as pa
+    with pa.ipc.open_stream(path) as reader:
+        return reader.read_pandas()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--datasets", nargs="+", default=list(powerbi.DATASETS))
+    args = parser.parse_args()
+
+    engine, Session, db_path = create_dataset_engine()
+    powerbi.engine = engine
+    try:
+        db = Session()
+        summary = populate(db, users=args.users)
+        db.close()
+        print(f"{summary['users']} usuarios, {summary['assignments']} asignaciones, "
+              f"{summary['technology_progress']} registros de progreso\n")
+        print(f"{'dataset':20} {'formato':8} {'generar (s)':>12} {'leer (s)':>10} {'tamaño (KB)':>12} {'vs json':>8}")
+        for dataset in args.datasets:
+            json_size = None
+            for fmt in FORMATS:
+                fd, path = tempfile.mkstemp(suffix=f".{fmt}")
+                os.close(fd)
+                try:
+                    started = time.perf_counter()
+                    build(Session, dataset, fmt, path)
+                    build_time = time.perf_counter() - started
+                    started = time.perf_counter()
+                    load(fmt, path)
+                    load_time = time.perf_counter() - started
+                    size = os.path.getsize(path)
+                finally:
+                    os.unlink(path)
+                json_size = json_size or size
+                print(f"{dataset:20} {fmt:8} {build_time:12.3f} {load_time:10.3f} {size / 1024:12.1f} {size / json_size:8.2f}")
+            print()
+    finally:
+        engine.dispose()
+        os.unlink(db_path)
+
+
+if __name__ == "__main__":
+    main()
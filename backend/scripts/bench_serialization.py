@@ -0,0 +1,127 @@
+"""
+Medir el costo por fila de serializar las respuestas de esquemas anidados.
+
+Compara, para las listas más pesadas (usuarios, equipos y asignaciones), tres formas
+de convertir los objetos ORM ya cargados en bytes JSON:
+  - pydantic+json:   validación con los esquemas Pydantic y codificación con la librería
+                     estándar (lo que hacía FastAPI antes de serializar en pydantic-core)
+  - pydantic:        validación con los esquemas Pydantic y dump_json de pydantic-core
+  - confiable+orjson: diccionarios armados por serializers.TrustedSerializer sin revalidar
+                     y codificados con orjson (lo que hacen ahora las rutas)
+
+También comprueba que la salida rápida sea idéntica a la de los esquemas Pydantic.
+
+Uso (desde backend/):
+    python -m scripts.bench_serialization
+    python -m scripts.bench_serialization --users 5000 --repeat 5
+"""
+import os
+import json
+import time
+import argparse
+from typing import List
+
+from pydantic import TypeAdapter
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import joinedload, selectinload
+
+import models
+import schemas
+import serializers
+from scripts.seed_data import create_dataset_engine, populate
+
+
+def user_options(relationship):
+    return [
+        relationship.joinedload(models.User.person).joinedload(models.Person.gender),
+        relationship.joinedload(models.User.role),
+    ]
+
+
+def load_rows(db):
+    """
+    Cargar todas las filas con sus relaciones para medir solo la serialización
+    """
+    users = db.query(models.User).options(
+        joinedload(models.User.person).joinedload(models.Person.gender),
+        joinedload(models.User.role)
+    ).all()
+    teams = db.query(models.Team).options(
+        *user_options(joinedload(models.Team.supervisor)),
+        *user_options(selectinload(models.Team.team_members).joinedload(models.TeamMember.user))
+    ).all()
+    assignments = db.query(models.UserTrainingAssignment).options(
+        *user_options(joinedload(models.UserTrainingAssignment.user)),
+        *user_options(joinedload(models.UserTrainingAssignment.instructor)),
+        joinedload(models.UserTrainingAssignment.training).joinedload(models.Training.training_technologies).joinedload(models.TrainingTechnology.technology)
+    ).all()
+    return [
+        ("usuarios", "user", schemas.User, users),
+        ("equipos", "team", schemas.Team, teams),
+        ("asignaciones", "assignment", schemas.UserTrainingAssignment, assignments),
+    ]
+
+
+def pydantic_stdlib(adapter, rows):
+    validated = adapter.validate_python(rows, from_attributes=True)
+    return json.dumps(jsonable_encoder(validated), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def pydantic_core(adapter, rows):
+    return adapter.dump_json(adapter.validate_python(rows, from_attributes=True))
+
+
+def trusted_orjson(kind, rows):
+    return serializers.serialize_list(kind, rows).body
+
+
+def measure(function, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        output = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000, help="cantidad de usuarios del dataset sintético")
+    parser.add_argument("--repeat", type=int, default=3, help="repeticiones por medición (se reporta la mejor)")
+    args = parser.parse_args()
+
+    print(f"orjson {'disponible' if serializers.orjson else 'NO instalado (se usa json estándar)'}")
+    engine, Session, db_path = create_dataset_engine()
+    failures = 0
+    try:
+        db = Session()
+        populate(db, users=args.users)
+        db.close()
+
+        db = Session()
+        print(f"\n{'lista':14} {'filas':>7} {'pydantic+json':>15} {'pydantic':>12} {'confiable+orjson':>18} {'mejora':>8}")
+        for label, kind, schema, rows in load_rows(db):
+            adapter = TypeAdapter(List[schema])
+            slow, slow_output = measure(lambda: pydantic_stdlib(adapter, rows), args.repeat)
+            core, core_output = measure(lambda: pydantic_core(adapter, rows), args.repeat)
+            fast, fast_output = measure(lambda: trusted_orjson(kind, rows), args.repeat)
+
+            count = max(len(rows), 1)
+            print(f"{label:14} {len(rows):7} {slow / count * 1e6:12.1f} µs {core / count * 1e6:9.1f} µs "
+                  f"{fast / count * 1e6:15.1f} µs {core / fast:7.1f}x")
+
+            if json.loads(fast_output) != json.loads(core_output) or json.loads(slow_output) != json.loads(core_output):
+                failures += 1
+                print(f"  FALLA: la salida de {label} no coincide con el esquema {schema.__name__}")
+        db.close()
+    finally:
+        engine.dispose()
+        os.unlink(db_path)
+
+    print("\nCostos por fila; 'mejora' compara pydantic contra confiable+orjson.")
+    raise SystemExit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Cargar el warehouse analítico (esquema estrella) desde la base operacional.
+
+Sin argumentos hace una carga incremental sobre ./career_plan.db. Con --users se genera
+primero un dataset sintético en una base temporal y se comparan las filas del warehouse
+con las de la base de origen, para medir tamaño y tiempo de carga.
+
+Uso (desde backend/):
+    python -m scripts.build_warehouse
+    python -m scripts.build_warehouse --full
+    python -m scripts.build_warehouse --users 5000 --path /tmp/analytics.db
+"""
+import os
+import time
+import argparse
+from datetime import timedelta
+
+from sqlalchemy import select, func
+
+import models
+import powerbi
+import warehouse
+from scripts.seed_data import create_dataset_engine, populate
+
+
+def print_result(label, result, elapsed):
+    print(f"\n{label} ({elapsed:.2f} s)")
+    for table, rows in result.items():
+        print(f"  {table:26} {rows:9} filas")
+
+
+def check_counts(engine, path):
+    """
+    Cada hecho debe tener exactamente una fila por fila de origen
+    """
+    expected = {
+        "dim_user": models.User,
+        "dim_training": models.Training,
+        "dim_technology": models.Technology,
+        "dim_team": models.Team,
+        "bridge_team_member": models.TeamMember,
+        "fact_assignment": models.UserTrainingAssignment,
+        "fact_technology_progress": models.UserTechnologyProgress,
+        "fact_material_progress": models.UserMaterialProgress,
+    }
+    status = {table["table"]: table["rows"] for table in warehouse.warehouse_status(path)["tables"]}
+    failures = 0
+    with engine.connect() as conn:
+        for table, model in expected.items():
+            source_rows = conn.execute(select(func.count()).select_from(model)).scalar()
+            ok = source_rows == status[table]
+            failures += 0 if ok else 1
+            print(f"  {'OK   ' if ok else 'FALLA'} {table:26} origen={source_rows:9} warehouse={status[table]:9}")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--full", action="store_true", help="reconstruir el warehouse desde cero")
+    parser.add_argument("--path", default=None, help=f"archivo del warehouse (por defecto {warehouse.WAREHOUSE_PATH})")
+    parser.add_argument("--users", type=int, default=None, help="generar un dataset sintético con esta cantidad de usuarios")
+    args = parser.parse_args()
+
+    if args.users is None:
+        started = time.perf_counter()
+        result = warehouse.build_warehouse(full=args.full, path=args.path)
+        print_result("Carga completa" if args.full else "Carga incremental", result, time.perf_counter() - started)
+        return
+
+    engine, Session, db_path = create_dataset_engine()
+    path = args.path or db_path + ".analytics"
+    # Sin escrituras concurrentes no hace falta el margen de la marca de agua
+    powerbi.WATERMARK_LAG = timedelta(0)
+    try:
+        db = Session()
+        summary = populate(db, users=args.users)
+        print(f"{summary['users']} usuarios, {summary['assignments']} asignaciones, "
+              f"{summary['technology_progress']} registros de progreso")
+
+        started = time.perf_counter()
+        result = warehouse.build_warehouse(full=True, path=path, source_engine=engine)
+        print_result("Carga completa", result, time.perf_counter() - started)
+
+        # Modificar algunas filas y verificar que la carga incremental solo lee esas
+        for assignment in db.query(models.UserTrainingAssignment).limit(10).all():
+            assignment.assignment_status = 'completed'
+        db.query(models.Person).first().person_last_name = "Modificado"
+        db.commit()
+        db.close()
+
+        started = time.perf_counter()
+        result = warehouse.build_warehouse(path=path, source_engine=engine)
+        print_result("Carga incremental", result, time.perf_counter() - started)
+
+        print(f"\nTamaño del warehouse: {os.path.getsize(path) / 1024:.1f} KB "
+              f"(base operacional: {os.path.getsize(db_path) / 1024:.1f} KB)")
+        failures = check_counts(engine, path)
+        raise SystemExit(1 if failures else 0)
+    finally:
+        engine.dispose()
+        os.unlink(db_path)
+        if not args.path and os.path.exists(path):
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,490 @@
+"""
+Prueba de carga HTTP con una mezcla de tráfico por rol.
+
+Levanta el servidor (serve.py) sobre una base sintética en un directorio temporal, o
+apunta a uno ya levantado con --url, y lo recorre con usuarios virtuales concurrentes.
+Cada usuario virtual elige un rol según --mix, inicia sesión con un usuario de ese rol
+y recorre las pantallas de su dashboard:
+  cliente      asignaciones propias, progreso de tecnologías y materiales, marca avances
+  instructor   capacitaciones asignadas, materiales, progreso de sus clientes
+  supervisor   equipos propios, asignaciones de sus clientes, resumen de equipos (Power BI)
+  admin        usuarios, equipos, asignaciones y datasets de Power BI
+
+Reporta por ruta (plantilla, no URL concreta) latencias p50/p95/p99, solicitudes por
+segundo y tasa de error, y guarda el resultado en JSON. Con --baseline compara contra
+una corrida anterior y termina con código 1 si alguna ruta empeoró más de la tolerancia.
+
+Uso (desde backend/):
+    python -m scripts.loadtest
+    python -m scripts.loadtest --concurrency 50 --duration 60 --workers 4
+    python -m scripts.loadtest --output loadtest-base.json
+    python -m scripts.loadtest --baseline loadtest-base.json --tolerance 0.2
+    python -m scripts.loadtest --url http://localhost:8000 --mix client=80,supervisor=20
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import socket
+import signal
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+
+import httpx
+
+from scripts.seed_data import PASSWORD, create_dataset_engine, populate
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROLE_IDS = {"admin": 1, "supervisor": 2, "client": 3, "instructor": 4}
+DEFAULT_MIX = "client=60,instructor=15,supervisor=20,admin=5"
+# Probabilidad de que un cliente marque una tecnología en su recorrido
+CLIENT_WRITE_RATIO = 0.2
+
+
+def parse_mix(value: str):
+    mix = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        role, _, weight = item.partition("=")
+        if role.strip() not in ROLE_IDS:
+            raise SystemExit(f"Rol desconocido en --mix: {role}. Opciones: {', '.join(ROLE_IDS)}")
+        mix[role.strip()] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise SystemExit("--mix debe tener al menos un rol con peso positivo")
+    return mix
+
+
+def percentile(sorted_values, p: float):
+    """
+    Percentil por rango más cercano sobre una lista ya ordenada
+    """
+    if not sorted_values:
+        return None
+    rank = math.ceil(p / 100 * len(sorted_values))
+    return sorted_values[max(0, min(len(sorted_values), rank) - 1)]
+
+
+class Recorder:
+    """
+    Latencias y errores por ruta. Solo registra después del calentamiento.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.recording = False
+        self.started_at = None
+        self.finished_at = None
+
+    def start(self):
+        self.recording = True
+        self.started_at = time.perf_counter()
+
+    def stop(self):
+        self.recording = False
+        self.finished_at = time.perf_counter()
+
+    def add(self, route: str, elapsed_ms: float, ok: bool, status):
+        if not self.recording:
+            return
+        stats = self.routes.setdefault(route, {"latencies": [], "errors": 0, "statuses": {}})
+        stats["latencies"].append(elapsed_ms)
+        if not ok:
+            stats["errors"] += 1
+        key = str(status)
+        stats["statuses"][key] = stats["statuses"].get(key, 0) + 1
+
+    def summary(self):
+        elapsed = (self.finished_at or time.perf_counter()) - self.started_at
+        routes = {}
+        all_latencies, all_errors = [], 0
+        for route, stats in sorted(self.routes.items()):
+            latencies = sorted(stats["latencies"])
+            all_latencies.extend(latencies)
+            all_errors += stats["errors"]
+            routes[route] = describe(latencies, stats["errors"], elapsed)
+            routes[route]["statuses"] = stats["statuses"]
+        return {
+            "duration_seconds": round(elapsed, 2),
+            "total": describe(sorted(all_latencies), all_errors, elapsed),
+            "routes": routes,
+        }
+
+
+def describe(latencies, errors: int, elapsed: float):
+    count = len(latencies)
+    return {
+        "requests": count,
+        "errors": errors,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "rps": round(count / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2) if count else None,
+        "p95_ms": round(percentile(latencies, 95), 2) if count else None,
+        "p99_ms": round(percentile(latencies, 99), 2) if count else None,
+        "max_ms": round(latencies[-1], 2) if count else None,
+        "mean_ms": round(sum(latencies) / count, 2) if count else None,
+    }
+
+
+class VirtualUser:
+    """
+    Cliente HTTP de un usuario virtual: cada solicitud se registra con la plantilla de su ruta
+    """
+
+    def __init__(self, client: httpx.AsyncClient, recorder: Recorder, rnd: random.Random, password: str):
+        self.client = client
+        self.recorder = recorder
+        self.rnd = rnd
+        self.password = password
+
+    async def request(self, method: str, route: str, url: str = None, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url or route, **kwargs)
+        except httpx.HTTPError as e:
+            self.recorder.add(f"{method} {route}", (time.perf_counter() - started) * 1000, False, type(e).__name__)
+            return None
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.recorder.add(f"{method} {route}", elapsed_ms, response.status_code < 400, response.status_code)
+        return response
+
+    async def get_json(self, route: str, url: str = None, **kwargs):
+        response = await self.request("GET", route, url, **kwargs)
+        if response is None or response.status_code != 200:
+            return None
+        return response.json()
+
+    async def login(self, user):
+        response = await self.request(
+            "POST", "/api/v1/auth/login",
+            json={"username": user["user_username"], "password": self.password},
+        )
+        return response is not None and response.status_code == 200
+
+
+# ---- Escenarios por rol ----
+
+async def client_scenario(vu: VirtualUser, user):
+    user_id = user["user_id"]
+    assignments = await vu.get_json(
+        "/api/v1/user-training-assignments/user/{user_id}",
+        f"/api/v1/user-training-assignments/user/{user_id}",
+    ) or []
+    if not assignments:
+        return
+    assignment = vu.rnd.choice(assignments)
+    assignment_id = assignment["assignment_id"]
+    await vu.get_json(
+        "/api/v1/user-technology-progress/assignment/{assignment_id}",
+        f"/api/v1/user-technology-progress/assignment/{assignment_id}",
+    )
+    await vu.get_json(
+        "/api/v1/user-material-progress/assignment/{assignment_id}",
+        f"/api/v1/user-material-progress/assignment/{assignment_id}",
+    )
+    await vu.get_json(
+        "/api/v1/training-materials?training_id={training_id}",
+        "/api/v1/training-materials", params={"training_id": assignment["training_id"]},
+    )
+    technologies = (assignment.get("training") or {}).get("training_technologies") or []
+    if technologies and vu.rnd.random() < CLIENT_WRITE_RATIO:
+        technology = vu.rnd.choice(technologies)
+        await vu.request(
+            "POST", "/api/v1/user-technology-progress",
+            json={
+                "assignment_id": assignment_id,
+                "technology_id": technology["technology_id"],
+                "is_completed": vu.rnd.choice(["Y", "N"]),
+            },
+        )
+
+
+async def instructor_scenario(vu: VirtualUser, user):
+    user_id = user["user_id"]
+    await vu.get_json(
+        "/api/v1/instructors/{instructor_id}/assigned-trainings",
+        f"/api/v1/instructors/{user_id}/assigned-trainings",
+    )
+    await vu.get_json(
+        "/api/v1/training-materials?instructor_id={instructor_id}",
+        "/api/v1/training-materials", params={"instructor_id": user_id},
+    )
+    assignments = await vu.get_json("/api/v1/user-training-assignments") or []
+    mine = [assignment for assignment in assignments if assignment.get("instructor_id") == user_id]
+    for assignment in vu.rnd.sample(mine, min(3, len(mine))):
+        await vu.get_json(
+            "/api/v1/user-technology-progress/assignment/{assignment_id}",
+            f"/api/v1/user-technology-progress/assignment/{assignment['assignment_id']}",
+        )
+
+
+async def supervisor_scenario(vu: VirtualUser, user):
+    user_id = user["user_id"]
+    teams = await vu.get_json(
+        "/api/v1/teams/supervisor/{supervisor_id}",
+        f"/api/v1/teams/supervisor/{user_id}",
+    ) or []
+    await vu.get_json("/api/v1/teams")
+    client_ids = [
+        member["user_id"]
+        for team in teams for member in team.get("team_members") or []
+        if member.get("member_role") == "client"
+    ]
+    for client_id in vu.rnd.sample(client_ids, min(3, len(client_ids))):
+        await vu.get_json(
+            "/api/v1/user-training-assignments/user/{user_id}",
+            f"/api/v1/user-training-assignments/user/{client_id}",
+        )
+    await vu.get_json("/api/v1/powerbi/teams-summary")
+
+
+async def admin_scenario(vu: VirtualUser, user):
+    await vu.get_json("/api/v1/users")
+    await vu.get_json("/api/v1/teams")
+    await vu.get_json("/api/v1/user-training-assignments")
+    await vu.get_json("/api/v1/powerbi/users-summary")
+    await vu.get_json("/api/v1/powerbi/progress-summary")
+
+
+SCENARIOS = {
+    "client": client_scenario,
+    "instructor": instructor_scenario,
+    "supervisor": supervisor_scenario,
+    "admin": admin_scenario,
+}
+
+
+# ---- Ejecución ----
+
+async def load_accounts(client: httpx.AsyncClient, mix):
+    """
+    Usuarios de cada rol de la mezcla (los escenarios inician sesión con ellos)
+    """
+    accounts = {}
+    for role in mix:
+        response = await client.get(f"/api/v1/users/by-role/{ROLE_IDS[role]}")
+        response.raise_for_status()
+        users = [user for user in response.json() if user.get("user_status", "A") == "A"]
+        if not users:
+            raise SystemExit(f"No hay usuarios activos con rol {role} en el servidor")
+        accounts[role] = users
+    return accounts
+
+
+async def virtual_user(index: int, client, recorder, accounts, mix, args, stop_at: float):
+    """
+    Sesiones sucesivas: iniciar sesión con un usuario del rol elegido y recorrer su
+    dashboard entre 1 y --session-length veces
+    """
+    rnd = random.Random(args.seed * 1000 + index)
+    vu = VirtualUser(client, recorder, rnd, args.password)
+    roles, weights = list(mix), list(mix.values())
+    while time.perf_counter() < stop_at:
+        role = rnd.choices(roles, weights)[0]
+        user = rnd.choice(accounts[role])
+        if not await vu.login(user):
+            continue
+        for _ in range(rnd.randint(1, args.session_length)):
+            if time.perf_counter() >= stop_at:
+                break
+            await SCENARIOS[role](vu, user)
+            if args.think_ms:
+                await asyncio.sleep(rnd.uniform(0, 2 * args.think_ms) / 1000)
+
+
+async def run_load(base_url: str, args, mix):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    headers = {"Accept-Encoding": "gzip"}
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, headers=headers, timeout=args.timeout) as client:
+        accounts = await load_accounts(client, mix)
+        recorder = Recorder()
+        now = time.perf_counter()
+        stop_at = now + args.warmup + args.duration
+        tasks = [
+            asyncio.create_task(virtual_user(index, client, recorder, accounts, mix, args, stop_at))
+            for index in range(args.concurrency)
+        ]
+        await asyncio.sleep(args.warmup)
+        recorder.start()
+        await asyncio.gather(*tasks)
+        recorder.stop()
+    return recorder.summary()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_local_server(args):
+    """
+    Crear la base sintética en un directorio temporal y levantar serve.py sobre ella
+    """
+    workdir = tempfile.mkdtemp(prefix="career_plan_loadtest_")
+    engine, Session, _ = create_dataset_engine(os.path.join(workdir, "career_plan.db"))
+    db = Session()
+    try:
+        summary = populate(db, users=args.users, seed=args.seed)
+    finally:
+        db.close()
+        engine.dispose()
+    print(f"Dataset: {summary['users']} usuarios, {summary['assignments']} asignaciones ({workdir})")
+
+    port = free_port()
+    env = dict(
+        os.environ,
+        PYTHONPATH=BACKEND_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""),
+        HOST="127.0.0.1",
+        PORT=str(port),
+        WEB_CONCURRENCY=str(args.workers),
+        DB_RESET_ON_STARTUP="false",
+        # Sin tareas que salgan a internet durante la medición
+        LINK_CHECK_INTERVAL_SECONDS="0",
+    )
+    log = open(os.path.join(workdir, "server.log"), "w")
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(BACKEND_DIR, "serve.py")],
+        cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"El servidor terminó al arrancar; ver {log.name}")
+        try:
+            if httpx.get(base_url + "/", timeout=1).status_code == 200:
+                return process, base_url, workdir
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise SystemExit(f"El servidor no respondió en 60 s; ver {log.name}")
+
+
+def stop_local_server(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            capture_output=True, text=True, timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def print_report(result):
+    print(f"\n{'ruta':70} {'solic.':>7} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'error':>7}")
+    rows = list(result["routes"].items()) + [("TOTAL", result["total"])]
+    for route, stats in rows:
+        print(f"{route[:70]:70} {stats['requests']:7} {stats['rps']:7.1f} "
+              f"{stats['p50_ms'] or 0:6.1f}ms {stats['p95_ms'] or 0:6.1f}ms {stats['p99_ms'] or 0:6.1f}ms "
+              f"{stats['error_rate'] * 100:6.2f}%")
+
+
+def compare(result, baseline, tolerance: float, min_delta_ms: float):
+    """
+    Rutas que empeoraron respecto de la línea base: p95 más de `tolerance` (y más de
+    min_delta_ms en valor absoluto) o más de un punto de tasa de error
+    """
+    regressions = []
+    print(f"\n{'ruta':70} {'p95 base':>10} {'p95 ahora':>10} {'cambio':>8}")
+    for route, stats in result["routes"].items():
+        base = baseline.get("routes", {}).get(route)
+        if not base or not base.get("p95_ms") or not stats.get("p95_ms"):
+            continue
+        change = stats["p95_ms"] / base["p95_ms"] - 1
+        slower = change > tolerance and stats["p95_ms"] - base["p95_ms"] > min_delta_ms
+        more_errors = stats["error_rate"] - base["error_rate"] > 0.01
+        mark = "  <-- regresión" if slower or more_errors else ""
+        print(f"{route[:70]:70} {base['p95_ms']:8.1f}ms {stats['p95_ms']:8.1f}ms {change * 100:+7.1f}%{mark}")
+        if slower or more_errors:
+            regressions.append(route)
+    missing = sorted(set(baseline.get("routes", {})) - set(result["routes"]))
+    if missing:
+        print(f"\nRutas de la línea base sin solicitudes en esta corrida: {', '.join(missing)}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="servidor ya levantado (si no, se levanta uno local con datos sintéticos)")
+    parser.add_argument("--users", type=int, default=1000, help="usuarios del dataset sintético (servidor local)")
+    parser.add_argument("--workers", type=int, default=1, help="workers de serve.py (servidor local)")
+    parser.add_argument("--concurrency", type=int, default=20, help="usuarios virtuales simultáneos")
+    parser.add_argument("--duration", type=float, default=30, help="segundos de medición")
+    parser.add_argument("--warmup", type=float, default=5, help="segundos iniciales que no se miden")
+    parser.add_argument("--session-length", type=int, default=5, help="recorridos máximos del dashboard por inicio de sesión")
+    parser.add_argument("--think-ms", type=float, default=0, help="pausa media entre recorridos de un usuario virtual")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"peso de cada rol (por defecto {DEFAULT_MIX})")
+    parser.add_argument("--password", default=PASSWORD, help="contraseña de los usuarios (la del dataset sintético)")
+    parser.add_argument("--timeout", type=float, default=30, help="timeout por solicitud en segundos")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="loadtest-results.json", help="archivo JSON con el resultado")
+    parser.add_argument("--baseline", help="resultado anterior contra el que comparar")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="aumento de p95 tolerado (0.2 = 20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=5, help="diferencia de p95 por debajo de la cual no hay regresión")
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    process = workdir = None
+    base_url = args.url
+    if base_url is None:
+        process, base_url, workdir = start_local_server(args)
+    try:
+        print(f"Carga: {args.concurrency} usuarios virtuales, {args.duration:.0f} s (+{args.warmup:.0f} s de calentamiento) contra {base_url}")
+        summary = asyncio.run(run_load(base_url, args, mix))
+    finally:
+        if process is not None:
+            stop_local_server(process)
+
+    result = {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "url": args.url or "local",
+            "users": None if args.url else args.users,
+            "workers": None if args.url else args.workers,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "session_length": args.session_length,
+            "think_ms": args.think_ms,
+            "mix": mix,
+            "seed": args.seed,
+        },
+        **summary,
+    }
+    print_report(result)
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2, ensure_ascii=False)
+    print(f"\nResultado guardado en {args.output}")
+    if workdir:
+        print(f"Base y log del servidor en {workdir}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} ruta(s) con regresión respecto de {args.baseline}")
+            raise SystemExit(1)
+        print(f"\nSin regresiones respecto de {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
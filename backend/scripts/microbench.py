@@ -0,0 +1,366 @@
+"""
+Micro-benchmarks de las piezas de las rutas calientes, a varias escalas de datos.
+
+Mide por separado lo que la prueba de carga (scripts/loadtest.py) ve sumado:
+  orm.*         cadenas de joinedload/selectinload que usan las rutas (main.*_load_options)
+  schema.*      validación con los esquemas Pydantic (lo que cuesta un response_model)
+  serializer.*  serialización confiable con serializers.TrustedSerializer + orjson
+  auth.*        verificación bcrypt del login (no depende de la escala)
+  powerbi.*     cada consulta de agregación de los datasets de Power BI
+
+Cada escala (cantidad de usuarios generados por scripts.seed_data) se construye una sola
+vez y se guarda en --dataset-dir, así las corridas siguientes la reutilizan.
+Por cada operación se reporta, al estilo de pytest-benchmark: mínimo, mediana, media y
+desviación de varias rondas (cada ronda repite la operación hasta durar --min-time),
+operaciones por segundo y costo por fila; y en una ejecución aparte bajo tracemalloc,
+el pico de memoria asignada por operación y lo que queda retenido al terminar.
+
+Uso (desde backend/):
+    python -m scripts.microbench
+    python -m scripts.microbench --scales 1000,10000 -k orm.
+    python -m scripts.microbench --json microbench-base.json
+    python -m scripts.microbench --compare microbench-base.json
+"""
+import os
+import gc
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+import tempfile
+import tracemalloc
+from datetime import datetime
+from typing import List
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, func
+from sqlalchemy.orm import sessionmaker
+
+import models
+import schemas
+import serializers
+import powerbi
+import main
+from scripts.seed_data import PASSWORD, create_dataset_engine, populate
+
+DEFAULT_SCALES = "1000,10000,100000"
+DEFAULT_DATASET_DIR = os.path.join(tempfile.gettempdir(), "career_plan_microbench")
+
+
+# ---- Datasets por escala (se construyen una vez) ----
+
+class Dataset:
+    def __init__(self, users: int, Session, engine, summary):
+        self.users = users
+        self.Session = Session
+        self.engine = engine
+        self.summary = summary
+        self._db = None
+
+    @property
+    def db(self):
+        # Una sesión por dataset, como la de una solicitud
+        if self._db is None:
+            self._db = self.Session()
+        return self._db
+
+    def reset_session(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def close(self):
+        self.reset_session()
+        self.engine.dispose()
+
+
+def dataset_path(directory: str, users: int, seed: int) -> str:
+    return os.path.join(directory, f"users-{users}-seed-{seed}.db")
+
+
+def load_dataset(directory: str, users: int, seed: int) -> Dataset:
+    """
+    Abrir la base de esta escala, generándola si no existe
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = dataset_path(directory, users, seed)
+    summary_path = path + ".json"
+    if not (os.path.exists(path) and os.path.exists(summary_path)):
+        started = time.perf_counter()
+        print(f"Generando dataset de {users} usuarios en {path} ...", flush=True)
+        engine, Session, _ = create_dataset_engine(path + ".tmp")
+        db = Session()
+        try:
+            summary = populate(db, users=users, seed=seed)
+        finally:
+            db.close()
+            engine.dispose()
+        os.replace(path + ".tmp", path)
+        with open(summary_path, "w") as f:
+            json.dump(summary, f)
+        print(f"  listo en {time.perf_counter() - started:.1f} s", flush=True)
+    with open(summary_path) as f:
+        summary = json.load(f)
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    return Dataset(users, sessionmaker(autocommit=False, autoflush=False, bind=engine), engine, summary)
+
+
+# ---- Registro de benchmarks ----
+
+BENCHMARKS = []
+
+
+def benchmark(name: str, scaled: bool = True):
+    """
+    Registrar un benchmark. La función recibe el dataset (None si no depende de la escala),
+    prepara lo necesario fuera de la medición y retorna (operación, filas por operación).
+    """
+    def decorator(setup):
+        BENCHMARKS.append((name, scaled, setup))
+        return setup
+    return decorator
+
+
+def load_assignments(dataset: Dataset):
+    return dataset.db.query(models.UserTrainingAssignment).options(*main.assignment_load_options()).all()
+
+
+@benchmark("orm.assignments_by_user")
+def bench_assignments_by_user(dataset: Dataset):
+    # La consulta de get_user_training_assignments_by_user, para clientes distintos en cada operación
+    rnd = random.Random(0)
+    client_ids = rnd.sample(dataset.summary["client_ids"], min(200, len(dataset.summary["client_ids"])))
+    position = [0]
+
+    def run():
+        user_id = client_ids[position[0] % len(client_ids)]
+        position[0] += 1
+        dataset.db.expunge_all()
+        return dataset.db.query(models.UserTrainingAssignment).filter(
+            models.UserTrainingAssignment.user_id == user_id
+        ).options(*main.assignment_load_options()).all()
+    return run, 1
+
+
+@benchmark("orm.assignments_all")
+def bench_assignments_all(dataset: Dataset):
+    rows = dataset.db.query(func.count(models.UserTrainingAssignment.assignment_id)).scalar()
+
+    def run():
+        dataset.db.expunge_all()
+        return load_assignments(dataset)
+    return run, rows
+
+
+@benchmark("orm.teams_all")
+def bench_teams_all(dataset: Dataset):
+    rows = dataset.db.query(func.count(models.Team.team_id)).scalar()
+
+    def run():
+        dataset.db.expunge_all()
+        return dataset.db.query(models.Team).options(*main.team_load_options()).all()
+    return run, rows
+
+
+@benchmark("schema.assignment_validate")
+def bench_assignment_validate(dataset: Dataset):
+    # Lo que hace FastAPI con response_model=List[schemas.UserTrainingAssignment]
+    rows = load_assignments(dataset)
+    adapter = TypeAdapter(List[schemas.UserTrainingAssignment])
+    return lambda: adapter.dump_json(adapter.validate_python(rows, from_attributes=True)), len(rows)
+
+
+@benchmark("serializer.assignment_trusted")
+def bench_assignment_trusted(dataset: Dataset):
+    rows = load_assignments(dataset)
+    return lambda: serializers.serialize_list("assignment", rows).body, len(rows)
+
+
+@benchmark("auth.bcrypt_verify", scaled=False)
+def bench_bcrypt_verify(dataset):
+    password_hash = main.pwd_context.hash(PASSWORD)
+    return lambda: main.pwd_context.verify(PASSWORD, password_hash), 1
+
+
+def register_powerbi_benchmarks():
+    for name in powerbi.DATASETS:
+        def setup(dataset: Dataset, name=name):
+            rows = len(powerbi.fetch_dataset(dataset.db, name))
+            return lambda: powerbi.fetch_dataset(dataset.db, name), rows
+        benchmark(f"powerbi.{name}")(setup)
+
+
+register_powerbi_benchmarks()
+
+
+# ---- Medición ----
+
+def calibrate(function, min_time: float) -> int:
+    """
+    Repeticiones por ronda para que cada ronda dure al menos min_time
+    """
+    iterations = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            function()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time or iterations >= 1_000_000:
+            return iterations
+        iterations = max(iterations * 2, int(iterations * min_time / max(elapsed, 1e-9) * 1.2))
+
+
+def measure_time(function, rounds: int, min_time: float, disable_gc: bool):
+    function()  # calentamiento (cachés de compilación de SQLAlchemy y pydantic)
+    iterations = calibrate(function, min_time)
+    timings = []
+    gc_was_enabled = gc.isenabled()
+    if disable_gc:
+        gc.disable()
+    try:
+        for _ in range(rounds):
+            started = time.perf_counter()
+            for _ in range(iterations):
+                function()
+            timings.append((time.perf_counter() - started) / iterations)
+    finally:
+        if disable_gc and gc_was_enabled:
+            gc.enable()
+    return {
+        "rounds": rounds,
+        "iterations": iterations,
+        "min_ms": min(timings) * 1000,
+        "median_ms": statistics.median(timings) * 1000,
+        "mean_ms": statistics.fmean(timings) * 1000,
+        "stddev_ms": (statistics.stdev(timings) if len(timings) > 1 else 0.0) * 1000,
+        "ops_per_second": 1 / statistics.median(timings),
+    }
+
+
+def measure_allocations(function):
+    """
+    Pico de memoria asignada durante una operación y memoria que queda retenida
+    (el resultado se descarta antes de medir lo retenido)
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        start_size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = function()
+        _, peak = tracemalloc.get_traced_memory()
+        del result
+        gc.collect()
+        end_size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"peak_kib": (peak - start_size) / 1024, "retained_kib": (end_size - start_size) / 1024}
+
+
+def run_benchmark(name, setup, dataset, args):
+    operation, rows = setup(dataset)
+    result = {"name": name, "scale": dataset.users if dataset else None, "rows_per_op": rows}
+    result.update(measure_time(operation, args.rounds, args.min_time, args.disable_gc))
+    if not args.no_alloc:
+        result.update(measure_allocations(operation))
+    result["per_row_us"] = result["median_ms"] * 1000 / rows if rows else None
+    return result
+
+
+def print_result(result):
+    scale = f"{result['scale']:>7}" if result["scale"] else "      -"
+    per_row = f"{result['per_row_us']:9.2f} µs" if result["per_row_us"] is not None else " " * 12
+    alloc = f"{result['peak_kib']:10.0f} KiB {result['retained_kib']:8.0f} KiB" if "peak_kib" in result else ""
+    print(f"{result['name']:34} {scale} {result['rows_per_op']:8} {result['min_ms']:10.3f} {result['median_ms']:10.3f} "
+          f"{result['stddev_ms']:8.3f} {result['ops_per_second']:10.1f} {per_row} {alloc}", flush=True)
+
+
+def compare(results, baseline_path: str, tolerance: float):
+    with open(baseline_path) as f:
+        baseline = {(item["name"], item["scale"]): item for item in json.load(f)["benchmarks"]}
+    regressions = []
+    print(f"\n{'benchmark':34} {'escala':>7} {'base ms':>10} {'ahora ms':>10} {'cambio':>8}")
+    for result in results:
+        base = baseline.get((result["name"], result["scale"]))
+        if not base:
+            continue
+        change = result["median_ms"] / base["median_ms"] - 1
+        mark = "  <-- regresión" if change > tolerance else ""
+        scale = result["scale"] or "-"
+        print(f"{result['name']:34} {scale:>7} {base['median_ms']:10.3f} {result['median_ms']:10.3f} {change * 100:+7.1f}%{mark}")
+        if mark:
+            regressions.append(result)
+    return regressions
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help=f"usuarios por dataset, separados por coma (por defecto {DEFAULT_SCALES})")
+    parser.add_argument("-k", "--filter", default="", help="solo los benchmarks cuyo nombre contiene este texto")
+    parser.add_argument("--rounds", type=int, default=5, help="rondas por benchmark")
+    parser.add_argument("--min-time", type=float, default=0.2, help="duración mínima de cada ronda en segundos")
+    parser.add_argument("--disable-gc", action="store_true", help="desactivar el recolector durante las rondas")
+    parser.add_argument("--no-alloc", action="store_true", help="no medir memoria con tracemalloc")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--dataset-dir", default=DEFAULT_DATASET_DIR, help="carpeta donde se guardan los datasets generados")
+    parser.add_argument("--json", help="guardar los resultados en este archivo")
+    parser.add_argument("--compare", help="resultados anteriores (--json) contra los que comparar la mediana")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="aumento de la mediana tolerado (0.15 = 15%%)")
+    parser.add_argument("--list", action="store_true", help="listar los benchmarks y salir")
+    args = parser.parse_args()
+
+    selected = [item for item in BENCHMARKS if args.filter in item[0]]
+    if args.list or not selected:
+        for name, scaled, _ in BENCHMARKS:
+            print(f"{name}{'' if scaled else ' (sin escala)'}")
+        raise SystemExit(0 if args.list else "Ningún benchmark coincide con --filter")
+    scales = [int(value) for value in args.scales.split(",") if value.strip()]
+
+    print(f"orjson {'disponible' if serializers.orjson else 'NO instalado'}; Python {platform.python_version()}")
+    print(f"\n{'benchmark':34} {'escala':>7} {'filas/op':>8} {'mín ms':>10} {'mediana ms':>10} {'desv ms':>8} "
+          f"{'ops/s':>10} {'por fila':>12} {'pico/op':>14} {'retenido':>12}")
+    results = []
+    for name, scaled, setup in selected:
+        if not scaled:
+            results.append(run_benchmark(name, setup, None, args))
+            print_result(results[-1])
+    for users in scales:
+        scaled_benchmarks = [item for item in selected if item[1]]
+        if not scaled_benchmarks:
+            break
+        dataset = load_dataset(args.dataset_dir, users, args.seed)
+        try:
+            for name, _, setup in scaled_benchmarks:
+                results.append(run_benchmark(name, setup, dataset, args))
+                print_result(results[-1])
+                dataset.reset_session()
+        finally:
+            dataset.close()
+
+    print("\nTiempos por operación (mediana de las rondas); 'por fila' divide la mediana por las filas que procesa.")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "meta": {
+                    "created_at": datetime.utcnow().isoformat(),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "orjson": serializers.orjson is not None,
+                    "rounds": args.rounds,
+                    "min_time": args.min_time,
+                    "seed": args.seed,
+                },
+                "benchmarks": results,
+            }, f, indent=2)
+        print(f"Resultados guardados en {args.json}")
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) más lentos que {args.compare}")
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,422 @@
+"""
+Presupuesto de consultas SQL por ruta.
+
+Llama a cada ruta de main.app contra dos datasets sintéticos (uno chico y uno más
+grande), cuenta las sentencias SQL que ejecuta cada solicitud y falla si:
+  - una ruta ejecuta más sentencias que su presupuesto (DEFAULT_BUDGET o BUDGETS); las
+    INSERT repetidas con la misma forma cuentan una vez: son las filas que la petición
+    crea (SQLite no agrupa INSERT ... RETURNING), no lecturas perezosas
+  - la cantidad crece con el tamaño de los datos (típico N+1: un acceso perezoso a una
+    relación dentro de un bucle o durante la serialización de un esquema)
+  - una ruta de la aplicación no tiene caso ni motivo explícito para omitirla (SKIP)
+  - una ruta responde 5xx
+
+Los datos de muestra se eligen entre los más grandes de cada dataset (el usuario con más
+asignaciones, el equipo con más miembros, ...) para que un N+1 se note en el conteo.
+Ante una falla se listan las formas de las sentencias ejecutadas (literales reemplazados)
+con la cantidad de veces que se repitió cada una.
+
+Uso (desde backend/):
+    python -m scripts.query_budget
+    python -m scripts.query_budget --sizes 60,240 -k /teams
+    python -m scripts.query_budget --verbose
+"""
+import os
+import re
+import sys
+import json
+import shutil
+import subprocess
+import argparse
+import tempfile
+from collections import Counter
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event, func
+
+import models
+from scripts.seed_data import PASSWORD, create_dataset_engine, populate
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_BUDGET = 10
+
+# Rutas que necesitan más sentencias (siempre una cantidad fija, sin importar los datos)
+BUDGETS = {
+    ("POST", "/api/v1/init-technologies-trainings"): 12,
+    # La suma de las subsolicitudes del lote (cada una dentro de su propio presupuesto)
+    ("POST", "/api/v1/batch"): 20,
+}
+
+# Rutas que no se llaman, con el motivo
+SKIP = {
+    ("GET", "/api/v1/events"): "flujo SSE que no termina",
+    ("POST", "/api/v1/training-materials/check-links"): "verifica los enlaces contra internet",
+    ("POST", "/api/v1/init-data"): "carga datos fijos; no aplica sobre un dataset poblado",
+}
+
+
+class Case:
+    """
+    Una solicitud a una ruta. `request(ctx)` arma los argumentos de la solicitud con las
+    muestras del dataset; `remember(response, ctx)` guarda datos para casos siguientes.
+    """
+
+    def __init__(self, method: str, path: str, request=None, remember=None):
+        self.method = method
+        self.path = path
+        self.request = request or (lambda ctx: {})
+        self.remember = remember
+
+
+def url(path: str, **values):
+    return path.format(**values)
+
+
+# Orden: lecturas, escrituras y al final las eliminaciones (modifican los datos de muestra)
+CASES = [
+    Case("GET", "/"),
+    Case("GET", "/api/v1/technologies"),
+    Case("GET", "/api/v1/trainings"),
+    Case("GET", "/api/v1/users"),
+    Case("GET", "/api/v1/users/{user_id}"),
+    Case("GET", "/api/v1/roles"),
+    Case("GET", "/api/v1/persons"),
+    Case("GET", "/api/v1/genders"),
+    Case("GET", "/api/v1/positions"),
+    Case("GET", "/api/v1/user-training-assignments"),
+    Case("GET", "/api/v1/user-training-assignments/{assignment_id}"),
+    Case("GET", "/api/v1/user-training-assignments/user/{user_id}"),
+    Case("GET", "/api/v1/assignment-view", lambda ctx: {"params": {"team_id": ctx["team_id"]}}),
+    Case("GET", "/api/v1/assignment-view/summary", lambda ctx: {"params": {"instructor_id": ctx["instructor_id"]}}),
+    Case("GET", "/api/v1/users/by-role/{role_id}"),
+    Case("GET", "/api/v1/teams"),
+    Case("GET", "/api/v1/teams/{team_id}"),
+    Case("GET", "/api/v1/teams/supervisor/{supervisor_id}"),
+    Case("GET", "/api/v1/training-materials", lambda ctx: {"params": {"training_id": ctx["training_id"]}}),
+    Case("GET", "/api/v1/training-materials/link-status"),
+    Case("GET", "/api/v1/training-materials/{material_id}"),
+    Case("GET", "/api/v1/training-materials/{material_id}/file"),
+    Case("GET", "/api/v1/instructors/{instructor_id}/assigned-trainings"),
+    Case("GET", "/api/v1/user-technology-progress/assignment/{assignment_id}"),
+    Case("GET", "/api/v1/user-material-progress/assignment/{assignment_id}"),
+    Case("GET", "/api/v1/powerbi/users-summary"),
+    Case("GET", "/api/v1/powerbi/trainings-summary"),
+    Case("GET", "/api/v1/powerbi/assignments-detail"),
+    Case("GET", "/api/v1/powerbi/teams-summary"),
+    Case("GET", "/api/v1/powerbi/progress-summary"),
+    Case("GET", "/api/v1/powerbi/snapshots"),
+    Case("GET", "/api/v1/powerbi/tables"),
+    Case("GET", "/api/v1/reports"),
+    Case("GET", "/api/v1/reports/{report}/xlsx"),
+    Case("GET", "/api/v1/warehouse/status"),
+    Case("GET", "/api/v1/warehouse/download"),
+    Case("GET", "/api/v1/jobs/types"),
+    Case("GET", "/api/v1/jobs"),
+    Case("GET", "/api/v1/metrics"),
+
+    Case("POST", "/api/v1/auth/login", lambda ctx: {"json": {"username": ctx["username"], "password": PASSWORD}}),
+    Case("POST", "/api/v1/init-technologies-trainings"),
+    Case("POST", "/api/v1/persons", lambda ctx: {"json": {
+        "person_dni": 99000001, "person_first_name": "Carga", "person_last_name": "Prueba",
+        "person_gender": 1, "person_email": "query.budget@viamatica.com",
+    }}, remember=lambda response, ctx: ctx.update(person_id=response.json().get("person_id"))),
+    Case("POST", "/api/v1/users", lambda ctx: {"json": {
+        "user_username": "query.budget", "person_id": ctx.get("person_id"), "user_role": 3, "user_password": "x",
+    }}, remember=lambda response, ctx: ctx.update(new_user_id=response.json().get("user_id"))),
+    Case("POST", "/api/v1/user-training-assignments", lambda ctx: {"json": {
+        "user_id": ctx.get("new_user_id"), "training_id": ctx["training_id"],
+    }}),
+    Case("PUT", "/api/v1/user-training-assignments/training/{training_id}/instructor",
+         lambda ctx: {"json": {"instructor_id": ctx["instructor_id"]}}),
+    Case("POST", "/api/v1/teams", lambda ctx: {"json": {
+        "team_name": "Equipo de prueba", "supervisor_id": ctx["supervisor_id"],
+        "instructors": ctx["team_instructor_ids"], "clients": ctx["team_client_ids"],
+    }}, remember=lambda response, ctx: ctx.update(new_team_id=response.json().get("team_id"))),
+    Case("PUT", "/api/v1/teams/{team_id}", lambda ctx: {"json": {"team_description": "Actualizado"}}),
+    Case("POST", "/api/v1/teams/{team_id}/members", lambda ctx: {
+        "url": url("/api/v1/teams/{team_id}/members", team_id=ctx.get("new_team_id")),
+        "json": {"user_id": ctx.get("new_user_id"), "member_role": "client"},
+    }),
+    Case("POST", "/api/v1/teams/{team_id}/assign-training", lambda ctx: {"json": {"training_id": ctx["training_id"]}}),
+    Case("POST", "/api/v1/teams/{team_id}/assign-training-to-clients", lambda ctx: {"json": {
+        "training_id": ctx["other_training_id"], "client_ids": ctx["team_client_ids"],
+    }}),
+    Case("POST", "/api/v1/training-materials", lambda ctx: {
+        "params": {"instructor_id": ctx["instructor_id"]},
+        "json": {"training_id": ctx["training_id"], "material_title": "Material", "material_url": "https://example.com/material"},
+    }, remember=lambda response, ctx: ctx.update(new_material_id=response.json().get("material_id"))),
+    Case("POST", "/api/v1/training-materials/upload", lambda ctx: {
+        "params": {"instructor_id": ctx["instructor_id"]},
+        "data": {"training_id": str(ctx["training_id"]), "material_title": "Archivo", "material_type": "document"},
+        "files": {"file": ("guia.pdf", b"%PDF-1.4 prueba", "application/pdf")},
+    }),
+    Case("PUT", "/api/v1/training-materials/{material_id}", lambda ctx: {
+        "url": url("/api/v1/training-materials/{material_id}", material_id=ctx.get("new_material_id")),
+        "params": {"instructor_id": ctx["instructor_id"]},
+        "json": {"material_title": "Material actualizado"},
+    }),
+    Case("POST", "/api/v1/user-technology-progress", lambda ctx: {"json": {
+        "assignment_id": ctx["assignment_id"], "technology_id": ctx["technology_id"], "is_completed": "Y",
+    }}),
+    Case("PUT", "/api/v1/user-technology-progress/{progress_id}", lambda ctx: {"json": {"is_completed": "N"}}),
+    Case("POST", "/api/v1/user-material-progress", lambda ctx: {"json": {
+        "user_id": ctx["user_id"], "material_id": ctx["material_id"], "assignment_id": ctx["assignment_id"], "is_completed": "Y",
+    }}),
+    Case("PUT", "/api/v1/user-material-progress/{progress_id}", lambda ctx: {
+        "url": url("/api/v1/user-material-progress/{progress_id}", progress_id=ctx["material_progress_id"]),
+        "json": {"is_completed": "N"},
+    }),
+    Case("POST", "/api/v1/reports/{report}/exports", remember=lambda response, ctx: ctx.update(job_id=response.json().get("job_id"))),
+    Case("GET", "/api/v1/reports/exports/{job_id}"),
+    Case("GET", "/api/v1/reports/exports/{job_id}/download"),
+    Case("POST", "/api/v1/warehouse/refresh"),
+    Case("POST", "/api/v1/jobs", lambda ctx: {"json": {"job_type": "warehouse-refresh"}}),
+    Case("GET", "/api/v1/jobs/{job_id}"),
+    Case("GET", "/api/v1/jobs/{job_id}/download"),
+    Case("POST", "/api/v1/jobs/{job_id}/cancel"),
+    Case("POST", "/api/v1/batch", lambda ctx: {"json": {"requests": [
+        {"id": "roles", "url": "/api/v1/roles"},
+        {"id": "genders", "url": "/api/v1/genders"},
+        {"id": "technologies", "url": "/api/v1/technologies"},
+        {"id": "trainings", "url": "/api/v1/trainings"},
+        {"id": "teams", "url": url("/api/v1/teams/supervisor/{supervisor_id}", supervisor_id=ctx["supervisor_id"])},
+        {"id": "assignments", "url": url("/api/v1/user-training-assignments/user/{user_id}", user_id=ctx["user_id"])},
+    ]}}),
+
+    Case("DELETE", "/api/v1/teams/{team_id}/members/{member_id}"),
+    Case("DELETE", "/api/v1/training-materials/{material_id}", lambda ctx: {
+        "url": url("/api/v1/training-materials/{material_id}", material_id=ctx.get("new_material_id")),
+        "params": {"instructor_id": ctx["instructor_id"]},
+    }),
+    Case("DELETE", "/api/v1/teams/{team_id}", lambda ctx: {
+        "url": url("/api/v1/teams/{team_id}", team_id=ctx.get("new_team_id")),
+    }),
+]
+
+
+def largest(db, column, group_column, *filters):
+    """
+    Valor de group_column con más filas (p. ej. el usuario con más asignaciones)
+    """
+    query = db.query(group_column, func.count(column).label("total")).filter(*filters)
+    return query.group_by(group_column).order_by(func.count(column).desc(), group_column).first()[0]
+
+
+def sample_context(db):
+    """
+    Ids de muestra del dataset, eligiendo las entidades con más filas relacionadas
+    """
+    Assignment, TechProgress, MaterialProgress = models.UserTrainingAssignment, models.UserTechnologyProgress, models.UserMaterialProgress
+    user_id = largest(db, Assignment.assignment_id, Assignment.user_id)
+    assignment_id = largest(db, MaterialProgress.progress_id, MaterialProgress.assignment_id)
+    assignment = db.get(Assignment, assignment_id)
+    team_id = largest(db, models.TeamMember.team_member_id, models.TeamMember.team_id, models.TeamMember.member_status == 'A')
+    team = db.get(models.Team, team_id)
+    training_id = largest(db, Assignment.assignment_id, Assignment.training_id)
+    members = db.query(models.TeamMember).filter(models.TeamMember.team_id == team_id, models.TeamMember.member_status == 'A').all()
+    material = db.query(models.TrainingMaterial).filter(models.TrainingMaterial.training_id == assignment.training_id).first()
+    tech_progress = db.query(TechProgress).filter(TechProgress.assignment_id == assignment_id).first()
+    material_progress = db.query(MaterialProgress).filter(MaterialProgress.assignment_id == assignment_id).first()
+    return {
+        "user_id": user_id,
+        "username": db.get(models.User, user_id).user_username,
+        "assignment_id": assignment_id,
+        "team_id": team_id,
+        "supervisor_id": largest(db, models.Team.team_id, models.Team.supervisor_id),
+        "training_id": training_id,
+        "other_training_id": db.query(models.Training.training_id).filter(models.Training.training_id != training_id).first()[0],
+        "instructor_id": largest(db, Assignment.assignment_id, Assignment.instructor_id, Assignment.instructor_id.isnot(None)),
+        "team_instructor_ids": [member.user_id for member in members if member.member_role == 'instructor'],
+        "team_client_ids": [member.user_id for member in members if member.member_role == 'client'],
+        "member_id": members[0].team_member_id,
+        "material_id": material.material_id if material else 0,
+        "technology_id": tech_progress.technology_id if tech_progress else 1,
+        "progress_id": tech_progress.progress_id if tech_progress else 0,
+        "material_progress_id": material_progress.progress_id if material_progress else 0,
+        "role_id": 3,
+        "report": "assignments-by-team",
+        "team_supervisor_id": team.supervisor_id,
+    }
+
+
+# ---- Conteo de sentencias ----
+
+class StatementLog:
+    def __init__(self):
+        self.statements = []
+        self.active = False
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if self.active:
+            self.statements.append(statement)
+
+
+def statement_shape(statement: str) -> str:
+    """
+    Forma de la sentencia: sin espacios repetidos, literales ni listas de parámetros
+    """
+    shape = re.sub(r"\s+", " ", statement).strip()
+    shape = re.sub(r"'(?:[^']|'')*'", "'?'", shape)
+    shape = re.sub(r"\b\d+\b", "N", shape)
+    shape = re.sub(r"\((?:\s*(?:\?|N|'\?')\s*,)+\s*(?:\?|N|'\?')\s*\)", "(?, ...)", shape)
+    return shape
+
+
+def counted(statements) -> int:
+    """
+    Sentencias que cuentan para el presupuesto (las INSERT de igual forma, una vez)
+    """
+    inserts = {statement_shape(s) for s in statements if s.lstrip().upper().startswith("INSERT")}
+    return sum(1 for s in statements if not s.lstrip().upper().startswith("INSERT")) + len(inserts)
+
+
+def print_shapes(statements, limit: int = 12):
+    for shape, count in Counter(statement_shape(s) for s in statements).most_common(limit):
+        text = shape if len(shape) <= 220 else shape[:217] + "..."
+        print(f"      {count:5}x  {text}")
+
+
+def run_cases(client, cases, ctx, log):
+    results = {}
+    for case in cases:
+        arguments = case.request(ctx)
+        target = arguments.pop("url", None) or url(case.path, **ctx)
+        log.statements = []
+        log.active = True
+        try:
+            response = client.request(case.method, target, **arguments)
+        finally:
+            log.active = False
+        if case.remember and response.status_code < 400:
+            case.remember(response, ctx)
+        results[f"{case.method} {case.path}"] = [response.status_code, list(log.statements)]
+    return results
+
+
+def run_worker(output_path: str, route_filter: str):
+    """
+    Ejecutar los casos contra la base del directorio actual y guardar los resultados.
+    Corre en un proceso aparte por dataset: el engine de la aplicación resuelve la ruta
+    relativa ./career_plan.db al importarse database.
+    """
+    from fastapi.testclient import TestClient
+    from database import engine, SessionLocal
+    import main
+
+    db = SessionLocal()
+    try:
+        ctx = sample_context(db)
+    finally:
+        db.close()
+
+    log = StatementLog()
+    event.listen(engine, "before_cursor_execute", log)
+    # Sin lifespan: no arrancan los workers de trabajos ni las tareas periódicas
+    client = TestClient(main.app, raise_server_exceptions=False)
+    cases = [case for case in CASES if route_filter in case.path]
+    results = run_cases(client, cases, ctx, log)
+
+    routes = sorted(
+        f"{method} {route.path}"
+        for route in main.app.routes if isinstance(route, APIRoute)
+        for method in route.methods - {"HEAD"}
+    )
+    with open(output_path, "w") as f:
+        json.dump({"context": ctx, "routes": routes, "results": results}, f)
+
+
+def run_size(users: int, workdir: str, route_filter: str):
+    """
+    Poblar un dataset de `users` usuarios y ejecutar todos los casos contra él
+    """
+    directory = os.path.join(workdir, f"users-{users}")
+    os.makedirs(directory)
+    dataset_engine, Session, _ = create_dataset_engine(os.path.join(directory, "career_plan.db"))
+    db = Session()
+    try:
+        summary = populate(db, users=users)
+    finally:
+        db.close()
+        dataset_engine.dispose()
+
+    output_path = os.path.join(directory, "results.json")
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    env.setdefault("LINK_CHECK_INTERVAL_SECONDS", "0")
+    subprocess.run(
+        [sys.executable, "-W", "ignore", "-m", "scripts.query_budget", "--worker", output_path, "-k", route_filter],
+        cwd=directory, env=env, check=True,
+    )
+    with open(output_path) as f:
+        output = json.load(f)
+    ctx = output["context"]
+    print(f"Dataset de {users} usuarios: {summary['assignments']} asignaciones, "
+          f"usuario {ctx['user_id']}, equipo {ctx['team_id']}, asignación {ctx['assignment_id']}")
+    return output
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="60,240", help="usuarios del dataset chico y del grande")
+    parser.add_argument("-k", "--filter", default="", help="solo las rutas que contienen este texto")
+    parser.add_argument("--verbose", action="store_true", help="mostrar las sentencias de todas las rutas")
+    parser.add_argument("--keep", action="store_true", help="no borrar los datasets temporales")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.worker, args.filter)
+        return
+
+    small, large = [int(value) for value in args.sizes.split(",")]
+    workdir = tempfile.mkdtemp(prefix="career_plan_query_budget_")
+    try:
+        small_output = run_size(small, workdir, args.filter)
+        large_output = run_size(large, workdir, args.filter)
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    failures = []
+    covered = {f"{case.method} {case.path}" for case in CASES} | {f"{method} {path}" for method, path in SKIP}
+    for route in large_output["routes"]:
+        if route not in covered:
+            failures.append((route, "ruta sin caso en CASES ni motivo en SKIP"))
+
+    print(f"\n{'ruta':74} {'estado':>7} {small:>6} {large:>6} {'límite':>7}")
+    for case in CASES:
+        key = f"{case.method} {case.path}"
+        if key not in large_output["results"]:
+            continue
+        budget = BUDGETS.get((case.method, case.path), DEFAULT_BUDGET)
+        small_status, small_statements = small_output["results"][key]
+        large_status, large_statements = large_output["results"][key]
+        small_count, large_count = counted(small_statements), counted(large_statements)
+        problems = []
+        if max(small_status, large_status) >= 500:
+            problems.append(f"error {max(small_status, large_status)}")
+        if large_count > budget:
+            problems.append(f"{large_count} sentencias, presupuesto {budget}")
+        if large_count > small_count:
+            problems.append(f"crece con los datos ({small_count} -> {large_count})")
+        mark = "  FALLA" if problems else ""
+        print(f"{key:74} {large_status:>7} {small_count:6} {large_count:6} {budget:7}{mark}")
+        if problems or args.verbose:
+            print_shapes(large_statements)
+        for problem in problems:
+            failures.append((key, problem))
+
+    for (method, path), reason in sorted(SKIP.items()):
+        if args.filter in path:
+            print(f"{method + ' ' + path:74} omitida: {reason}")
+
+    if failures:
+        print(f"\n{len(failures)} falla(s):")
+        for route, problem in failures:
+            print(f"  {route}: {problem}")
+        raise SystemExit(1)
+    print("\nTodas las rutas dentro del presupuesto de consultas.")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,50 @@
+"""
+Reconstrucción completa de la proyección de asignaciones (acd_v_assignment_view).
+
+La proyección se mantiene sola en cada escritura hecha con una Session de SQLAlchemy. Este
+comando es para repararla si quedó distinta de las tablas de origen (datos cargados sin
+Session, con engine.begin() o sqlite3, una restauración parcial, un cambio en las columnas
+de la proyección).
+Trabaja sobre career_plan.db del directorio actual, en una sola transacción.
+
+Uso (desde backend/):
+    python -m scripts.rebuild_assignment_view           reconstruir
+    python -m scripts.rebuild_assignment_view --check   solo comparar; código 1 si hay diferencias
+"""
+import argparse
+
+import models
+import assignment_view
+from database import engine
+
+
+def describe(label: str, ids, limit: int = 10):
+    shown = ", ".join(str(assignment_id) for assignment_id in ids[:limit])
+    more = f" (y {len(ids) - limit} más)" if len(ids) > limit else ""
+    print(f"  {label:28} {len(ids):6}  {shown}{more}")
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="comparar sin modificar la proyección")
+    args = parser.parse_args()
+
+    # La tabla puede no existir en una base creada antes de la proyección
+    models.AssignmentView.__table__.create(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        missing, extra, different = assignment_view.compare(conn)
+        print("Diferencias con las tablas de origen:")
+        describe("asignaciones sin fila", missing)
+        describe("filas sobrantes", extra)
+        describe("filas desactualizadas", different)
+        if args.check:
+            if missing or extra or different:
+                raise SystemExit(1)
+            print("La proyección está al día.")
+            return
+        rows = assignment_view.rebuild(conn)
+    print(f"Proyección reconstruida: {rows} filas.")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,227 @@
+"""
+Generador de datos sintéticos para verificaciones y benchmarks.
+
+Crea una base SQLite aparte (nunca toca career_plan.db) con usuarios, equipos,
+capacitaciones, asignaciones y progreso en proporciones parecidas a producción.
+"""
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+from passlib.context import CryptContext
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+import models
+import assignment_view  # noqa: F401 (mantiene la proyección en las sesiones de la base generada)
+
+# Contraseña de todos los usuarios generados
+PASSWORD = "bench123"
+
+TECHNOLOGIES = [
+    "Rust", "Go (Golang)", "Python", "JavaScript", "TypeScript",
+    "PHP", "Ruby", "Java", "Kotlin", "Django",
+    "Flask", "FastAPI", "Node.js", "Express.js", "Spring Boot",
+    "PostgreSQL", "MySQL", "MongoDB", "Redis", "React",
+    "Vue.js", "Angular", "Docker", "AWS", "Git"
+]
+
+FIRST_NAMES = ["Ana", "Carlos", "María", "Luis", "Pedro", "Elena", "Roberto", "Sofia", "Diego", "Jorge",
+               "Carmen", "Miguel", "Patricia", "Andrés", "Lucía", "Fernando", "Valeria", "Ricardo"]
+LAST_NAMES = ["Vega", "Pérez", "Gómez", "Torres", "Ramírez", "Flores", "Castro", "Morales", "Ortiz", "Suárez"]
+
+ASSIGNMENT_STATUSES = ["not_started", "assigned", "in_progress", "completed"]
+
+
+def create_dataset_engine(path: str = None):
+    """
+    Crear un engine SQLite en un archivo temporal (o en la ruta indicada) con el esquema completo
+    """
+    if path is None:
+        fd, path = tempfile.mkstemp(prefix="career_plan_bench_", suffix=".db")
+        os.close(fd)
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    return engine, sessionmaker(autocommit=False, autoflush=False, bind=engine), path
+
+
+def populate(db, users: int = 1000, seed: int = 42):
+    """
+    Poblar la base con `users` usuarios y datos relacionados. Retorna un resumen con ids útiles.
+    """
+    rnd = random.Random(seed)
+    now = datetime.utcnow()
+
+    def created():
+        return now - timedelta(days=rnd.randint(0, 365), seconds=rnd.randint(0, 86400))
+
+    password_hash = CryptContext(schemes=["bcrypt"]).hash(PASSWORD)
+
+    db.execute(insert(models.Gender), [
+        {"gender_id": 1, "gender_name": "Masculino"},
+        {"gender_id": 2, "gender_name": "Femenino"},
+        {"gender_id": 3, "gender_name": "Otro"},
+    ])
+    db.execute(insert(models.Role), [
+        {"role_id": 1, "role_name": "Administrador", "role_description": "Acceso completo al sistema"},
+        {"role_id": 2, "role_name": "Supervisor", "role_description": "Gestión de equipos y seguimiento"},
+        {"role_id": 3, "role_name": "Cliente", "role_description": "Consumo de capacitaciones"},
+        {"role_id": 4, "role_name": "Instructor", "role_description": "Facilitación de capacitaciones"},
+    ])
+
+    # Usuarios: 1 admin, ~4% supervisores, ~8% instructores y el resto clientes
+    supervisors_count = max(2, users * 4 // 100)
+    instructors_count = max(2, users * 8 // 100)
+    roles = [1] + [2] * supervisors_count + [4] * instructors_count
+    roles += [3] * max(1, users - len(roles))
+    persons, user_rows = [], []
+    for user_id, role_id in enumerate(roles, start=1):
+        first_name = rnd.choice(FIRST_NAMES)
+        persons.append({
+            "person_id": user_id,
+            "person_dni": 10000000 + user_id,
+            "person_first_name": first_name,
+            "person_last_name": rnd.choice(LAST_NAMES),
+            "person_gender": rnd.choice((1, 2, 2, 1, 3)),
+            "person_email": f"user{user_id}@viamatica.com",
+            "person_created_at": created(),
+        })
+        user_rows.append({
+            "user_id": user_id,
+            "user_username": f"user{user_id}",
+            "user_password": password_hash,
+            "person_id": user_id,
+            "user_role": role_id,
+            "user_created_at": created(),
+        })
+    db.execute(insert(models.Person), persons)
+    db.execute(insert(models.User), user_rows)
+
+    supervisor_ids = [u["user_id"] for u in user_rows if u["user_role"] == 2]
+    instructor_ids = [u["user_id"] for u in user_rows if u["user_role"] == 4]
+    client_ids = [u["user_id"] for u in user_rows if u["user_role"] == 3]
+
+    db.execute(insert(models.Technology), [
+        {"technology_id": i, "technology_name": name, "technology_created_at": created()}
+        for i, name in enumerate(TECHNOLOGIES, start=1)
+    ])
+
+    # Capacitaciones con 1 a 4 tecnologías cada una
+    trainings_count = max(8, users // 40)
+    training_techs = {}
+    trainings, training_tech_rows = [], []
+    for training_id in range(1, trainings_count + 1):
+        trainings.append({
+            "training_id": training_id,
+            "training_name": f"Capacitación {training_id}",
+            "training_description": f"Descripción de la capacitación {training_id}",
+            "training_status": "A" if rnd.random() > 0.05 else "I",
+            "training_created_at": created(),
+        })
+        techs = rnd.sample(range(1, len(TECHNOLOGIES) + 1), rnd.randint(1, 4))
+        training_techs[training_id] = techs
+        for technology_id in techs:
+            training_tech_rows.append({"training_id": training_id, "technology_id": technology_id, "created_at": created()})
+    db.execute(insert(models.Training), trainings)
+    db.execute(insert(models.TrainingTechnology), training_tech_rows)
+
+    # Equipos: dos por supervisor; cada cliente en un equipo, cada instructor en uno o dos
+    teams, team_members = [], []
+    team_ids = []
+    for index, supervisor_id in enumerate(supervisor_ids * 2, start=1):
+        teams.append({
+            "team_id": index,
+            "team_name": f"Equipo {index}",
+            "team_description": f"Equipo de trabajo {index}",
+            "supervisor_id": supervisor_id,
+            "team_status": "A" if rnd.random() > 0.05 else "I",
+            "team_created_at": created(),
+        })
+        team_ids.append(index)
+    for client_id in client_ids:
+        team_members.append({"team_id": rnd.choice(team_ids), "user_id": client_id, "member_role": "client",
+                             "member_status": "A" if rnd.random() > 0.1 else "I", "joined_at": created()})
+    for instructor_id in instructor_ids:
+        for team_id in rnd.sample(team_ids, min(len(team_ids), rnd.randint(1, 2))):
+            team_members.append({"team_id": team_id, "user_id": instructor_id, "member_role": "instructor",
+                                 "member_status": "A", "joined_at": created()})
+    db.execute(insert(models.Team), teams)
+    db.execute(insert(models.TeamMember), team_members)
+
+    # Materiales: tres por capacitación
+    materials, training_materials = [], {}
+    material_id = 0
+    for training_id in range(1, trainings_count + 1):
+        for _ in range(3):
+            material_id += 1
+            materials.append({
+                "material_id": material_id,
+                "training_id": training_id,
+                "instructor_id": rnd.choice(instructor_ids),
+                "material_title": f"Material {material_id}",
+                "material_description": "Material de apoyo",
+                "material_url": f"https://example.com/materials/{material_id}",
+                "material_type": rnd.choice(("link", "document", "video")),
+                "material_created_at": created(),
+            })
+            training_materials.setdefault(training_id, []).append(material_id)
+    db.execute(insert(models.TrainingMaterial), materials)
+
+    # Asignaciones: cada cliente tiene de 1 a 4 capacitaciones, con su progreso
+    assignments, tech_progress, material_progress = [], [], []
+    assignment_id = 0
+    for client_id in client_ids:
+        for training_id in rnd.sample(range(1, trainings_count + 1), rnd.randint(1, 4)):
+            assignment_id += 1
+            status = rnd.choice(ASSIGNMENT_STATUSES)
+            techs = training_techs[training_id]
+            done = len(techs) if status == "completed" else (rnd.randint(0, len(techs)) if status == "in_progress" else 0)
+            assignments.append({
+                "assignment_id": assignment_id,
+                "user_id": client_id,
+                "training_id": training_id,
+                "instructor_id": rnd.choice(instructor_ids) if rnd.random() < 0.8 else None,
+                "assignment_status": status,
+                "assignment_created_at": created(),
+                "completion_percentage": round(100.0 * done / len(techs), 2),
+            })
+            for position, technology_id in enumerate(techs):
+                completed = position < done
+                tech_progress.append({
+                    "assignment_id": assignment_id,
+                    "technology_id": technology_id,
+                    "is_completed": "Y" if completed else "N",
+                    "completed_at": created() if completed else None,
+                    "created_at": created(),
+                })
+            if status != "not_started":
+                for training_material_id in training_materials[training_id]:
+                    completed = rnd.random() < 0.5
+                    material_progress.append({
+                        "user_id": client_id,
+                        "material_id": training_material_id,
+                        "assignment_id": assignment_id,
+                        "is_completed": "Y" if completed else "N",
+                        "completed_at": created() if completed else None,
+                        "created_at": created(),
+                    })
+    db.execute(insert(models.UserTrainingAssignment), assignments)
+    db.execute(insert(models.UserTechnologyProgress), tech_progress)
+    db.execute(insert(models.UserMaterialProgress), material_progress)
+    # Las inserciones masivas no dicen qué asignaciones crearon: la proyección se
+    # reconstruye completa en el commit (assignment_view.rebuild_before_commit)
+    db.commit()
+
+    return {
+        "users": len(user_rows),
+        "supervisor_ids": supervisor_ids,
+        "instructor_ids": instructor_ids,
+        "client_ids": client_ids,
+        "training_ids": list(range(1, trainings_count + 1)),
+        "team_ids": team_ids,
+        "assignments": len(assignments),
+        "technology_progress": len(tech_progress),
+        "material_progress": len(material_progress),
+    }
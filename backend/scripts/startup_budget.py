@@ -0,0 +1,258 @@
+"""
+Presupuesto de arranque en frío del proceso de la API.
+
+En el plan gratuito de Render la instancia se duerme y el primer pedido espera el
+arranque completo del proceso, así que el costo de importar main cuenta como latencia.
+Este script mide dos cosas y termina con código 1 si alguna se pasa del presupuesto:
+
+  importación   `python -X importtime -c "import main"`: tiempo total de importar main,
+                los módulos de primer nivel más caros y los módulos pesados que no deben
+                cargarse al importar (LAZY_MODULES; se importan dentro de la ruta o el
+                trabajo que los usa)
+  arranque      desde que se lanza `python serve.py` (un worker, base nueva) hasta la
+                primera respuesta 200 en `/`
+
+Los tiempos absolutos cambian de una corrida a otra en la misma máquina (en un contenedor
+compartido, 860 ms o 1100 ms para el mismo árbol), así que el presupuesto no es en
+milisegundos: cada corrida importa también, en otro proceso nuevo, lo mínimo que carga
+cualquier API con FastAPI y SQLAlchemy (CALIBRATION_MODULES) y se compara el cociente
+main / calibración. Ese cociente solo crece si el proyecto agrega trabajo propio al
+importar (módulos pesados, consultas, creación de tablas). El presupuesto se compara con
+la mediana de los cocientes de --runs corridas; los milisegundos se informan igual.
+
+Uso (desde backend/):
+    python -m scripts.startup_budget
+    python -m scripts.startup_budget --runs 7 --top 20
+    python -m scripts.startup_budget --json startup.json
+"""
+import os
+import re
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import tempfile
+import subprocess
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Lo que importa cualquier API con este stack; es la unidad de los presupuestos
+CALIBRATION_MODULES = ["fastapi", "fastapi.responses", "fastapi.middleware.cors", "sqlalchemy", "sqlalchemy.orm"]
+
+# Presupuestos como múltiplo de la importación de calibración (mediana de las corridas)
+IMPORT_BUDGET_RATIO = 1.6
+COLD_START_BUDGET_RATIO = 2.5
+
+# Antes y después, en un contenedor compartido de 2 núcleos (Python 3.11, mediana de 7
+# corridas alternando los árboles; primer 200 lanzando `uvicorn main:app` en los tres):
+#                                          importación         primer 200 en /
+#   5a617f1 base del proyecto              980 ms  1.37x       1137 ms  1.57x
+#   7638d27 antes de la carga diferida     931 ms  1.43x       1455 ms  2.13x
+#   árbol actual (carga diferida)         1009 ms  1.37x       1156 ms  1.72x
+# (calibración: mediana de 720 ms). Los milisegundos de cada fila no se comparan entre
+# sí: varían más entre corridas que la diferencia que se busca; los cocientes sí.
+# Al cargar httpx (verificador de enlaces) y passlib (login) recién al usarlos, link_checker
+# bajó de 29 ms a 2 ms y passlib.context (14 ms + bcrypt 2 ms) dejó de importarse: unos
+# 45 ms menos por arranque. pandas, pyarrow y openpyxl ya se importaban dentro de las
+# rutas que los usan, y la creación de tablas corre en el lifespan (startup.initialize_once).
+# Lo que queda es sobre todo FastAPI y SQLAlchemy (la calibración) y el mapeo de models.
+
+# Módulos que solo usan algunas rutas o trabajos: no deben cargarse al importar main
+# (orjson y brotli no están: los usan todas las respuestas)
+LAZY_MODULES = [
+    "pandas", "numpy", "pyarrow", "openpyxl", "faker", "requests",
+    "httpx", "certifi", "passlib", "jose", "bcrypt",
+]
+
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)")
+
+
+def child_env(**extra):
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    env.update(extra)
+    return env
+
+
+def run_importtime(workdir: str, statement: str):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=workdir, env=child_env(), capture_output=True, text=True, timeout=120,
+    )
+    if result.returncode != 0:
+        raise SystemExit(f"No se pudo ejecutar {statement!r}:\n{result.stderr[-2000:]}")
+    return result.stderr
+
+
+def profile_calibration(workdir: str):
+    """
+    Importar CALIBRATION_MODULES en un proceso nuevo. Retorna el tiempo total (ms).
+    """
+    output = run_importtime(workdir, "import " + ", ".join(CALIBRATION_MODULES))
+    total_us = 0
+    for line in output.splitlines():
+        match = IMPORT_LINE.match(line)
+        # Solo los de primer nivel: lo que importa site al iniciar el intérprete no cuenta
+        if match and len(match.group(3)) == 1 and match.group(4).split(".")[0] in ("fastapi", "sqlalchemy"):
+            total_us += int(match.group(2))
+    return total_us / 1000
+
+
+def profile_import(workdir: str):
+    """
+    Importar main en un proceso nuevo con -X importtime.
+    Retorna el tiempo total (ms), los módulos de primer nivel con su tiempo acumulado
+    y el conjunto de módulos cargados.
+    """
+    output = run_importtime(workdir, "import main")
+
+    # Cada módulo se lista después de los que importó; solo cuenta el subárbol de main
+    # (lo que carga site al iniciar el intérprete queda afuera)
+    total_us = None
+    direct = {}
+    loaded = set()
+    for line in output.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        cumulative, indent, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        if indent == 1:
+            if name == "main":
+                total_us = cumulative
+                break
+            direct, loaded = {}, set()
+            continue
+        loaded.add(name)
+        if indent == 3:
+            # Importado directamente por main (o por el primer módulo que lo pidió)
+            direct[name] = cumulative
+    if total_us is None:
+        raise SystemExit("La salida de -X importtime no incluye main")
+    return total_us / 1000, {name: us / 1000 for name, us in direct.items()}, loaded
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def time_to_first_response(workdir: str, timeout: float = 60):
+    """
+    Lanzar serve.py sobre una base nueva y medir hasta la primera respuesta 200 en `/`
+    """
+    for name in os.listdir(workdir):
+        if name.startswith("career_plan.db") or name.startswith("."):
+            os.remove(os.path.join(workdir, name))
+    port = free_port()
+    env = child_env(
+        HOST="127.0.0.1",
+        PORT=str(port),
+        WEB_CONCURRENCY="1",
+        LINK_CHECK_INTERVAL_SECONDS="0",
+    )
+    url = f"http://127.0.0.1:{port}/"
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(BACKEND_DIR, "serve.py")],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if process.poll() is not None:
+                raise SystemExit(f"El servidor terminó al arrancar:\n{process.stderr.read()[-2000:]}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return (time.perf_counter() - started) * 1000
+            except OSError:
+                pass
+            time.sleep(0.01)
+        raise SystemExit(f"El servidor no respondió en {timeout:.0f} s")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="repeticiones de cada medición")
+    parser.add_argument("--top", type=int, default=12, help="módulos de primer nivel a listar")
+    parser.add_argument("--json", help="guardar el resultado en este archivo")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="career_plan_startup_")
+    # Primera importación para compilar los .pyc: no se cuenta
+    profile_import(workdir)
+
+    # Calibración y medición alternadas: cada cociente compara procesos lanzados uno
+    # después del otro, con la misma carga de la máquina
+    calibration_runs, import_runs, start_runs, modules = [], [], [], {}
+    import_ratios, start_ratios = [], []
+    loaded = set()
+    for _ in range(args.runs):
+        calibration_ms = profile_calibration(workdir)
+        total_ms, direct, loaded = profile_import(workdir)
+        start_ms = time_to_first_response(workdir)
+        calibration_runs.append(calibration_ms)
+        import_runs.append(total_ms)
+        start_runs.append(start_ms)
+        import_ratios.append(total_ms / calibration_ms)
+        start_ratios.append(start_ms / calibration_ms)
+        for name, ms in direct.items():
+            modules.setdefault(name, []).append(ms)
+
+    import_ratio = statistics.median(import_ratios)
+    start_ratio = statistics.median(start_ratios)
+    eager = sorted(
+        name for name in loaded
+        if any(name == lazy or name.startswith(lazy + ".") for lazy in LAZY_MODULES)
+    )
+
+    print(f"Módulos más caros al importar main (mediana de {args.runs} corridas):")
+    slowest = sorted(modules.items(), key=lambda item: statistics.median(item[1]), reverse=True)
+    for name, values in slowest[:args.top]:
+        print(f"  {statistics.median(values):8.1f} ms  {name}")
+
+    failures = []
+    if eager:
+        failures.append(f"módulos pesados cargados al importar: {', '.join(sorted({name.split('.')[0] for name in eager}))}")
+    if import_ratio > IMPORT_BUDGET_RATIO:
+        failures.append(f"importación {import_ratio:.2f}x la calibración, presupuesto {IMPORT_BUDGET_RATIO}x")
+    if start_ratio > COLD_START_BUDGET_RATIO:
+        failures.append(f"primer 200 en {start_ratio:.2f}x la calibración, presupuesto {COLD_START_BUDGET_RATIO}x")
+
+    print(f"\n{'':20} {'mínimo':>9} {'mediana':>9} {'cociente':>9} {'presupuesto':>12}")
+    print(f"{'calibración':20} {min(calibration_runs):6.0f} ms {statistics.median(calibration_runs):6.0f} ms")
+    print(f"{'importación de main':20} {min(import_runs):6.0f} ms {statistics.median(import_runs):6.0f} ms "
+          f"{import_ratio:8.2f}x {IMPORT_BUDGET_RATIO:11}x")
+    print(f"{'primer 200 en /':20} {min(start_runs):6.0f} ms {statistics.median(start_runs):6.0f} ms "
+          f"{start_ratio:8.2f}x {COLD_START_BUDGET_RATIO:11}x")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "calibration_ms": calibration_runs,
+                "import_ms": import_runs,
+                "first_response_ms": start_runs,
+                "import_ratio": import_ratio,
+                "first_response_ratio": start_ratio,
+                "modules_ms": {name: statistics.median(values) for name, values in slowest},
+                "eager_heavy_modules": eager,
+            }, f, indent=2)
+
+    if failures:
+        print(f"\n{len(failures)} falla(s):")
+        for failure in failures:
+            print(f"  {failure}")
+        raise SystemExit(1)
+    print("\nArranque dentro del presupuesto.")
+
+
+if __name__ == "__main__":
+    main_cli()
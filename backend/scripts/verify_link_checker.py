@@ -0,0 +1,247 @@
+"""
+Verificar el verificador de enlaces de materiales contra un servidor HTTP local.
+
+Levanta un servidor en 127.0.0.1 (sin salir a internet) con una ruta por caso y
+comprueba que check_links:
+  - acepta un HEAD 200
+  - ante HEAD 405 reintenta con un GET de un byte (Range: bytes=0-0) y acepta el 206
+  - marca como roto un 404 (HEAD y GET)
+  - corta por tiempo de espera un servidor que no responde
+  - respeta el intervalo mínimo entre peticiones al mismo host y LINK_CHECK_PER_HOST
+    (peticiones simultáneas por host)
+y que save_results programa la siguiente verificación según next_check_after (6 horas si
+está sano; 5, 10, 20... minutos hasta 24 horas si falla; el contador vuelve a cero si
+el instructor cambia el enlace), sobre una base SQLite temporal.
+
+Uso (desde backend/):
+    python -m scripts.verify_link_checker
+"""
+import os
+import sys
+import time
+import asyncio
+import threading
+from datetime import datetime, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import models
+import link_checker
+from scripts.seed_data import create_dataset_engine, populate
+
+# Tiempo de espera del cliente en las pruebas; /slow tarda más que esto
+CLIENT_TIMEOUT = 0.5
+SLOW_SECONDS = 2.0
+HOST_DELAY = 0.2
+PER_HOST = 2
+# Duración de las respuestas de /held/, para ver cuántas se atienden a la vez
+HELD_SECONDS = 0.3
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    # Llegada de cada petición: (ruta, método, Range, instante)
+    requests = []
+    lock = threading.Lock()
+    # Peticiones a /held/ atendiéndose a la vez (y el máximo alcanzado)
+    held = 0
+    peak_held = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def record(self):
+        with self.lock:
+            self.requests.append((self.path, self.command, self.headers.get("Range"), time.monotonic()))
+
+    def reply(self, status: int, body: bytes = b""):
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD" and body:
+            self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.record()
+        if self.path == "/slow":
+            time.sleep(SLOW_SECONDS)
+            self.reply(200)
+        elif self.path.startswith("/held/"):
+            with self.lock:
+                StandInHandler.held += 1
+                StandInHandler.peak_held = max(StandInHandler.peak_held, StandInHandler.held)
+            time.sleep(HELD_SECONDS)
+            with self.lock:
+                StandInHandler.held -= 1
+            self.reply(200)
+        elif self.path.startswith("/ok") or self.path.startswith("/spaced/"):
+            self.reply(200)
+        elif self.path == "/no-head":
+            self.reply(405)
+        else:
+            self.reply(404)
+
+    def do_GET(self):
+        self.record()
+        if self.path == "/no-head" and self.headers.get("Range") == "bytes=0-0":
+            self.send_response(206)
+            self.send_header("Content-Range", "bytes 0-0/1000")
+            self.send_header("Content-Length", "1")
+            self.end_headers()
+            self.wfile.write(b"x")
+        elif self.path == "/slow":
+            time.sleep(SLOW_SECONDS)
+            self.reply(200, b"tarde")
+        else:
+            self.reply(404, b"no encontrado")
+
+
+def start_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def report(label: str, ok: bool, detail: str = ""):
+    print(f"  {'OK   ' if ok else 'FALLA'} {label:44} {detail}")
+    return 0 if ok else 1
+
+
+def verify_responses(base_url: str):
+    print("Respuestas:")
+    targets = [(1, f"{base_url}/ok"), (2, f"{base_url}/no-head"), (3, f"{base_url}/missing"), (4, f"{base_url}/slow")]
+    StandInHandler.requests.clear()
+    results = {
+        result["material_id"]: result for result in asyncio.run(link_checker.check_links(
+            targets, per_host=len(targets), host_delay=0, timeout=CLIENT_TIMEOUT
+        ))
+    }
+    methods = {}
+    for path, method, range_header, _ in StandInHandler.requests:
+        methods.setdefault(path, []).append((method, range_header))
+
+    failures = 0
+    ok = results[1]
+    failures += report("HEAD 200", ok["ok"] and ok["http_status"] == 200 and methods["/ok"] == [("HEAD", None)],
+                       f"status={ok['http_status']} peticiones={methods.get('/ok')}")
+    fallback = results[2]
+    failures += report(
+        "HEAD 405 -> GET con Range 206",
+        fallback["ok"] and fallback["http_status"] == 206 and methods["/no-head"] == [("HEAD", None), ("GET", "bytes=0-0")],
+        f"status={fallback['http_status']} peticiones={methods.get('/no-head')}"
+    )
+    missing = results[3]
+    failures += report("404 roto (HEAD y GET)", not missing["ok"] and missing["http_status"] == 404
+                       and [method for method, _ in methods["/missing"]] == ["HEAD", "GET"],
+                       f"status={missing['http_status']} peticiones={methods.get('/missing')}")
+    slow = results[4]
+    failures += report("tiempo de espera", not slow["ok"] and slow["http_status"] is None
+                       and slow["error"] == "Tiempo de espera agotado",
+                       f"error={slow['error']!r}")
+    return failures
+
+
+def verify_host_spacing(base_url: str):
+    print("Espaciado por host:")
+    count = 6
+    targets = [(index, f"{base_url}/spaced/{index}") for index in range(count)]
+    StandInHandler.requests.clear()
+    started = time.monotonic()
+    results = asyncio.run(link_checker.check_links(
+        targets, concurrency=10, per_host=PER_HOST, host_delay=HOST_DELAY, timeout=CLIENT_TIMEOUT
+    ))
+    arrivals = sorted(arrived for path, _, _, arrived in StandInHandler.requests if path.startswith("/spaced/"))
+    gaps = [later - earlier for earlier, later in zip(arrivals, arrivals[1:])]
+    # Margen por la resolución del reloj y el envío de la petición
+    tolerance = 0.02
+    failures = report("todos sanos", all(result["ok"] for result in results), f"{len(results)} enlaces")
+    failures += report(
+        f"intervalo mínimo {HOST_DELAY} s entre peticiones",
+        len(arrivals) == count and min(gaps) >= HOST_DELAY - tolerance,
+        f"mínimo={min(gaps):.3f} s total={time.monotonic() - started:.2f} s"
+    )
+
+    StandInHandler.peak_held = 0
+    results = asyncio.run(link_checker.check_links(
+        [(index, f"{base_url}/held/{index}") for index in range(count)],
+        concurrency=10, per_host=PER_HOST, host_delay=0, timeout=CLIENT_TIMEOUT * 4
+    ))
+    failures += report(
+        f"como máximo {PER_HOST} peticiones a la vez por host",
+        all(result["ok"] for result in results) and StandInHandler.peak_held == PER_HOST,
+        f"máximo simultáneo={StandInHandler.peak_held}"
+    )
+    return failures
+
+
+def verify_backoff():
+    print("Programación de la siguiente verificación:")
+    now = datetime(2026, 1, 1, 12, 0)
+    expected = {
+        0: timedelta(hours=6),
+        1: timedelta(minutes=5),
+        2: timedelta(minutes=10),
+        3: timedelta(minutes=20),
+        5: timedelta(minutes=80),
+        9: timedelta(hours=21, minutes=20),
+        10: timedelta(hours=24),
+        30: timedelta(hours=24),
+    }
+    actual = {failures: link_checker.next_check_after(failures, now) - now for failures in expected}
+    failures = report("next_check_after", actual == expected,
+                      ", ".join(f"{count}:{delay}" for count, delay in actual.items()))
+
+    engine, Session, path = create_dataset_engine()
+    # save_results abre sus propias sesiones: se apuntan a la base temporal
+    original_session = link_checker.SessionLocal
+    link_checker.SessionLocal = Session
+    try:
+        db = Session()
+        populate(db, users=50)
+        material_id = db.query(models.TrainingMaterial.material_id).first()[0]
+        db.close()
+
+        def save(url: str, ok: bool, at: datetime):
+            link_checker.save_results([{
+                "material_id": material_id, "url": url, "http_status": 200 if ok else 404,
+                "ok": ok, "error": None,
+            }], at)
+            db = Session()
+            try:
+                status = db.query(models.MaterialLinkStatus).filter_by(material_id=material_id).one()
+                return status.consecutive_failures, status.next_check_at - at, status.is_ok
+            finally:
+                db.close()
+
+        url = "https://ejemplo.test/video"
+        steps = [
+            ("falla 1", save(url, False, now), (1, timedelta(minutes=5), 'N')),
+            ("falla 2", save(url, False, now), (2, timedelta(minutes=10), 'N')),
+            ("falla 3", save(url, False, now), (3, timedelta(minutes=20), 'N')),
+            ("sano", save(url, True, now), (0, timedelta(hours=6), 'Y')),
+            ("falla tras sano", save(url, False, now), (1, timedelta(minutes=5), 'N')),
+            ("falla 2", save(url, False, now), (2, timedelta(minutes=10), 'N')),
+            ("enlace cambiado y roto", save(url + "-nuevo", False, now), (1, timedelta(minutes=5), 'N')),
+        ]
+        for label, got, want in steps:
+            failures += report(f"save_results: {label}", got == want, f"fallas={got[0]} siguiente=+{got[1]}")
+    finally:
+        link_checker.SessionLocal = original_session
+        engine.dispose()
+        os.unlink(path)
+    return failures
+
+
+def main():
+    server, base_url = start_server()
+    try:
+        failures = verify_responses(base_url)
+        failures += verify_host_spacing(base_url)
+    finally:
+        server.shutdown()
+    failures += verify_backoff()
+    print("\nVerificador de enlaces correcto." if not failures else f"\n{failures} falla(s).")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
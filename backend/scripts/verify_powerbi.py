@@ -0,0 +1,286 @@
+"""
+Verificar los datasets de Power BI contra una implementación de referencia.
+
+La referencia es la versión anterior de los endpoints (una consulta por fila,
+conteos en Python). Se generan datos sintéticos en dos tamaños y se comprueba que:
+  - ambas implementaciones producen exactamente las mismas filas
+  - cada dataset se resuelve con una sola sentencia SQL, sin importar el volumen
+  - la carga incremental (since/until) devuelve exactamente las filas modificadas
+
+Uso (desde backend/):
+    python -m scripts.verify_powerbi
+    python -m scripts.verify_powerbi --sizes 200 5000
+"""
+import os
+import sys
+import argparse
+from datetime import datetime
+
+from sqlalchemy import event
+
+import models
+import powerbi
+from scripts.seed_data import create_dataset_engine, populate
+
+
+def iso(value):
+    return value.isoformat() if value else None
+
+
+def latest(*values):
+    return max(value for value in values if value is not None)
+
+
+def in_window(row_updated, since, until):
+    return (since is None or row_updated > since) and (until is None or row_updated <= until)
+
+
+def reference_users_summary(db, since, until):
+    result = []
+    for user in db.query(models.User).all():
+        person = user.person
+        updated = latest(user.user_updated_at, person.person_updated_at,
+                         person.gender.gender_updated_at, user.role.role_updated_at)
+        if not in_window(updated, since, until):
+            continue
+        result.append({
+            "user_id": user.user_id,
+            "username": user.user_username,
+            "full_name": f"{person.person_first_name} {person.person_last_name}",
+            "first_name": person.person_first_name,
+            "last_name": person.person_last_name,
+            "email": person.person_email,
+            "dni": person.person_dni,
+            "gender": person.gender.gender_name,
+            "role": user.role.role_name,
+            "created_at": iso(user.user_created_at),
+            "updated_at": iso(updated),
+            "is_deleted": user.user_status != 'A'
+        })
+    return result
+
+
+def reference_trainings_summary(db, since, until):
+    result = []
+    query = db.query(models.Training)
+    if since is None:
+        query = query.filter(models.Training.training_status == 'A')
+    for training in query.all():
+        assignments = db.query(models.UserTrainingAssignment).filter(
+            models.UserTrainingAssignment.training_id == training.training_id
+        ).all()
+        training_techs = db.query(models.TrainingTechnology).filter(
+            models.TrainingTechnology.training_id == training.training_id
+        ).all()
+        tech_names = [tt.technology.technology_name for tt in training_techs]
+        updated = latest(
+            training.training_updated_at,
+            *[latest(tt.updated_at, tt.technology.technology_updated_at) for tt in training_techs],
+            *[a.assignment_updated_at for a in assignments]
+        )
+        if not in_window(updated, since, until):
+            continue
+        result.append({
+            "training_id": training.training_id,
+            "training_name": training.training_name,
+            "training_description": training.training_description,
+            "technologies": ", ".join(tech_names),
+            "technology_count": len(tech_names),
+            "created_at": iso(training.training_created_at),
+            "not_started": len([a for a in assignments if a.assignment_status == 'not_started']),
+            "assigned": len([a for a in assignments if a.assignment_status == 'assigned']),
+            "in_progress": len([a for a in assignments if a.assignment_status == 'in_progress']),
+            "completed": len([a for a in assignments if a.assignment_status == 'completed']),
+            "total": len(assignments),
+            "updated_at": iso(updated),
+            "is_deleted": training.training_status != 'A'
+        })
+    return result
+
+
+def reference_assignments_detail(db, since, until):
+    result = []
+    for assignment in db.query(models.UserTrainingAssignment).all():
+        person = assignment.user.person
+        instructor_name = None
+        instructor_updates = []
+        if assignment.instructor_id:
+            instructor_person = assignment.instructor.person
+            instructor_name = f"{instructor_person.person_first_name} {instructor_person.person_last_name}"
+            instructor_updates = [assignment.instructor.user_updated_at, instructor_person.person_updated_at]
+        updated = latest(
+            assignment.assignment_updated_at, assignment.user.user_updated_at, person.person_updated_at,
+            person.gender.gender_updated_at, assignment.training.training_updated_at, *instructor_updates
+        )
+        if not in_window(updated, since, until):
+            continue
+        result.append({
+            "assignment_id": assignment.assignment_id,
+            "assignment_status": assignment.assignment_status,
+            "created_at": iso(assignment.assignment_created_at),
+            "updated_at": iso(updated),
+            "client_id": assignment.user.user_id,
+            "client_username": assignment.user.user_username,
+            "client_name": f"{person.person_first_name} {person.person_last_name}",
+            "client_first_name": person.person_first_name,
+            "client_last_name": person.person_last_name,
+            "client_email": person.person_email,
+            "client_gender": person.gender.gender_name,
+            "training_id": assignment.training.training_id,
+            "training_name": assignment.training.training_name,
+            "training_description": assignment.training.training_description,
+            "instructor_name": instructor_name
+        })
+    return result
+
+
+def reference_teams_summary(db, since, until):
+    result = []
+    query = db.query(models.Team)
+    if since is None:
+        query = query.filter(models.Team.team_status == 'A')
+    for team in query.all():
+        all_members = db.query(models.TeamMember).filter(models.TeamMember.team_id == team.team_id).all()
+        members = [m for m in all_members if m.member_status == 'A']
+        supervisor_person = team.supervisor.person
+        updated = latest(
+            team.team_updated_at, team.supervisor.user_updated_at, supervisor_person.person_updated_at,
+            *[m.member_updated_at for m in all_members]
+        )
+        if not in_window(updated, since, until):
+            continue
+        result.append({
+            "team_id": team.team_id,
+            "team_name": team.team_name,
+            "team_description": team.team_description,
+            "created_at": iso(team.team_created_at),
+            "supervisor_name": f"{supervisor_person.person_first_name} {supervisor_person.person_last_name}",
+            "supervisor_username": team.supervisor.user_username,
+            "instructors": len([m for m in members if m.member_role == 'instructor']),
+            "clients": len([m for m in members if m.member_role == 'client']),
+            "total_members": len(members),
+            "updated_at": iso(updated),
+            "is_deleted": team.team_status != 'A'
+        })
+    return result
+
+
+def reference_progress_summary(db, since, until):
+    result = []
+    for progress in db.query(models.UserTechnologyProgress).all():
+        assignment = progress.assignment
+        person = assignment.user.person
+        updated = latest(
+            progress.updated_at, progress.technology.technology_updated_at, assignment.assignment_updated_at,
+            assignment.user.user_updated_at, person.person_updated_at, assignment.training.training_updated_at
+        )
+        if not in_window(updated, since, until):
+            continue
+        result.append({
+            "progress_id": progress.progress_id,
+            "assignment_id": progress.assignment_id,
+            "technology_name": progress.technology.technology_name,
+            "is_completed": progress.is_completed == 'Y',
+            "completed_at": iso(progress.completed_at),
+            "user_name": f"{person.person_first_name} {person.person_last_name}",
+            "username": assignment.user.user_username,
+            "training_name": assignment.training.training_name,
+            "updated_at": iso(updated)
+        })
+    return result
+
+
+REFERENCE = {
+    "users-summary": reference_users_summary,
+    "trainings-summary": reference_trainings_summary,
+    "assignments-detail": reference_assignments_detail,
+    "teams-summary": reference_teams_summary,
+    "progress-summary": reference_progress_summary,
+}
+
+
+def apply_changes(db, summary):
+    """
+    Modificar una muestra de filas de distintas tablas para probar la carga incremental
+    """
+    for person in db.query(models.Person).filter(models.Person.person_id.in_(summary["client_ids"][:3])).all():
+        person.person_last_name = "Modificado"
+    for assignment in db.query(models.UserTrainingAssignment).limit(5).all():
+        assignment.assignment_status = 'completed'
+    for progress in db.query(models.UserTechnologyProgress).order_by(models.UserTechnologyProgress.progress_id.desc()).limit(5).all():
+        progress.is_completed = 'Y'
+    member = db.query(models.TeamMember).filter(models.TeamMember.member_status == 'A').first()
+    member.member_status = 'I'
+    db.query(models.Training).filter(models.Training.training_id == summary["training_ids"][0]).one().training_status = 'I'
+    db.query(models.Technology).first().technology_name = "Tecnología renombrada"
+    db.commit()
+
+
+def normalize(dataset, rows):
+    """
+    El orden de group_concat no está definido: se comparan las tecnologías como conjunto
+    """
+    if dataset == "trainings-summary":
+        rows = [dict(row, technologies=sorted(row["technologies"].split(", ")) if row["technologies"] else [])
+                for row in rows]
+    return rows
+
+
+def compare(db, statements, dataset, since, until, label):
+    db.expire_all()
+    statements.clear()
+    expected = normalize(dataset, REFERENCE[dataset](db, since, until))
+    reference_queries = len(statements)
+
+    statements.clear()
+    actual = normalize(dataset, powerbi.fetch_dataset(db, dataset, since, until))
+    queries = len(statements)
+
+    ok = actual == expected and queries == 1
+    print(f"  {'OK   ' if ok else 'FALLA'} {label:12} {dataset:20} filas={len(actual):7} "
+          f"consultas={queries} (referencia={reference_queries})")
+    if actual != expected:
+        for index, (a, e) in enumerate(zip(actual, expected)):
+            if a != e:
+                print(f"    primera diferencia en la fila {index}:\n      actual:     {a}\n      referencia: {e}")
+                break
+        else:
+            print(f"    cantidad de filas distinta: {len(actual)} vs {len(expected)}")
+    return 0 if ok else 1
+
+
+def verify(users: int):
+    engine, Session, path = create_dataset_engine()
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    failures = 0
+    try:
+        db = Session()
+        summary = populate(db, users=users)
+        print(f"\n{summary['users']} usuarios, {summary['assignments']} asignaciones, "
+              f"{summary['technology_progress']} registros de progreso")
+        for dataset in REFERENCE:
+            failures += compare(db, statements, dataset, None, None, "completa")
+
+        since = datetime.utcnow()
+        apply_changes(db, summary)
+        until = datetime.utcnow()
+        for dataset in REFERENCE:
+            failures += compare(db, statements, dataset, since, until, "incremental")
+        db.close()
+    finally:
+        engine.dispose()
+        os.unlink(path)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 2000], help="cantidad de usuarios a generar")
+    args = parser.parse_args()
+    failures = sum(verify(users) for users in args.sizes)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
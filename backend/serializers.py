@@ -0,0 +1,204 @@
+import json
+from decimal import Decimal
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # sin orjson se usa el codificador estándar
+    orjson = None
+
+# ================================
+# SERIALIZACIÓN RÁPIDA
+# ================================
+# Las rutas con listas grandes devuelven diccionarios armados directamente desde los
+# objetos ORM (modo confiable: los datos vienen de la base y ya cumplen el esquema),
+# sin pasar por la validación from_attributes de los modelos Pydantic anidados.
+# Cada función produce exactamente la misma salida que su esquema en schemas.py,
+# con los campos en el mismo orden. scripts/bench_serialization.py lo verifica.
+
+
+def default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content, default=lambda value: value.isoformat() if hasattr(value, "isoformat") else default(value),
+        ensure_ascii=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Respuesta JSON codificada con orjson (clase por defecto de la aplicación)
+    """
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+class TrustedSerializer:
+    """
+    Convierte objetos ORM en diccionarios con la forma de los esquemas de respuesta.
+    Los objetos repetidos (el mismo rol, género o capacitación en muchas filas) se
+    convierten una sola vez por respuesta.
+    """
+
+    def __init__(self):
+        self._memo = {}
+
+    def _cached(self, kind: str, obj, build):
+        key = (kind, id(obj))
+        result = self._memo.get(key)
+        if result is None:
+            result = self._memo[key] = build(obj)
+        return result
+
+    def gender(self, gender):
+        return self._cached("gender", gender, lambda g: {
+            "gender_name": g.gender_name,
+            "gender_id": g.gender_id,
+            "gender_status": g.gender_status,
+            "gender_created_at": g.gender_created_at,
+        })
+
+    def role(self, role):
+        return self._cached("role", role, lambda r: {
+            "role_name": r.role_name,
+            "role_description": r.role_description,
+            "role_id": r.role_id,
+            "role_status": r.role_status,
+            "role_created_at": r.role_created_at,
+        })
+
+    def person(self, person):
+        return self._cached("person", person, lambda p: {
+            "person_dni": p.person_dni,
+            "person_first_name": p.person_first_name,
+            "person_last_name": p.person_last_name,
+            "person_gender": p.person_gender,
+            "person_email": p.person_email,
+            "person_id": p.person_id,
+            "person_status": p.person_status,
+            "person_created_at": p.person_created_at,
+            "gender": self.gender(p.gender),
+        })
+
+    def user(self, user):
+        if user is None:
+            return None
+        return self._cached("user", user, lambda u: {
+            "user_username": u.user_username,
+            "person_id": u.person_id,
+            "user_role": u.user_role,
+            "user_id": u.user_id,
+            "user_status": u.user_status,
+            "user_created_at": u.user_created_at,
+            "person": self.person(u.person),
+            "role": self.role(u.role),
+        })
+
+    def technology(self, technology):
+        return self._cached("technology", technology, lambda t: {
+            "technology_name": t.technology_name,
+            "technology_id": t.technology_id,
+            "technology_created_at": t.technology_created_at,
+        })
+
+    def training_technology(self, training_technology):
+        return {
+            "training_id": training_technology.training_id,
+            "technology_id": training_technology.technology_id,
+            "training_technology_id": training_technology.training_technology_id,
+            "created_at": training_technology.created_at,
+            "technology": self.technology(training_technology.technology),
+        }
+
+    def training(self, training):
+        return self._cached("training", training, lambda t: {
+            "training_name": t.training_name,
+            "training_description": t.training_description,
+            "training_id": t.training_id,
+            "training_status": t.training_status,
+            "training_created_at": t.training_created_at,
+            "training_technologies": [self.training_technology(tt) for tt in t.training_technologies],
+        })
+
+    def assignment(self, assignment):
+        return {
+            "user_id": assignment.user_id,
+            "training_id": assignment.training_id,
+            "instructor_id": assignment.instructor_id,
+            "instructor_meeting_link": assignment.instructor_meeting_link,
+            "assignment_id": assignment.assignment_id,
+            "assignment_status": assignment.assignment_status,
+            "assignment_created_at": assignment.assignment_created_at,
+            "completion_percentage": float(assignment.completion_percentage),
+            "user": self.user(assignment.user),
+            "training": self.training(assignment.training),
+            "instructor": self.user(assignment.instructor),
+        }
+
+    def team_member(self, member):
+        return {
+            "user_id": member.user_id,
+            "member_role": member.member_role,
+            "team_member_id": member.team_member_id,
+            "team_id": member.team_id,
+            "member_status": member.member_status,
+            "joined_at": member.joined_at,
+            "user": self.user(member.user),
+        }
+
+    def team(self, team):
+        return {
+            "team_name": team.team_name,
+            "team_description": team.team_description,
+            "supervisor_id": team.supervisor_id,
+            "team_id": team.team_id,
+            "team_status": team.team_status,
+            "team_created_at": team.team_created_at,
+            "supervisor": self.user(team.supervisor),
+            "team_members": [self.team_member(member) for member in team.team_members],
+        }
+
+    def fieldset(self, node, obj):
+        """
+        Objeto recortado según un árbol de fieldsets.Node (parámetros fields= / expand=).
+        Solo toca las relaciones del árbol, que son las que se cargaron en la consulta.
+        """
+        if obj is None:
+            return None
+        return self._cached(id(node), obj, lambda o: self._fieldset(node, o))
+
+    def _fieldset(self, node, obj):
+        result = {name: getattr(obj, name) for name in node.scalars}
+        for name, (child, uselist) in node.relations.items():
+            value = getattr(obj, name)
+            if uselist:
+                result[name] = [self.fieldset(child, item) for item in value]
+            else:
+                result[name] = self.fieldset(child, value)
+        return result
+
+
+def serialize_list(kind: str, objects):
+    """
+    Respuesta JSON de una lista de objetos ORM del tipo indicado (user, team, assignment, ...)
+    """
+    serializer = TrustedSerializer()
+    build = getattr(serializer, kind)
+    return FastJSONResponse([build(obj) for obj in objects])
+
+
+def serialize_fieldset(node, objects):
+    """
+    Respuesta JSON de una lista de objetos ORM recortados con fields= / expand=
+    """
+    serializer = TrustedSerializer()
+    return FastJSONResponse([serializer.fieldset(node, obj) for obj in objects])
@@ -0,0 +1,74 @@
+"""
+Punto de entrada de producción.
+
+Inicializa la base una sola vez en el proceso maestro y levanta N workers de uvicorn
+(uno por núcleo disponible por defecto). Con más de un worker, cada uno se recicla
+después de atender SERVER_MAX_REQUESTS solicitudes (con jitter para que no se reinicien
+todos juntos); con uno solo no hay proceso supervisor que lo reemplace, así que no se
+recicla. Al recibir SIGTERM se terminan las solicitudes en curso antes de salir.
+A diferencia de `uvicorn main:app`, las tablas se conservan al iniciar
+(DB_RESET_ON_STARTUP=false salvo que se indique lo contrario).
+
+Uso (desde backend/):
+    python serve.py
+
+Variables de entorno:
+    HOST, PORT                   dirección de escucha (0.0.0.0:8000)
+    WEB_CONCURRENCY              cantidad de workers (por defecto, núcleos disponibles)
+    SERVER_MAX_REQUESTS          solicitudes antes de reciclar un worker (0 = nunca; solo con varios workers)
+    SERVER_MAX_REQUESTS_JITTER   variación aleatoria del límite anterior
+    SERVER_GRACEFUL_TIMEOUT      segundos para terminar solicitudes en curso al apagar
+    SERVER_KEEPALIVE_TIMEOUT     segundos que se mantiene abierta una conexión inactiva
+    EVENTS_BACKEND               bus de eventos SSE (database por defecto con varios workers)
+    DB_RESET_ON_STARTUP          recrear las tablas al iniciar (false por defecto)
+
+Para desarrollo sigue sirviendo `uvicorn main:app --reload`. No usar `uvicorn --workers`
+directamente: cada worker inicializaría la base por su cuenta.
+"""
+import os
+
+import uvicorn
+
+import startup
+
+
+def available_cores() -> int:
+    # Respeta la afinidad de CPU del contenedor cuando el sistema la expone
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def main():
+    workers = int(os.getenv("WEB_CONCURRENCY", str(available_cores())))
+    max_requests = int(os.getenv("SERVER_MAX_REQUESTS", "10000"))
+
+    reset = os.getenv("DB_RESET_ON_STARTUP", "false").lower() in ("1", "true", "yes")
+    startup.initialize_once(reset)
+    # Los workers heredan el entorno y no repiten la inicialización
+    os.environ[startup.STARTUP_INIT_DONE_ENV] = "1"
+    # Con varios workers los eventos SSE se comparten a través de la base
+    if workers > 1:
+        os.environ.setdefault("EVENTS_BACKEND", "database")
+    else:
+        # Un solo worker corre en este mismo proceso, sin supervisor: al llegar al límite
+        # se cerraría el servidor completo
+        max_requests = 0
+
+    uvicorn.run(
+        "main:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8000")),
+        workers=workers,
+        limit_max_requests=max_requests or None,
+        limit_max_requests_jitter=int(os.getenv("SERVER_MAX_REQUESTS_JITTER", "1000")),
+        timeout_graceful_shutdown=int(os.getenv("SERVER_GRACEFUL_TIMEOUT", "30")),
+        timeout_keep_alive=int(os.getenv("SERVER_KEEPALIVE_TIMEOUT", "5")),
+        proxy_headers=True,
+        forwarded_allow_ips=os.getenv("FORWARDED_ALLOW_IPS", "*"),
+        access_log=os.getenv("SERVER_ACCESS_LOG", "false").lower() in ("1", "true", "yes"),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import os
+import time
+import asyncio
+import hashlib
+
+from starlette.datastructures import Headers
+
+import compression
+
+# ================================
+# COALESCENCIA DE SOLICITUDES IDÉNTICAS (SINGLE-FLIGHT)
+# ================================
+# Cuando llegan a la vez muchas solicitudes GET idénticas (el dashboard de todo un
+# departamento abriéndose a las 9:00), solo la primera ejecuta la ruta; las demás
+# esperan ese resultado y reciben una copia de la misma respuesta ya serializada
+# (y comprimida, si corresponde). Con SINGLEFLIGHT_GRACE_SECONDS > 0 la respuesta se
+# sigue reutilizando unos instantes después de terminar.
+#
+# La clave incluye la ruta, los parámetros normalizados y las cabeceras que cambian
+# la respuesta: identidad del cliente (Authorization/Cookie), origen (CORS),
+# codificación negociada y cabeceras condicionales.
+
+# Rutas con coalescencia: las terminadas en "/" se comparan por prefijo, el resto exactas
+SINGLEFLIGHT_PATHS = [
+    path.strip() for path in os.getenv(
+        "SINGLEFLIGHT_PATHS", "/api/v1/powerbi/,/api/v1/teams,/api/v1/trainings"
+    ).split(",") if path.strip()
+]
+SINGLEFLIGHT_GRACE_SECONDS = float(os.getenv("SINGLEFLIGHT_GRACE_SECONDS", "0"))
+# Respuestas más grandes no se guardan para compartir (cada solicitud se ejecuta sola)
+SINGLEFLIGHT_MAX_BODY_BYTES = int(os.getenv("SINGLEFLIGHT_MAX_BODY_BYTES", str(16 * 1024 * 1024)))
+
+KEY_HEADERS = ["authorization", "cookie", "origin", "accept", "if-none-match", "if-modified-since"]
+
+# Estadísticas del proceso: solicitudes ejecutadas, compartidas y servidas desde la gracia
+_stats = {"leaders": 0, "followers": 0, "grace_hits": 0, "not_shared": 0}
+
+_inflight = {}
+_recent = {}
+
+
+def is_coalesced_path(path: str) -> bool:
+    for candidate in SINGLEFLIGHT_PATHS:
+        if candidate.endswith("/") and path.startswith(candidate):
+            return True
+        if path == candidate:
+            return True
+    return False
+
+
+def request_key(scope) -> str:
+    """
+    Clave de la solicitud: ruta, query string normalizado y cabeceras relevantes
+    """
+    headers = Headers(scope=scope)
+    query = scope.get("query_string", b"").decode("latin-1")
+    normalized_query = "&".join(sorted(part for part in query.split("&") if part))
+    parts = [scope["path"], normalized_query, compression.negotiate(headers.get("accept-encoding", "")) or ""]
+    parts.extend(headers.get(name, "") for name in KEY_HEADERS)
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+def stats():
+    return {
+        **_stats,
+        "in_flight": len(_inflight),
+        "grace_entries": len(_recent),
+        "grace_seconds": SINGLEFLIGHT_GRACE_SECONDS,
+        "paths": SINGLEFLIGHT_PATHS,
+    }
+
+
+class Flight:
+    """
+    Ejecución en curso de una solicitud; guarda los mensajes ASGI de la respuesta
+    """
+
+    def __init__(self):
+        self.done = asyncio.Event()
+        self.messages = []
+        self.size = 0
+        self.shareable = True
+        self.finished_at = None
+
+    def record(self, message):
+        if not self.shareable:
+            return
+        if message["type"] == "http.response.start":
+            # Solo se comparten respuestas exitosas
+            if not 200 <= message["status"] < 300 and message["status"] != 304:
+                self.shareable = False
+                return
+        elif message["type"] == "http.response.body":
+            self.size += len(message.get("body", b""))
+            if self.size > SINGLEFLIGHT_MAX_BODY_BYTES:
+                self.shareable = False
+                self.messages = []
+                return
+        else:
+            self.shareable = False
+            return
+        self.messages.append(message)
+
+
+class SingleFlightMiddleware:
+    """
+    Middleware ASGI que ejecuta una sola vez las solicitudes GET idénticas simultáneas
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET" or not is_coalesced_path(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        key = request_key(scope)
+
+        recent = _recent.get(key)
+        if recent is not None:
+            if time.monotonic() - recent.finished_at <= SINGLEFLIGHT_GRACE_SECONDS:
+                _stats["grace_hits"] += 1
+                await self.replay(recent, send)
+                return
+            del _recent[key]
+
+        flight = _inflight.get(key)
+        if flight is not None:
+            await flight.done.wait()
+            if flight.shareable:
+                _stats["followers"] += 1
+                await self.replay(flight, send)
+                return
+            # El resultado no se podía compartir (error o demasiado grande): ejecutar aparte
+            _stats["not_shared"] += 1
+            await self.app(scope, receive, send)
+            return
+
+        await self.lead(key, scope, receive, send)
+
+    async def lead(self, key, scope, receive, send):
+        flight = _inflight[key] = Flight()
+        _stats["leaders"] += 1
+
+        async def send_and_record(message):
+            flight.record(message)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_record)
+        except BaseException:
+            flight.shareable = False
+            raise
+        finally:
+            flight.finished_at = time.monotonic()
+            del _inflight[key]
+            if flight.shareable and SINGLEFLIGHT_GRACE_SECONDS > 0:
+                _recent[key] = flight
+                self.purge_recent()
+            flight.done.set()
+
+    async def replay(self, flight, send):
+        for message in flight.messages:
+            await send(message)
+
+    def purge_recent(self):
+        now = time.monotonic()
+        for key in [key for key, flight in _recent.items() if now - flight.finished_at > SINGLEFLIGHT_GRACE_SECONDS]:
+            del _recent[key]
@@ -0,0 +1,322 @@
+import os
+import json
+import glob
+import time
+import asyncio
+import tempfile
+import threading
+from datetime import datetime
+
+import anyio
+from sqlalchemy import select, func
+
+import models
+import powerbi
+import compression
+from startup import file_lock
+
+# ================================
+# SNAPSHOTS DE POWER BI
+# ================================
+# La carga completa en JSON de cada dataset se sirve ya serializada (y comprimida) desde
+# un snapshot. Con varios workers (serve.py) los snapshots se guardan en disco, en
+# POWERBI_SNAPSHOT_DIR, y todos los workers sirven los mismos bytes: solo el worker líder
+# los reconstruye en segundo plano (startup.run_as_leader), así cada dataset se arma una
+# vez por intervalo y X-Snapshot-Age no depende de qué worker responde.
+#   <dataset>.meta.json              versión vigente, filas, marca de agua, firma, fechas
+#   <dataset>.<versión>.json[.gz|.br] cuerpo y sus versiones comprimidas
+# La metadata se reemplaza de forma atómica después de escribir los cuerpos, así nunca
+# apunta a una versión incompleta; se conserva además la versión anterior para quien la
+# esté leyendo. Cada worker guarda en memoria el snapshot vigente y solo vuelve a leer
+# el disco cuando cambia la metadata.
+# Si un worker necesita un snapshot que no existe o es más antiguo que max_age, lo
+# reconstruye él mismo en el almacén compartido (con un bloqueo por dataset entre procesos).
+
+POWERBI_SNAPSHOT_DIR = os.getenv("POWERBI_SNAPSHOT_DIR", "./storage/snapshots")
+
+# Intervalo de reconstrucción de los snapshots (POWERBI_SNAPSHOT_INTERVAL_SECONDS=0 los desactiva).
+# Se puede ajustar por dataset: POWERBI_SNAPSHOT_INTERVALS="progress-summary=60,users-summary=900"
+POWERBI_SNAPSHOT_INTERVAL_SECONDS = int(os.getenv("POWERBI_SNAPSHOT_INTERVAL_SECONDS", "300"))
+
+
+def parse_intervals(value: str):
+    intervals = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, seconds = item.partition("=")
+        if name.strip() not in powerbi.DATASETS:
+            raise ValueError(f"Dataset desconocido en POWERBI_SNAPSHOT_INTERVALS: {name}")
+        intervals[name.strip()] = int(seconds)
+    return intervals
+
+
+SNAPSHOT_INTERVALS = {
+    name: POWERBI_SNAPSHOT_INTERVAL_SECONDS for name in powerbi.DATASETS
+}
+SNAPSHOT_INTERVALS.update(parse_intervals(os.getenv("POWERBI_SNAPSHOT_INTERVALS", "")))
+
+# Tablas de origen de cada dataset con su columna de modificación.
+# Si ninguna cambió (misma cantidad de filas y mismo updated_at máximo) no se reconstruye.
+SNAPSHOT_SOURCES = {
+    "users-summary": [
+        models.User.user_updated_at, models.Person.person_updated_at,
+        models.Gender.gender_updated_at, models.Role.role_updated_at,
+    ],
+    "trainings-summary": [
+        models.Training.training_updated_at, models.TrainingTechnology.updated_at,
+        models.Technology.technology_updated_at, models.UserTrainingAssignment.assignment_updated_at,
+    ],
+    "assignments-detail": [
+        models.UserTrainingAssignment.assignment_updated_at, models.User.user_updated_at,
+        models.Person.person_updated_at, models.Gender.gender_updated_at,
+        models.Training.training_updated_at,
+    ],
+    "teams-summary": [
+        models.Team.team_updated_at, models.TeamMember.member_updated_at,
+        models.User.user_updated_at, models.Person.person_updated_at,
+    ],
+    "progress-summary": [
+        models.UserTechnologyProgress.updated_at, models.Technology.technology_updated_at,
+        models.UserTrainingAssignment.assignment_updated_at, models.User.user_updated_at,
+        models.Person.person_updated_at, models.Training.training_updated_at,
+    ],
+}
+
+
+class Snapshot:
+    """
+    Respuesta JSON de un dataset ya serializada, lista para enviarse sin consultar la base.
+    Los cuerpos se leen del almacén la primera vez que se piden.
+    """
+
+    def __init__(self, name: str, meta: dict):
+        self.name = name
+        self.version = meta["version"]
+        self.rows = meta["rows"]
+        self.watermark = datetime.fromisoformat(meta["watermark"])
+        self.signature = meta["signature"]
+        self.size = meta["size"]
+        # Fechas de reloj (time.time()): se comparan entre procesos
+        self.built_at = meta["built_at"]
+        # Última vez que se confirmó que las tablas de origen no cambiaron
+        self.verified_at = meta["verified_at"]
+        self._body = None
+        # Cuerpo ya comprimido por codificación (gzip, br), para no leerlo en cada solicitud
+        self._encoded = {}
+
+    @property
+    def body(self) -> bytes:
+        if self._body is None:
+            self._body = read_file(body_path(self.name, self.version))
+        return self._body
+
+    def encoded(self, encoding: str = None):
+        """
+        Cuerpo a enviar según la codificación negociada: (bytes, codificación o None)
+        """
+        encoding = encoding or compression.requested_encoding()
+        if encoding is None or self.size < compression.COMPRESSION_MIN_SIZE:
+            return self.body, None
+        if encoding not in self._encoded:
+            path = body_path(self.name, self.version, encoding)
+            if os.path.exists(path):
+                self._encoded[encoding] = read_file(path)
+        return compression.encode_cached(self.body, self._encoded, encoding)
+
+    def age(self, now: float = None) -> float:
+        return max(0.0, (now or time.time()) - self.verified_at)
+
+
+ENCODING_SUFFIXES = {"gzip": ".gz", "br": ".br"}
+
+# Snapshot vigente de cada dataset en este proceso, con el mtime de la metadata leída
+_loaded = {}
+_locks = {name: threading.Lock() for name in powerbi.DATASETS}
+
+
+def meta_path(name: str) -> str:
+    return os.path.join(POWERBI_SNAPSHOT_DIR, f"{name}.meta.json")
+
+
+def body_path(name: str, version: str, encoding: str = None) -> str:
+    suffix = ENCODING_SUFFIXES[encoding] if encoding else ""
+    return os.path.join(POWERBI_SNAPSHOT_DIR, f"{name}.{version}.json{suffix}")
+
+
+def read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def write_atomic(path: str, data: bytes):
+    # os.replace es atómico: quien lee ve el archivo anterior o el nuevo completo
+    fd, tmp_path = tempfile.mkstemp(dir=POWERBI_SNAPSHOT_DIR, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def load(name: str):
+    """
+    Snapshot vigente del almacén, o None si todavía no hay. Solo lee el disco si la
+    metadata cambió desde la última lectura de este proceso.
+    """
+    try:
+        mtime = os.stat(meta_path(name)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    cached = _loaded.get(name)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    meta = json.loads(read_file(meta_path(name)))
+    if cached and cached[1].version == meta["version"]:
+        # Misma versión recién verificada: se conservan los cuerpos ya leídos
+        snapshot = cached[1]
+        snapshot.verified_at = meta["verified_at"]
+    else:
+        snapshot = Snapshot(name, meta)
+    _loaded[name] = (mtime, snapshot)
+    return snapshot
+
+
+def source_signature(conn, name: str):
+    """
+    Cantidad de filas y updated_at máximo de cada tabla de origen, en una sola consulta.
+    La cantidad detecta borrados físicos, que no dejan rastro en updated_at.
+    Se devuelve como lista de textos para guardarla en la metadata.
+    """
+    columns = []
+    for column in SNAPSHOT_SOURCES[name]:
+        columns.append(select(func.count()).select_from(column.table).scalar_subquery())
+        columns.append(select(func.max(column)).scalar_subquery())
+    return [None if value is None else str(value) for value in conn.execute(select(*columns)).one()]
+
+
+def serialize(rows, watermark: datetime) -> bytes:
+    # Mismo formato que JSONResponse para que el snapshot sea idéntico a la respuesta en vivo
+    return json.dumps(
+        {"data": rows, "count": len(rows), "watermark": watermark.isoformat()},
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+def write_meta(name: str, meta: dict):
+    write_atomic(meta_path(name), json.dumps(meta).encode("utf-8"))
+
+
+def remove_old_versions(name: str, keep):
+    for path in glob.glob(os.path.join(POWERBI_SNAPSHOT_DIR, f"{name}.*.json*")):
+        version = os.path.basename(path)[len(name) + 1:].split(".json")[0]
+        if version != "meta" and version not in keep:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+
+def refresh(name: str, force: bool = False) -> Snapshot:
+    """
+    Reconstruir el snapshot de un dataset si alguna de sus tablas de origen cambió.
+    La firma se toma antes de leer el dataset: un cambio durante la reconstrucción
+    produce otra firma y se recoge en la siguiente pasada.
+    """
+    os.makedirs(POWERBI_SNAPSHOT_DIR, exist_ok=True)
+    # Un hilo por dataset en este proceso, y un proceso por dataset entre workers:
+    # quien esperaba el bloqueo encuentra el snapshot que acaba de armar el otro
+    with _locks[name], file_lock(os.path.join(POWERBI_SNAPSHOT_DIR, f".{name}.lock")):
+        current = load(name)
+        with powerbi.engine.connect() as conn:
+            signature = source_signature(conn, name)
+            if current and not force and current.signature == signature:
+                meta = json.loads(read_file(meta_path(name)))
+                write_meta(name, dict(meta, verified_at=time.time()))
+                return load(name)
+
+            started = time.time()
+            _, _, watermark = powerbi.resolve_window()
+            rows = powerbi.fetch_dataset(conn, name)
+        body = serialize(rows, watermark)
+
+        version = f"{int(started * 1000)}-{os.getpid()}"
+        write_atomic(body_path(name, version), body)
+        # Comprimir al reconstruir, fuera del camino de las solicitudes
+        if len(body) >= compression.COMPRESSION_MIN_SIZE:
+            for encoding in compression.SUPPORTED_ENCODINGS:
+                write_atomic(body_path(name, version, encoding), compression.compress(body, encoding))
+        write_meta(name, {
+            "version": version,
+            "rows": len(rows),
+            "watermark": watermark.isoformat(),
+            "signature": signature,
+            "size": len(body),
+            "built_at": started,
+            "verified_at": started,
+        })
+        remove_old_versions(name, keep={version, current.version if current else None})
+        return load(name)
+
+
+def get_snapshot(name: str, max_age: float = None) -> Snapshot:
+    """
+    Snapshot vigente del dataset. Si no existe o es más antiguo que max_age (segundos)
+    se verifica/reconstruye en el momento.
+    """
+    snapshot = load(name)
+    if snapshot is None or (max_age is not None and snapshot.age() > max_age):
+        snapshot = refresh(name)
+    return snapshot
+
+
+def snapshot_status():
+    now = time.time()
+    result = []
+    for name in powerbi.DATASETS:
+        snapshot = load(name)
+        result.append({
+            "dataset": name,
+            "interval_seconds": SNAPSHOT_INTERVALS[name],
+            "available": snapshot is not None,
+            "age_seconds": round(snapshot.age(now), 1) if snapshot else None,
+            "build_age_seconds": round(now - snapshot.built_at, 1) if snapshot else None,
+            "rows": snapshot.rows if snapshot else None,
+            "size_bytes": snapshot.size if snapshot else None,
+            "watermark": snapshot.watermark.isoformat() if snapshot else None,
+        })
+    return result
+
+
+async def run_forever():
+    """
+    Tarea de fondo del worker líder: revisa cada dataset cuando vence su intervalo.
+    La primera pasada reconstruye todo: los snapshots del almacén pueden venir de un
+    despliegue anterior, con otro código.
+    """
+    scheduled = {name: interval for name, interval in SNAPSHOT_INTERVALS.items() if interval > 0}
+    first_pass = True
+    while scheduled:
+        now = time.time()
+        for name, interval in scheduled.items():
+            snapshot = await anyio.to_thread.run_sync(load, name)
+            if not first_pass and snapshot is not None and snapshot.age(now) < interval:
+                continue
+            try:
+                await anyio.to_thread.run_sync(refresh, name, first_pass)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error generando snapshot de {name}: {e}")
+        first_pass = False
+
+        now = time.time()
+        waits = []
+        for name, interval in scheduled.items():
+            snapshot = load(name)
+            waits.append(interval - snapshot.age(now) if snapshot else interval)
+        await asyncio.sleep(max(1.0, min(waits)))
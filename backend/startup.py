@@ -0,0 +1,132 @@
+import os
+import asyncio
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueos entre procesos (desarrollo con un solo proceso)
+    fcntl = None
+
+import models
+import versioning
+import assignment_view
+from database import engine, SessionLocal
+
+# ================================
+# INICIALIZACIÓN Y ELECCIÓN DE LÍDER
+# ================================
+# Con varios procesos (serve.py) la base se inicializa una sola vez en el proceso maestro
+# antes de levantar los workers, que reciben STARTUP_INIT_DONE_ENV=1 y no la repiten.
+# Las tareas de fondo que no deben duplicarse (verificador de enlaces, warehouse,
+# snapshots de Power BI) corren solo en el worker que tiene el bloqueo de líder; si ese
+# worker se recicla, otro lo toma.
+
+# Recrear las tablas al iniciar (comportamiento histórico del proyecto en desarrollo).
+# serve.py usa false por defecto: en producción un reinicio no debe borrar los datos.
+DB_RESET_ON_STARTUP = os.getenv("DB_RESET_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+
+STARTUP_INIT_DONE_ENV = "CAREER_PLAN_INIT_DONE"
+STARTUP_LOCK_PATH = os.getenv("STARTUP_LOCK_PATH", "./.startup.lock")
+LEADER_LOCK_PATH = os.getenv("LEADER_LOCK_PATH", "./.leader.lock")
+LEADER_RETRY_SECONDS = int(os.getenv("LEADER_RETRY_SECONDS", "30"))
+
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Bloqueo exclusivo entre procesos sobre un archivo (espera hasta obtenerlo)
+    """
+    with open(path, "a") as handle:
+        if fcntl:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+def create_default_genders():
+    db = SessionLocal()
+    try:
+        if not db.query(models.Gender).first():
+            genders = [
+                models.Gender(gender_name="Masculino"),
+                models.Gender(gender_name="Femenino")
+            ]
+            db.add_all(genders)
+            db.commit()
+    except Exception:
+        db.rollback()
+    finally:
+        db.close()
+
+
+def init_database(reset: bool = None):
+    if reset is None:
+        reset = DB_RESET_ON_STARTUP
+    if reset:
+        # Eliminar y recrear tablas para limpiar la estructura
+        models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    create_default_genders()
+    # Invalidar los ETag emitidos antes de este arranque
+    with engine.begin() as conn:
+        versioning.bump_scopes(conn, [versioning.EPOCH_SCOPE])
+        # Base existente de antes de la proyección de asignaciones: llenarla
+        assignment_view.rebuild_if_stale(conn)
+
+
+def initialize_once(reset: bool = None) -> bool:
+    """
+    Inicializar la base si este proceso es el responsable de hacerlo (reset: recrear las
+    tablas; por defecto DB_RESET_ON_STARTUP). Retorna False si el proceso maestro ya la inicializó.
+    """
+    if os.getenv(STARTUP_INIT_DONE_ENV) == "1":
+        return False
+    with file_lock(STARTUP_LOCK_PATH):
+        init_database(reset)
+    # Las conexiones abiertas durante la inicialización no se heredan a los workers
+    engine.dispose()
+    return True
+
+
+class LeaderLock:
+    """
+    Bloqueo no bloqueante que se mantiene mientras viva el proceso que lo obtuvo
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._handle = None
+
+    def try_acquire(self) -> bool:
+        if self._handle is not None or fcntl is None:
+            return True
+        handle = open(self.path, "a")
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return False
+        self._handle = handle
+        return True
+
+    def release(self):
+        if self._handle is not None:
+            fcntl.flock(self._handle, fcntl.LOCK_UN)
+            self._handle.close()
+            self._handle = None
+
+
+leader = LeaderLock(LEADER_LOCK_PATH)
+
+
+async def run_as_leader(task_factory, retry_seconds: int = LEADER_RETRY_SECONDS):
+    """
+    Ejecutar una tarea de fondo solo en el worker líder.
+    Los demás workers reintentan tomar el liderazgo cada retry_seconds.
+    """
+    while not leader.try_acquire():
+        await asyncio.sleep(retry_seconds)
+    await task_factory()
@@ -0,0 +1,171 @@
+import os
+import hashlib
+import tempfile
+from urllib.parse import quote
+
+from fastapi.responses import FileResponse, Response, JSONResponse
+from starlette.datastructures import Headers
+
+# Directorio donde se guardan los archivos subidos, direccionados por su SHA-256
+MATERIALS_STORAGE_DIR = os.getenv("MATERIALS_STORAGE_DIR", "./storage/materials")
+
+# Tamaño de bloque para copiar/hashear: nunca se carga el archivo completo en memoria
+CHUNK_SIZE = 1024 * 1024
+
+# Límite de tamaño por archivo (por defecto 2 GB)
+MAX_UPLOAD_BYTES = int(os.getenv("MATERIALS_MAX_UPLOAD_BYTES", str(2 * 1024 * 1024 * 1024)))
+
+# Rutas de subida cuyo cuerpo se limita antes de llegar al parser multipart
+UPLOAD_PATHS = ("/api/v1/training-materials/upload",)
+# Margen para los campos del formulario y los separadores multipart
+UPLOAD_FORM_OVERHEAD_BYTES = 1024 * 1024
+
+# Si el backend está detrás de nginx se puede delegar el envío del archivo
+# (sendfile + rangos) usando X-Accel-Redirect con este prefijo interno
+X_ACCEL_PREFIX = os.getenv("MATERIALS_X_ACCEL_PREFIX")
+
+
+class UploadTooLarge(Exception):
+    pass
+
+
+def upload_too_large_response():
+    return JSONResponse(status_code=413, content={"detail": "El archivo supera el tamaño máximo permitido"})
+
+
+class UploadLimitMiddleware:
+    """
+    Limitar el cuerpo de las subidas mientras se recibe. El parser multipart de Starlette
+    vuelca el archivo completo a un temporal antes de que la ruta lo vea, así que el
+    límite de store_stream llegaría tarde: aquí se rechaza con 413 por Content-Length
+    sin leer el cuerpo, y si el cliente no lo envía (chunked) o miente, se corta la
+    lectura en cuanto se supera el límite.
+    """
+
+    def __init__(self, app, max_bytes: int = MAX_UPLOAD_BYTES + UPLOAD_FORM_OVERHEAD_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in UPLOAD_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            await upload_too_large_response()(scope, receive, send)
+            return
+
+        received = 0
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            message = await receive()
+            if message["type"] == "http.request" and not rejected:
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    rejected = True
+                    await upload_too_large_response()(scope, receive, send)
+                    # Para la ruta el cliente se desconectó: deja de leer y descarta el temporal
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            # Lo que responda la ruta después del 413 ya no llega al cliente
+            if not rejected:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not rejected:
+                raise
+
+
+def object_path(sha256: str) -> str:
+    """
+    Ruta del objeto dentro del almacén: <dir>/<2 primeros caracteres>/<sha256>
+    """
+    return os.path.join(MATERIALS_STORAGE_DIR, sha256[:2], sha256)
+
+
+def store_stream(source, max_bytes: int = MAX_UPLOAD_BYTES):
+    """
+    Copiar un archivo (objeto con .read) al almacén en bloques calculando su SHA-256.
+    Si ya existe un objeto con el mismo hash no se duplica en disco.
+    Retorna (sha256, tamaño, ya_existía).
+    """
+    tmp_dir = os.path.join(MATERIALS_STORAGE_DIR, "tmp")
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge()
+                digest.update(chunk)
+                tmp.write(chunk)
+
+        sha256 = digest.hexdigest()
+        final_path = object_path(sha256)
+        if os.path.exists(final_path):
+            os.unlink(tmp_path)
+            return sha256, size, True
+
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        # os.replace es atómico: dos subidas simultáneas del mismo contenido dejan un único objeto
+        os.replace(tmp_path, final_path)
+        return sha256, size, False
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def etag_for(sha256: str) -> str:
+    # El contenido está direccionado por hash, así que el hash es un ETag fuerte
+    return f'"{sha256}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+def file_response(sha256: str, filename: str, content_type: str, if_none_match: str = None):
+    """
+    Construir la respuesta de descarga de un objeto del almacén.
+    FileResponse de Starlette resuelve Range/If-Range (206/416) leyendo por bloques,
+    y usa http.response.pathsend (envío sin copia) cuando el servidor lo soporta.
+    """
+    etag = etag_for(sha256)
+    headers = {"ETag": etag, "Accept-Ranges": "bytes"}
+
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    if X_ACCEL_PREFIX:
+        # nginx sirve el archivo directamente con sendfile y maneja los rangos
+        headers["X-Accel-Redirect"] = f"{X_ACCEL_PREFIX.rstrip('/')}/{sha256[:2]}/{sha256}"
+        headers["Content-Disposition"] = f"inline; filename*=utf-8''{quote(filename or sha256)}"
+        return Response(status_code=200, headers=headers, media_type=content_type)
+
+    return FileResponse(
+        object_path(sha256),
+        headers=headers,
+        media_type=content_type or "application/octet-stream",
+        filename=filename,
+        content_disposition_type="inline",
+    )
@@ -0,0 +1,287 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Header
+from fastapi.responses import Response
+from sqlalchemy import event, select, inspect
+
+import models
+from database import SessionLocal
+
+# ================================
+# VERSIONES DE RECURSOS (GET CONDICIONAL)
+# ================================
+# Cada escritura hecha con SessionLocal incrementa, en la misma transacción, el contador
+# de los recursos que afecta (las asignaciones de un usuario, los equipos de un
+# supervisor, el progreso de una asignación...). Los endpoints consultados por los
+# dashboards calculan su ETag/Last-Modified leyendo solo esos contadores y responden
+# 304 sin ejecutar la consulta pesada si el cliente ya tiene la versión vigente.
+#
+# Además del contador propio, cada recurso depende de:
+#   - su familia ('assignments', 'teams', ...), que se incrementa con las sentencias
+#     masivas (update/delete/insert ORM) donde no se sabe qué filas cambiaron
+#   - 'catalog' (personas, usuarios, roles, capacitaciones, tecnologías), porque las
+#     respuestas incluyen esos objetos anidados
+#   - 'epoch', que se incrementa en cada inicialización de la base
+
+EPOCH_SCOPE = "epoch"
+CATALOG_SCOPE = "catalog"
+MATERIALS_SCOPE = "materials"
+
+CATALOG_MODELS = (
+    models.Gender, models.Role, models.Person, models.User,
+    models.Technology, models.Training, models.TrainingTechnology,
+)
+
+# Familia de cada modelo: es lo que se invalida ante una sentencia masiva
+MODEL_FAMILIES = {
+    models.UserTrainingAssignment: "assignments",
+    models.UserTechnologyProgress: "progress",
+    models.UserMaterialProgress: "progress",
+    models.Team: "teams",
+    models.TeamMember: "teams",
+    models.TrainingMaterial: MATERIALS_SCOPE,
+    models.MaterialFile: MATERIALS_SCOPE,
+}
+MODEL_FAMILIES.update({model: CATALOG_SCOPE for model in CATALOG_MODELS})
+
+# Proyección acd_v_assignment_view (assignment_view.py): cambia con cualquiera de sus fuentes
+ASSIGNMENT_VIEW_SCOPE = "assignment_view"
+ASSIGNMENT_VIEW_MODELS = (
+    models.UserTrainingAssignment, models.UserTechnologyProgress, models.User,
+    models.Person, models.Gender, models.Training, models.Team, models.TeamMember,
+)
+
+
+# ---- Recursos consultados por los dashboards ----
+
+def user_assignments_scopes(user_id: int):
+    return [f"assignments:user:{user_id}", "assignments", CATALOG_SCOPE]
+
+
+def supervisor_teams_scopes(supervisor_id: int):
+    return [f"teams:supervisor:{supervisor_id}", "teams", CATALOG_SCOPE]
+
+
+def training_materials_scopes():
+    return [MATERIALS_SCOPE, CATALOG_SCOPE]
+
+
+def technology_progress_scopes(assignment_id: int):
+    return [f"progress:assignment:{assignment_id}", "progress", CATALOG_SCOPE]
+
+
+def assignment_view_scopes():
+    return [ASSIGNMENT_VIEW_SCOPE, "assignments", "progress", "teams", CATALOG_SCOPE]
+
+
+def material_progress_scopes(assignment_id: int):
+    # La respuesta incluye el material y la asignación completa
+    return [
+        f"progress:assignment:{assignment_id}", "progress",
+        f"assignment:{assignment_id}", "assignments",
+        MATERIALS_SCOPE, CATALOG_SCOPE,
+    ]
+
+
+# ---- Incremento de versiones ----
+
+def upsert_statement(dialect_name: str):
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(models.ResourceVersion)
+
+
+def bump_scopes(connection, scopes):
+    """
+    Incrementar el contador de cada scope (se crea en 1 si no existía)
+    """
+    scopes = sorted(set(scopes))
+    if not scopes:
+        return
+    now = datetime.utcnow()
+    table = models.ResourceVersion.__table__
+    statement = upsert_statement(connection.dialect.name).values([
+        {"resource_scope": scope, "resource_version": 1, "resource_updated_at": now}
+        for scope in scopes
+    ])
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.resource_scope],
+        set_={
+            "resource_version": table.c.resource_version + 1,
+            "resource_updated_at": statement.excluded.resource_updated_at,
+        },
+    )
+    connection.execute(statement)
+
+
+def attribute_values(obj, name: str):
+    """
+    Valor actual y valor anterior (si cambió en este flush) de un atributo
+    """
+    history = inspect(obj).attrs[name].history
+    values = set(history.added or ()) | set(history.deleted or ()) | set(history.unchanged or ())
+    return {value for value in values if value is not None}
+
+
+def team_supervisors(connection, objects):
+    """
+    Supervisor de cada equipo tocado por los miembros del flush, en una sola consulta
+    """
+    team_ids = set()
+    for obj in objects:
+        if isinstance(obj, models.TeamMember):
+            team_ids |= attribute_values(obj, "team_id")
+    if not team_ids:
+        return {}
+    return dict(connection.execute(
+        select(models.Team.team_id, models.Team.supervisor_id).where(models.Team.team_id.in_(team_ids))
+    ).all())
+
+
+def scopes_for(obj, supervisors):
+    scopes = set()
+    if isinstance(obj, CATALOG_MODELS):
+        scopes.add(CATALOG_SCOPE)
+    elif isinstance(obj, (models.TrainingMaterial, models.MaterialFile)):
+        scopes.add(MATERIALS_SCOPE)
+    elif isinstance(obj, models.UserTrainingAssignment):
+        scopes.update(f"assignments:user:{user_id}" for user_id in attribute_values(obj, "user_id"))
+        scopes.update(f"assignment:{assignment_id}" for assignment_id in attribute_values(obj, "assignment_id"))
+    elif isinstance(obj, (models.UserTechnologyProgress, models.UserMaterialProgress)):
+        scopes.update(f"progress:assignment:{assignment_id}" for assignment_id in attribute_values(obj, "assignment_id"))
+    elif isinstance(obj, models.Team):
+        scopes.update(f"teams:supervisor:{supervisor_id}" for supervisor_id in attribute_values(obj, "supervisor_id"))
+    elif isinstance(obj, models.TeamMember):
+        supervisor_ids = {
+            supervisors[team_id] for team_id in attribute_values(obj, "team_id") if team_id in supervisors
+        }
+        scopes.update(f"teams:supervisor:{supervisor_id}" for supervisor_id in supervisor_ids)
+        if not supervisor_ids:
+            scopes.add("teams")
+    if not scopes and type(obj) in MODEL_FAMILIES:
+        # Sin las claves cargadas (objeto expirado) se invalida toda la familia
+        scopes.add(MODEL_FAMILIES[type(obj)])
+    if isinstance(obj, ASSIGNMENT_VIEW_MODELS):
+        scopes.add(ASSIGNMENT_VIEW_SCOPE)
+    return scopes
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def collect_modified(session, flush_context, instances):
+    # Después del flush is_modified ya no distingue los objetos realmente modificados
+    session.info["versioning_modified"] = [
+        obj for obj in session.dirty if session.is_modified(obj, include_collections=False)
+    ]
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def bump_after_flush(session, flush_context):
+    # Aquí los objetos nuevos ya tienen su clave primaria asignada
+    connection = session.connection()
+    scopes = set()
+    modified = session.info.pop("versioning_modified", [])
+    objects = list(session.new) + list(session.deleted) + modified
+    supervisors = team_supervisors(connection, objects)
+    for obj in objects:
+        scopes |= scopes_for(obj, supervisors)
+    bump_scopes(connection, scopes)
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def bump_after_bulk_statement(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+        return
+    mapper = orm_execute_state.bind_mapper
+    family = MODEL_FAMILIES.get(mapper.class_) if mapper is not None else None
+    if family:
+        bump_scopes(orm_execute_state.session.connection(), [family])
+
+
+# ---- Lectura de versiones y cabeceras HTTP ----
+
+class ResourceState:
+    """
+    Versión vigente de un recurso: ETag débil y fecha de última modificación
+    """
+
+    def __init__(self, etag: str, last_modified: Optional[datetime]):
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def headers(self):
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache"}
+        if self.last_modified is not None:
+            headers["Last-Modified"] = format_datetime(self.last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+        return headers
+
+    def apply(self, response: Response):
+        response.headers.update(self.headers())
+        return response
+
+    def not_modified(self):
+        return Response(status_code=304, headers=self.headers())
+
+
+def resource_state(db, scopes) -> ResourceState:
+    """
+    Leer los contadores del recurso (una consulta por clave primaria, sin tocar los datos)
+    """
+    scopes = list(scopes) + [EPOCH_SCOPE]
+    rows = dict(
+        (scope, (version, updated_at))
+        for scope, version, updated_at in db.execute(
+            select(
+                models.ResourceVersion.resource_scope,
+                models.ResourceVersion.resource_version,
+                models.ResourceVersion.resource_updated_at,
+            ).where(models.ResourceVersion.resource_scope.in_(scopes))
+        )
+    )
+    # La fecha de cada contador distingue versiones iguales de bases reinicializadas
+    key = "|".join(f"{scope}={rows[scope][0]}@{rows[scope][1].isoformat()}" if scope in rows else f"{scope}=0" for scope in scopes)
+    etag = 'W/"' + hashlib.blake2b(key.encode("utf-8"), digest_size=10).hexdigest() + '"'
+    last_modified = max((updated_at for _, updated_at in rows.values()), default=None)
+    return ResourceState(etag, last_modified)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Comparación débil: W/"x" y "x" se consideran iguales
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith("W/") else candidate) == opaque:
+            return True
+    return False
+
+
+class ConditionalRequest:
+    """
+    Dependencia con las cabeceras If-None-Match / If-Modified-Since de la solicitud
+    """
+
+    def __init__(self, if_none_match: Optional[str] = Header(None), if_modified_since: Optional[str] = Header(None)):
+        self.if_none_match = if_none_match
+        self.if_modified_since = if_modified_since
+
+    def is_fresh(self, state: ResourceState) -> bool:
+        """
+        True si la copia del cliente sigue vigente (corresponde responder 304)
+        """
+        if self.if_none_match:
+            return etag_matches(self.if_none_match, state.etag)
+        if self.if_modified_since and state.last_modified is not None:
+            try:
+                since = parsedate_to_datetime(self.if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            if since.tzinfo is not None:
+                since = since.astimezone(timezone.utc).replace(tzinfo=None)
+            return state.last_modified.replace(microsecond=0) <= since
+        return False
@@ -0,0 +1,570 @@
+import os
+import asyncio
+import sqlite3
+import threading
+from datetime import datetime, date, timedelta
+
+from sqlalchemy import (
+    create_engine, MetaData, Table, Column, Integer, String, Text, DateTime, Date, Boolean, Float,
+    select, func
+)
+from sqlalchemy.dialects.sqlite import insert
+import anyio
+
+import models
+import powerbi
+from database import engine as operational_engine
+
+# ================================
+# DATA WAREHOUSE (ESQUEMA ESTRELLA)
+# ================================
+# Copia analítica en un archivo SQLite aparte: dimensiones con claves sustitutas enteras
+# y hechos que solo guardan esas claves, así las herramientas de BI unen por enteros
+# en lugar de repetir textos en cada fila.
+#
+# La carga es incremental: cada tabla guarda en etl_watermark hasta qué updated_at
+# se cargó, y en la siguiente ejecución solo se leen las filas modificadas después.
+# Las claves sustitutas se conservan al actualizar (upsert por la clave natural).
+
+WAREHOUSE_PATH = os.getenv("WAREHOUSE_PATH", "./storage/warehouse/analytics.db")
+# Cada cuánto se actualiza el warehouse desde el ciclo de vida de la app (0 = solo manual)
+WAREHOUSE_REFRESH_INTERVAL_SECONDS = int(os.getenv("WAREHOUSE_REFRESH_INTERVAL_SECONDS", "0"))
+
+LOAD_BATCH_SIZE = 1000
+
+# Una sola carga a la vez (programada o solicitada por la API)
+_build_lock = threading.Lock()
+
+MONTH_NAMES = ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio", "Julio",
+               "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"]
+DAY_NAMES = ["Lunes", "Martes", "Miércoles", "Jueves", "Viernes", "Sábado", "Domingo"]
+
+metadata = MetaData()
+
+dim_date = Table(
+    "dim_date", metadata,
+    Column("date_key", Integer, primary_key=True, autoincrement=False),  # AAAAMMDD
+    Column("date", Date, nullable=False, unique=True),
+    Column("year", Integer, nullable=False),
+    Column("quarter", Integer, nullable=False),
+    Column("month", Integer, nullable=False),
+    Column("month_name", String(20), nullable=False),
+    Column("day", Integer, nullable=False),
+    Column("day_of_week", Integer, nullable=False),  # 1 = lunes
+    Column("day_name", String(20), nullable=False),
+    Column("week_of_year", Integer, nullable=False),
+    Column("is_weekend", Boolean, nullable=False),
+)
+
+dim_user = Table(
+    "dim_user", metadata,
+    Column("user_key", Integer, primary_key=True),
+    Column("user_id", Integer, nullable=False, unique=True),
+    Column("username", String(50), nullable=False),
+    Column("first_name", String(20), nullable=False),
+    Column("last_name", String(20), nullable=False),
+    Column("full_name", String(41), nullable=False),
+    Column("email", String(30), nullable=False),
+    Column("gender", String(20), nullable=False),
+    Column("role", String(30), nullable=False),
+    Column("is_active", Boolean, nullable=False),
+    Column("created_date_key", Integer, index=True),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+dim_training = Table(
+    "dim_training", metadata,
+    Column("training_key", Integer, primary_key=True),
+    Column("training_id", Integer, nullable=False, unique=True),
+    Column("training_name", String(100), nullable=False),
+    Column("training_description", Text),
+    Column("is_active", Boolean, nullable=False),
+    Column("created_date_key", Integer, index=True),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+dim_technology = Table(
+    "dim_technology", metadata,
+    Column("technology_key", Integer, primary_key=True),
+    Column("technology_id", Integer, nullable=False, unique=True),
+    Column("technology_name", String(50), nullable=False),
+    Column("created_date_key", Integer, index=True),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+dim_team = Table(
+    "dim_team", metadata,
+    Column("team_key", Integer, primary_key=True),
+    Column("team_id", Integer, nullable=False, unique=True),
+    Column("team_name", String(100), nullable=False),
+    Column("team_description", Text),
+    Column("supervisor_user_key", Integer, index=True),
+    Column("is_active", Boolean, nullable=False),
+    Column("created_date_key", Integer, index=True),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+# Relación muchos a muchos entre equipos y usuarios
+bridge_team_member = Table(
+    "bridge_team_member", metadata,
+    Column("team_member_id", Integer, primary_key=True, autoincrement=False),
+    Column("team_key", Integer, nullable=False, index=True),
+    Column("user_key", Integer, nullable=False, index=True),
+    Column("member_role", String(20), nullable=False),
+    Column("is_active", Boolean, nullable=False),
+    Column("joined_date_key", Integer, index=True),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+fact_assignment = Table(
+    "fact_assignment", metadata,
+    Column("assignment_id", Integer, primary_key=True, autoincrement=False),
+    Column("user_key", Integer, nullable=False, index=True),
+    Column("training_key", Integer, nullable=False, index=True),
+    Column("instructor_user_key", Integer, index=True),
+    Column("assignment_status", String(20), nullable=False),
+    Column("completion_percentage", Float, nullable=False),
+    Column("is_completed", Boolean, nullable=False),
+    Column("created_date_key", Integer, index=True),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+fact_technology_progress = Table(
+    "fact_technology_progress", metadata,
+    Column("progress_id", Integer, primary_key=True, autoincrement=False),
+    Column("assignment_id", Integer, nullable=False, index=True),
+    Column("user_key", Integer, nullable=False, index=True),
+    Column("training_key", Integer, nullable=False, index=True),
+    Column("technology_key", Integer, nullable=False, index=True),
+    Column("is_completed", Boolean, nullable=False),
+    Column("completed_date_key", Integer, index=True),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+fact_material_progress = Table(
+    "fact_material_progress", metadata,
+    Column("progress_id", Integer, primary_key=True, autoincrement=False),
+    Column("assignment_id", Integer, nullable=False, index=True),
+    Column("material_id", Integer, nullable=False, index=True),
+    Column("material_title", String(200), nullable=False),
+    Column("material_type", String(50), nullable=False),
+    Column("user_key", Integer, nullable=False, index=True),
+    Column("training_key", Integer, nullable=False, index=True),
+    Column("instructor_user_key", Integer, index=True),
+    Column("is_completed", Boolean, nullable=False),
+    Column("completed_date_key", Integer, index=True),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+etl_watermark = Table(
+    "etl_watermark", metadata,
+    Column("table_name", String(50), primary_key=True),
+    Column("last_updated_at", DateTime, nullable=False),
+    Column("rows_loaded", Integer, nullable=False),
+    Column("loaded_at", DateTime, nullable=False),
+)
+
+
+def date_key(value):
+    if value is None:
+        return None
+    return value.year * 10000 + value.month * 100 + value.day
+
+
+def is_active(status: str) -> bool:
+    return status == 'A'
+
+
+# ================================
+# CONSULTAS DE ORIGEN
+# ================================
+# Cada consulta devuelve las filas de la tabla destino modificadas en (since, until],
+# considerando también las tablas unidas que aportan columnas a la fila.
+
+def users_source(since, until):
+    row_updated = powerbi.greatest(
+        models.User.user_updated_at, models.Person.person_updated_at,
+        models.Gender.gender_updated_at, models.Role.role_updated_at
+    )
+    query = select(
+        models.User.user_id, models.User.user_username, models.User.user_status, models.User.user_created_at,
+        models.Person.person_first_name, models.Person.person_last_name, models.Person.person_email,
+        models.Gender.gender_name, models.Role.role_name, row_updated.label("updated_at")
+    ).join(
+        models.Person, models.User.person_id == models.Person.person_id
+    ).join(
+        models.Gender, models.Person.person_gender == models.Gender.gender_id
+    ).join(
+        models.Role, models.User.user_role == models.Role.role_id
+    ).order_by(models.User.user_id)
+    return powerbi.apply_window(query, models.User.user_id, [
+        models.User.user_updated_at, models.Person.person_updated_at,
+        models.Gender.gender_updated_at, models.Role.role_updated_at
+    ], row_updated, since, until)
+
+
+def users_rows(row, keys):
+    return {
+        "user_id": row.user_id,
+        "username": row.user_username,
+        "first_name": row.person_first_name,
+        "last_name": row.person_last_name,
+        "full_name": f"{row.person_first_name} {row.person_last_name}",
+        "email": row.person_email,
+        "gender": row.gender_name,
+        "role": row.role_name,
+        "is_active": is_active(row.user_status),
+        "created_date_key": date_key(row.user_created_at),
+        "updated_at": row.updated_at,
+    }
+
+
+def single_table_source(model, updated_column, *columns):
+    def source(since, until):
+        query = select(*columns, updated_column.label("updated_at")).select_from(model).order_by(*model.__table__.primary_key)
+        if since is not None:
+            query = query.where(updated_column > since)
+        if until is not None:
+            query = query.where(updated_column <= until)
+        return query
+    return source
+
+
+trainings_source = single_table_source(
+    models.Training, models.Training.training_updated_at,
+    models.Training.training_id, models.Training.training_name, models.Training.training_description,
+    models.Training.training_status, models.Training.training_created_at
+)
+
+
+def trainings_rows(row, keys):
+    return {
+        "training_id": row.training_id,
+        "training_name": row.training_name,
+        "training_description": row.training_description,
+        "is_active": is_active(row.training_status),
+        "created_date_key": date_key(row.training_created_at),
+        "updated_at": row.updated_at,
+    }
+
+
+technologies_source = single_table_source(
+    models.Technology, models.Technology.technology_updated_at,
+    models.Technology.technology_id, models.Technology.technology_name, models.Technology.technology_created_at
+)
+
+
+def technologies_rows(row, keys):
+    return {
+        "technology_id": row.technology_id,
+        "technology_name": row.technology_name,
+        "created_date_key": date_key(row.technology_created_at),
+        "updated_at": row.updated_at,
+    }
+
+
+teams_source = single_table_source(
+    models.Team, models.Team.team_updated_at,
+    models.Team.team_id, models.Team.team_name, models.Team.team_description, models.Team.supervisor_id,
+    models.Team.team_status, models.Team.team_created_at
+)
+
+
+def teams_rows(row, keys):
+    return {
+        "team_id": row.team_id,
+        "team_name": row.team_name,
+        "team_description": row.team_description,
+        "supervisor_user_key": keys["user"].get(row.supervisor_id),
+        "is_active": is_active(row.team_status),
+        "created_date_key": date_key(row.team_created_at),
+        "updated_at": row.updated_at,
+    }
+
+
+team_members_source = single_table_source(
+    models.TeamMember, models.TeamMember.member_updated_at,
+    models.TeamMember.team_member_id, models.TeamMember.team_id, models.TeamMember.user_id,
+    models.TeamMember.member_role, models.TeamMember.member_status, models.TeamMember.joined_at
+)
+
+
+def team_members_rows(row, keys):
+    return {
+        "team_member_id": row.team_member_id,
+        "team_key": keys["team"][row.team_id],
+        "user_key": keys["user"][row.user_id],
+        "member_role": row.member_role,
+        "is_active": is_active(row.member_status),
+        "joined_date_key": date_key(row.joined_at),
+        "updated_at": row.updated_at,
+    }
+
+
+assignments_source = single_table_source(
+    models.UserTrainingAssignment, models.UserTrainingAssignment.assignment_updated_at,
+    models.UserTrainingAssignment.assignment_id, models.UserTrainingAssignment.user_id,
+    models.UserTrainingAssignment.training_id, models.UserTrainingAssignment.instructor_id,
+    models.UserTrainingAssignment.assignment_status, models.UserTrainingAssignment.completion_percentage,
+    models.UserTrainingAssignment.assignment_created_at
+)
+
+
+def assignments_rows(row, keys):
+    return {
+        "assignment_id": row.assignment_id,
+        "user_key": keys["user"][row.user_id],
+        "training_key": keys["training"][row.training_id],
+        "instructor_user_key": keys["user"].get(row.instructor_id),
+        "assignment_status": row.assignment_status,
+        "completion_percentage": float(row.completion_percentage or 0),
+        "is_completed": row.assignment_status == 'completed',
+        "created_date_key": date_key(row.assignment_created_at),
+        "updated_at": row.updated_at,
+    }
+
+
+def technology_progress_source(since, until):
+    progress = models.UserTechnologyProgress
+    query = select(
+        progress.progress_id, progress.assignment_id, progress.technology_id, progress.is_completed,
+        progress.completed_at, models.UserTrainingAssignment.user_id, models.UserTrainingAssignment.training_id,
+        progress.updated_at.label("updated_at")
+    ).join(
+        models.UserTrainingAssignment, progress.assignment_id == models.UserTrainingAssignment.assignment_id
+    ).order_by(progress.progress_id)
+    if since is not None:
+        query = query.where(progress.updated_at > since)
+    if until is not None:
+        query = query.where(progress.updated_at <= until)
+    return query
+
+
+def technology_progress_rows(row, keys):
+    return {
+        "progress_id": row.progress_id,
+        "assignment_id": row.assignment_id,
+        "user_key": keys["user"][row.user_id],
+        "training_key": keys["training"][row.training_id],
+        "technology_key": keys["technology"][row.technology_id],
+        "is_completed": row.is_completed == 'Y',
+        "completed_date_key": date_key(row.completed_at),
+        "updated_at": row.updated_at,
+    }
+
+
+def material_progress_source(since, until):
+    progress = models.UserMaterialProgress
+    row_updated = powerbi.greatest(progress.updated_at, models.TrainingMaterial.material_updated_at)
+    query = select(
+        progress.progress_id, progress.assignment_id, progress.material_id, progress.user_id,
+        progress.is_completed, progress.completed_at, models.TrainingMaterial.material_title,
+        models.TrainingMaterial.material_type, models.TrainingMaterial.training_id,
+        models.TrainingMaterial.instructor_id, row_updated.label("updated_at")
+    ).join(
+        models.TrainingMaterial, progress.material_id == models.TrainingMaterial.material_id
+    ).order_by(progress.progress_id)
+    return powerbi.apply_window(query, progress.progress_id, [
+        progress.updated_at, models.TrainingMaterial.material_updated_at
+    ], row_updated, since, until)
+
+
+def material_progress_rows(row, keys):
+    return {
+        "progress_id": row.progress_id,
+        "assignment_id": row.assignment_id,
+        "material_id": row.material_id,
+        "material_title": row.material_title,
+        "material_type": row.material_type,
+        "user_key": keys["user"][row.user_id],
+        "training_key": keys["training"][row.training_id],
+        "instructor_user_key": keys["user"].get(row.instructor_id),
+        "is_completed": row.is_completed == 'Y',
+        "completed_date_key": date_key(row.completed_at),
+        "updated_at": row.updated_at,
+    }
+
+
+# Orden de carga: las dimensiones antes que las tablas que usan sus claves.
+# (tabla destino, clave natural, clave sustituta o None, consulta de origen, transformación, mapa de claves)
+LOAD_PLAN = [
+    (dim_user, "user_id", "user_key", users_source, users_rows, "user"),
+    (dim_training, "training_id", "training_key", trainings_source, trainings_rows, "training"),
+    (dim_technology, "technology_id", "technology_key", technologies_source, technologies_rows, "technology"),
+    (dim_team, "team_id", "team_key", teams_source, teams_rows, "team"),
+    (bridge_team_member, "team_member_id", None, team_members_source, team_members_rows, None),
+    (fact_assignment, "assignment_id", None, assignments_source, assignments_rows, None),
+    (fact_technology_progress, "progress_id", None, technology_progress_source, technology_progress_rows, None),
+    (fact_material_progress, "progress_id", None, material_progress_source, material_progress_rows, None),
+]
+
+DATE_KEY_COLUMNS = ["created_date_key", "joined_date_key", "completed_date_key"]
+
+
+def create_warehouse_engine(path: str = None):
+    path = path or WAREHOUSE_PATH
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    return create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+
+
+def upsert(conn, table, natural_key: str, rows):
+    """
+    Insertar o actualizar por la clave natural; la clave sustituta de las filas existentes no cambia
+    """
+    if not rows:
+        return
+    statement = insert(table)
+    update_columns = {
+        column.name: statement.excluded[column.name]
+        for column in table.columns
+        if column.name != natural_key and not column.primary_key
+    }
+    conn.execute(statement.on_conflict_do_update(index_elements=[natural_key], set_=update_columns), rows)
+
+
+def load_key_map(conn, table, natural_key: str, surrogate_key: str):
+    return dict(conn.execute(select(table.c[natural_key], table.c[surrogate_key])).all())
+
+
+def fill_dim_date(conn, date_keys):
+    """
+    Completar dim_date con un rango continuo de días que cubra todas las fechas usadas
+    """
+    date_keys = {key for key in date_keys if key}
+    if not date_keys:
+        return 0
+    current_min, current_max = conn.execute(select(func.min(dim_date.c.date_key), func.max(dim_date.c.date_key))).one()
+    keys = date_keys | {key for key in (current_min, current_max) if key}
+    first, last = min(keys), max(keys)
+    start = date(first // 10000, first // 100 % 100, first % 100)
+    end = date(last // 10000, last // 100 % 100, last % 100)
+
+    rows = []
+    day = start
+    while day <= end:
+        key = date_key(day)
+        if current_min is None or not (current_min <= key <= current_max):
+            rows.append({
+                "date_key": key,
+                "date": day,
+                "year": day.year,
+                "quarter": (day.month - 1) // 3 + 1,
+                "month": day.month,
+                "month_name": MONTH_NAMES[day.month - 1],
+                "day": day.day,
+                "day_of_week": day.isoweekday(),
+                "day_name": DAY_NAMES[day.weekday()],
+                "week_of_year": day.isocalendar()[1],
+                "is_weekend": day.weekday() >= 5,
+            })
+        day += timedelta(days=1)
+    if rows:
+        conn.execute(insert(dim_date).on_conflict_do_nothing(), rows)
+    return len(rows)
+
+
+def build_warehouse(full: bool = False, path: str = None, source_engine=None):
+    """
+    Cargar el warehouse desde las tablas operacionales.
+    full=True lo reconstruye desde cero; si no, solo se cargan las filas modificadas
+    desde la última marca de agua de cada tabla. Retorna las filas cargadas por tabla.
+    """
+    with _build_lock:
+        return _build_warehouse(full, path, source_engine)
+
+
+def _build_warehouse(full: bool, path: str, source_engine):
+    source_engine = source_engine or operational_engine
+    target_engine = create_warehouse_engine(path)
+    try:
+        if full:
+            metadata.drop_all(target_engine)
+        metadata.create_all(target_engine)
+
+        # Los hechos se cargan hasta `until` y las dimensiones sin límite superior:
+        # así toda clave que use un hecho ya existe en su dimensión. Lo leído después
+        # de `until` se vuelve a cargar en la siguiente ejecución, lo que es inofensivo.
+        until = datetime.utcnow() - powerbi.WATERMARK_LAG
+        result = {}
+        with source_engine.connect() as source, target_engine.begin() as target:
+            watermarks = dict(target.execute(select(etl_watermark.c.table_name, etl_watermark.c.last_updated_at)).all())
+            keys = {}
+            date_keys = set()
+            for table, natural_key, surrogate_key, build_source, transform, key_map in LOAD_PLAN:
+                since = watermarks.get(table.name)
+                rows_loaded = 0
+                stream = source.execution_options(stream_results=True, yield_per=LOAD_BATCH_SIZE).execute(
+                    build_source(since, None if key_map else until)
+                )
+                for batch in stream.partitions():
+                    rows = [transform(row, keys) for row in batch]
+                    for column in DATE_KEY_COLUMNS:
+                        if column in table.c:
+                            date_keys.update(row[column] for row in rows)
+                    upsert(target, table, natural_key, rows)
+                    rows_loaded += len(rows)
+
+                if key_map:
+                    keys[key_map] = load_key_map(target, table, natural_key, surrogate_key)
+                target.execute(insert(etl_watermark).on_conflict_do_update(
+                    index_elements=["table_name"],
+                    set_={"last_updated_at": until, "rows_loaded": rows_loaded, "loaded_at": datetime.utcnow()}
+                ), {"table_name": table.name, "last_updated_at": until, "rows_loaded": rows_loaded, "loaded_at": datetime.utcnow()})
+                result[table.name] = rows_loaded
+
+            result[dim_date.name] = fill_dim_date(target, date_keys)
+        return result
+    finally:
+        target_engine.dispose()
+
+
+def warehouse_status(path: str = None):
+    path = path or WAREHOUSE_PATH
+    if not os.path.exists(path):
+        return {"available": False, "tables": []}
+    target_engine = create_warehouse_engine(path)
+    try:
+        metadata.create_all(target_engine)
+        with target_engine.connect() as conn:
+            watermarks = {row.table_name: row for row in conn.execute(select(etl_watermark)).all()}
+            tables = []
+            for table in [dim_date] + [plan[0] for plan in LOAD_PLAN]:
+                watermark = watermarks.get(table.name)
+                tables.append({
+                    "table": table.name,
+                    "rows": conn.execute(select(func.count()).select_from(table)).scalar(),
+                    "loaded_until": watermark.last_updated_at.isoformat() if watermark else None,
+                    "last_rows_loaded": watermark.rows_loaded if watermark else None,
+                    "loaded_at": watermark.loaded_at.isoformat() if watermark else None,
+                })
+        return {"available": True, "size_bytes": os.path.getsize(path), "tables": tables}
+    finally:
+        target_engine.dispose()
+
+
+def snapshot_copy(destination: str, path: str = None):
+    """
+    Copia consistente del archivo del warehouse (API de backup de SQLite),
+    aunque haya una carga en curso
+    """
+    source = sqlite3.connect(path or WAREHOUSE_PATH)
+    target = sqlite3.connect(destination)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+async def run_forever(interval: int = WAREHOUSE_REFRESH_INTERVAL_SECONDS):
+    """
+    Tarea de fondo del ciclo de vida de la aplicación
+    """
+    while True:
+        try:
+            await anyio.to_thread.run_sync(build_warehouse)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Error actualizando el warehouse: {e}")
+        await asyncio.sleep(interval)